@@ -4,10 +4,26 @@ import numpy as np
 import plotly.express as px
 import requests
 import os
+import time
 
 # Base URL for your Flask backend (adjust port if necessary)
 BASE_URL = "http://localhost:5000"
 
+def post_and_wait(path, data, timeout=600):
+    """POST a write request and poll its background job until it finishes.
+    Returns (status_code, body) of the finished job."""
+    response = requests.post(f"{BASE_URL}{path}", json=data)
+    if response.status_code != 202:
+        return response.status_code, response.json()
+    status_url = response.json()["status_url"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{BASE_URL}{status_url}").json()
+        if job["status"] in ("COMPLETED", "FAILED"):
+            return job["http_status"], job["result"]
+        time.sleep(1)
+    return 504, {"error": "Timed out waiting for the job to finish", "status_url": status_url}
+
 # Set the page configuration
 st.set_page_config(
     page_title="Solar Farm Crowdfunding with XRP Blockchain",
@@ -238,11 +254,12 @@ if selected_group == "API Demo":
                 "total_shares": number_of_shares,
                 "share_price_xrp": share_price_xrp
             }
-            response = requests.post(f"{BASE_URL}/create_project", json=project_data)
-            st.write("Response Code:", response.status_code)
-            st.json(response.json())
-            if response.status_code == 200:
-                project_id = response.json().get("project_id")
+            with st.spinner("Creating project wallet..."):
+                status_code, result = post_and_wait("/create_project", project_data)
+            st.write("Response Code:", status_code)
+            st.json(result)
+            if status_code == 200:
+                project_id = result.get("project_id")
                 st.success(f"Project created")
                 st.session_state["project_id"] = project_id
     
@@ -274,7 +291,22 @@ if selected_group == "API Demo":
                 st.markdown(f"**Total Power (kW):** {project_data['project']['total_power_kw']}")
                 st.markdown(f"**Total Shares:** {project_data['project']['total_shares']}")
                 st.markdown(f"**Wallet Address:** {project_data['project']['wallet_address']}")
-                
+
+                # Display Production (daily totals over the last year)
+                st.markdown("### Energy Production")
+                production = requests.get(f"{BASE_URL}/production/{project_id_input}",
+                                          params={"resolution": "day"}).json()
+                if production.get("bucket_start"):
+                    production_data = pd.DataFrame({
+                        "Date": pd.to_datetime(production["bucket_start"], unit="s"),
+                        "Energy (kWh)": production["kwh"]
+                    })
+                    fig = px.bar(production_data, x="Date", y="Energy (kWh)", title="Daily Energy Production")
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.markdown(f"**Produced over the last year (kWh):** {production['total_kwh']}")
+                else:
+                    st.markdown("No production readings yet.")
+
                 # Display Dividends
                 st.markdown("### Dividends")
                 if project_data["dividends"]:
@@ -309,9 +341,10 @@ if selected_group == "API Demo":
                 "name": project_id_buy,
                 "shares_amount": shares_amount
             }
-            response = requests.post(f"{BASE_URL}/buy_shares", json=buy_data)
-            st.write("Response Code:", response.status_code)
-            st.json(response.json())
+            with st.spinner("Processing purchase..."):
+                status_code, result = post_and_wait("/buy_shares", buy_data)
+            st.write("Response Code:", status_code)
+            st.json(result)
 
     with demo_tabs[3]:
         st.subheader("4. Distribute Dividends")
@@ -322,9 +355,10 @@ if selected_group == "API Demo":
                 "name": project_id_div,
                 "total_dividend_xrp": dividend_amount
             }
-            response = requests.post(f"{BASE_URL}/distribute_dividends", json=dividend_data)
-            st.write("Response Code:", response.status_code)
-            st.json(response.json())
+            with st.spinner("Distributing dividends..."):
+                status_code, result = post_and_wait("/distribute_dividends", dividend_data)
+            st.write("Response Code:", status_code)
+            st.json(result)
 
 # ---------------------- Sidebar Footer ----------------------
 st.sidebar.markdown("---")
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BalanceCache:
+    """TTL cache of ledger balances keyed by address.
+
+    Concurrent misses for the same address share a single fetch, and writes we
+    make ourselves invalidate the addresses they touch.
+    """
+
+    def __init__(self, fetch, ttl=10.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # address -> (balance, expires_at)
+        self.inflight = {}  # address -> Future shared by coalesced readers
+        self.versions = {}  # address -> bumped on invalidation
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, address, fresh=False):
+        """Return the balance for an address, fetching it only if not cached"""
+        with self.lock:
+            entry = self.entries.get(address)
+            if not fresh and entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            future = self.inflight.get(address)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self.inflight[address] = future
+                version = self.versions.get(address, 0)
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            balance = self.fetch(address)
+        except Exception as e:
+            with self.lock:
+                self.inflight.pop(address, None)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.inflight.pop(address, None)
+            # Skip caching if the address was invalidated while we were fetching.
+            if self.versions.get(address, 0) == version:
+                self.entries[address] = (balance, time.monotonic() + self.ttl)
+        future.set_result(balance)
+        return balance
+
+    def put(self, address, balance):
+        """Store a balance we already know, e.g. from a funding check"""
+        with self.lock:
+            self.entries[address] = (balance, time.monotonic() + self.ttl)
+
+    def invalidate(self, *addresses):
+        """Drop cached balances for addresses touched by our own transactions"""
+        with self.lock:
+            for address in addresses:
+                self.entries.pop(address, None)
+                self.versions[address] = self.versions.get(address, 0) + 1
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "ttl_seconds": self.ttl
+            }
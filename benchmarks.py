@@ -0,0 +1,1636 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from concurrent.futures import ThreadPoolExecutor
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import AccountInfo
+from xrpl.wallet import Wallet
+
+import fake_ledger
+
+# Micro-benchmarks for the backend. Everything runs against local stand-ins
+# (fake_ledger, temporary SQLite files) so results are reproducible offline.
+
+
+def bench_payouts(args):
+    """Throughput of a batched dividend run against the fake ledger"""
+    from confirmations import ConfirmationService
+    from payouts import pay_out
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    client = JsonRpcClient(fake_ledger.server_url(server))
+    project_wallet = Wallet.create()
+    ledger.fund(project_wallet.classic_address, 100000 * 1000000)
+    allocations = [(Wallet.create().classic_address, 1000000) for _ in range(args.holders)]
+
+    confirmations = ConfirmationService(client.request, poll_interval=args.close_interval / 4)
+    report = pay_out(client, confirmations, project_wallet, allocations)
+    stats = confirmations.stats()
+    print(f"holders={args.holders} confirmed={report['confirmed']} failed={report['failed']}")
+    print(f"submit={report['submit_seconds']:.2f}s total={report['elapsed_seconds']:.2f}s "
+          f"throughput={report['payments_per_second']:.1f} payments/s")
+    print(f"ledgers_scanned={stats['ledgers_scanned']} for {args.holders} payments "
+          f"(rpc calls served: {ledger.requests_served})")
+    server.shutdown()
+
+
+def use_temp_database():
+    """Point the app at a fresh temporary database; call before importing it"""
+    path = os.path.join(tempfile.mkdtemp(prefix="solar-bench-"), "bench.db")
+    os.environ['DATABASE'] = path
+    os.environ['JOB_WORKERS'] = '0'
+    os.environ['WALLET_POOL_SIZE'] = '0'
+    os.environ['DIVIDEND_SCHEDULER_INTERVAL'] = '0'
+    os.environ['LEDGER_INDEXER_INTERVAL'] = '0'
+    os.environ['SIGNER_REFRESH_INTERVAL'] = '0'
+    return path
+
+
+def seed_database(conn, projects, holders_per_project, dividends_per_project, start=0):
+    """Fill the app tables with synthetic projects, purchases and dividends"""
+    now = datetime.now()
+    for p in range(start, projects):
+        name = f"project-{p:06d}"
+        conn.execute('INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            name, "Synthetic project", "Nowhere", 100.0, 30000, 50000,
+            f"rProject{p}", "sSeed", 'FUNDING', now, 10 * holders_per_project, 0))
+        conn.executemany('INSERT INTO shareholders VALUES (?, ?, ?, ?, ?)', [
+            (str(uuid.uuid4()), name, f"rHolder{h}", 10, now) for h in range(holders_per_project)])
+        conn.executemany('INSERT INTO positions VALUES (?, ?, ?)', [
+            (name, f"rHolder{h}", 10) for h in range(holders_per_project)])
+        conn.executemany('INSERT INTO dividends VALUES (?, ?, ?, ?, ?, ?)', [
+            (str(uuid.uuid4()), name, 1500000, now, 'COMPLETED', None) for _ in range(dividends_per_project)])
+
+
+def measure(label, func, requests):
+    """Call func `requests` times and print throughput"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {requests / elapsed:10.1f} req/s  {elapsed / requests * 1000:8.3f} ms/req")
+    return elapsed
+
+
+def bench_project_reads(args):
+    """GET /project/<name> throughput: connect-per-request vs the pooled db layer"""
+    path = use_temp_database()
+    import solar_crowdfunding
+    import db
+    from flask import jsonify
+
+    with db.transaction() as conn:
+        seed_database(conn, args.projects, args.holders, args.dividends)
+    # The ledger balance lookup is out of scope here; measure the SQLite side only.
+    solar_crowdfunding.check_wallet_balance = lambda address: 0
+
+    legacy_path = path + ".legacy"
+    legacy = sqlite3.connect(legacy_path)
+    db.get_connection().backup(legacy)
+    legacy.execute('PRAGMA journal_mode=DELETE')
+    legacy.close()
+
+    def legacy_get_project(project_name):
+        # The route as it was: a fresh rollback-journal connection per request.
+        conn = sqlite3.connect(legacy_path)
+        c = conn.cursor()
+        c.execute('SELECT * FROM projects WHERE name = ?', (project_name,))
+        project = c.fetchone()
+        c.execute('SELECT * FROM shareholders WHERE project_name = ?', (project_name,))
+        holders = c.fetchall()
+        c.execute('SELECT * FROM dividends WHERE project_name = ?', (project_name,))
+        dividends = c.fetchall()
+        conn.close()
+        return jsonify({"project": project, "shareholders": holders, "dividends": dividends}), 200
+
+    app = solar_crowdfunding.app
+    app.add_url_rule("/legacy_project/<project_name>", view_func=legacy_get_project)
+    client = app.test_client()
+    name = f"project-{args.projects // 2:06d}"
+    before = measure("before (connect per request)", lambda: client.get(f"/legacy_project/{name}"), args.requests)
+    after = measure("after (pooled, WAL)", lambda: client.get(f"/project/{name}"), args.requests)
+    print(f"speedup: {before / after:.2f}x")
+
+
+def bench_all_projects(args):
+    """/get_all_project_info latency on a large synthetic database: N+1 vs set-based"""
+    path = use_temp_database()
+    import solar_crowdfunding
+    import db
+
+    start = time.perf_counter()
+    with db.transaction() as conn:
+        seed_database(conn, args.projects, args.holders, args.dividends)
+    print(f"seeded {args.projects} projects, {args.projects * args.holders} purchases, "
+          f"{args.projects * args.dividends} dividends in {time.perf_counter() - start:.1f}s")
+    client = solar_crowdfunding.app.test_client()
+
+    if not args.skip_legacy:
+        # The old endpoint: one query per project per child table, no indexes.
+        legacy_path = path + ".legacy"
+        legacy = sqlite3.connect(legacy_path)
+        db.get_connection().backup(legacy)
+        for index in ('idx_shareholders_project', 'idx_shareholders_holder', 'idx_dividends_project'):
+            legacy.execute(f'DROP INDEX {index}')
+
+        def legacy_all_projects():
+            c = legacy.cursor()
+            for row in c.execute('SELECT * FROM projects').fetchall():
+                c.execute('SELECT * FROM shareholders WHERE project_name = ?', (row[0],)).fetchall()
+                c.execute('SELECT * FROM dividends WHERE project_name = ?', (row[0],)).fetchall()
+
+        measure("before (N+1, no indexes)", legacy_all_projects, 1)
+    measure("after (3 queries)", lambda: client.get("/get_all_project_info"), args.requests)
+
+
+def peak_memory(func):
+    """Return the peak Python heap allocation (bytes) while running func"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_stream_memory(args):
+    """Peak memory of NDJSON streaming vs the full response as the database grows"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+
+    client = solar_crowdfunding.app.test_client()
+
+    def consume(url):
+        response = client.get(url, buffered=False)
+        for _ in response.iter_encoded():
+            pass
+        response.close()
+
+    results = []
+    seeded = 0
+    for size in (args.projects, args.projects * 4):
+        with db.transaction() as conn:
+            seed_database(conn, size, args.holders, 0, start=seeded)
+        seeded = size
+        streamed = peak_memory(lambda: consume("/get_all_project_info?format=ndjson"))
+        full = peak_memory(lambda: consume("/get_all_project_info"))
+        results.append(streamed)
+        print(f"{size:>8} projects: ndjson peak {streamed / 1e6:7.2f} MB, full response peak {full / 1e6:7.2f} MB")
+
+    print(f"ndjson peak growth for 4x data: {results[1] / results[0]:.2f}x")
+
+
+def bench_balance_cache(args):
+    """GET /project/<name> with a live balance lookup per request vs the balance cache"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve()
+    solar_crowdfunding.ledger_gateway = LedgerGateway(fake_ledger.server_url(server))
+    with db.transaction() as conn:
+        seed_database(conn, 1, args.holders, 1)
+        conn.execute('UPDATE projects SET wallet_address = ?', (Wallet.create().classic_address,))
+    ledger.fund(db.list_projects()[0][6], 50 * 1000000)
+    ledger.close_ledger()
+    client = solar_crowdfunding.app.test_client()
+    # Rebuild the page on every request, so each one looks its balance up
+    # rather than being served whole from the snapshot cache.
+    solar_crowdfunding.project_snapshots.ttl = 0
+
+    cache = solar_crowdfunding.balance_cache
+    cache.ttl = 0
+    measure("uncached (RPC per request)", lambda: client.get("/project/project-000000"), args.requests)
+    cache.ttl = args.ttl
+    measure(f"cached (ttl={args.ttl}s)", lambda: client.get("/project/project-000000"), args.requests)
+    print(client.get("/cache_stats").json["balance_cache"])
+    server.shutdown()
+
+
+def bench_wallet_pool(args):
+    """Latency of getting a funded wallet: inline faucet call vs the pre-funded pool"""
+    use_temp_database()
+    import solar_crowdfunding  # creates the tables
+    from wallet_pool import WalletPool
+
+    def stand_in_faucet():
+        # Simulates the faucet call plus waiting for the funding to validate.
+        time.sleep(args.faucet_delay)
+        return Wallet.create()
+
+    pool = WalletPool(stand_in_faucet, target_size=args.size, refill_workers=args.refill_workers,
+                      check_interval=0.1)
+    pool.init_table()
+    measure("inline faucet", stand_in_faucet, args.requests)
+    pool.start()
+    while pool.depth() < args.size:
+        time.sleep(0.1)
+    measure("pool acquire", pool.acquire, args.requests)
+    time.sleep(args.faucet_delay * 2)
+    print(pool.stats())
+    pool.stop()
+
+
+def bench_concurrent_reads(args):
+    """Concurrent GET /project/<name> reads: sync JsonRpcClient vs the async gateway"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(latency=args.latency)
+    url = fake_ledger.server_url(server)
+    with db.transaction() as conn:
+        seed_database(conn, args.projects, 5, 1)
+    for row in db.list_projects():
+        address = Wallet.create().classic_address
+        with db.transaction() as conn:
+            conn.execute('UPDATE projects SET wallet_address = ? WHERE name = ?', (address, row[0]))
+        ledger.fund(address, 50 * 1000000)
+    ledger.close_ledger()
+
+    cache = solar_crowdfunding.balance_cache
+    cache.ttl = 0  # every read goes to the ledger
+    sync_client = JsonRpcClient(url)
+
+    def sync_fetch(address):
+        response = sync_client.request(AccountInfo(account=address, ledger_index="validated"))
+        return int(response.result['account_data']['Balance']) / 1000000
+
+    gateway = LedgerGateway(url, max_concurrency=args.threads)
+    solar_crowdfunding.ledger_gateway = gateway
+    names = [f"project-{p:06d}" for p in range(args.projects)]
+
+    def read_all():
+        def read(name):
+            with solar_crowdfunding.app.test_client() as client:
+                assert client.get(f"/project/{name}").status_code == 200
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(read, names * args.rounds))
+
+    requests = args.projects * args.rounds
+    cache.fetch = sync_fetch
+    before = measure(f"sync client ({args.threads} threads)", read_all, 1) / requests
+    cache.fetch = solar_crowdfunding.fetch_wallet_balance
+    after = measure(f"async gateway ({args.threads} threads)", read_all, 1) / requests
+    print(f"per-read: sync {before * 1000:.2f} ms, gateway {after * 1000:.2f} ms")
+    gateway.close()
+    server.shutdown()
+
+
+def bench_resume(args):
+    """Resume a dividend run that crashed partway: work done vs. what was left"""
+    use_temp_database()
+    from xrpl.core.addresscodec import encode_classic_address
+
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    os.environ['LEDGER_POLL_INTERVAL'] = str(args.close_interval / 4)
+    import solar_crowdfunding
+    import db
+    import payouts
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+
+    project_wallet = Wallet.create()
+    ledger.fund(project_wallet.classic_address, (args.holders * 2 + 100) * 1000000)
+    holders = [encode_classic_address(os.urandom(20)) for _ in range(args.holders)]
+    with db.transaction() as conn:
+        db.insert_project(conn, "resume", "Synthetic project", "Nowhere", 100.0, args.holders * 10, 50000,
+                          project_wallet.classic_address, project_wallet.seed, 'FUNDING', datetime.now())
+        for address in holders:
+            db.insert_shareholder(conn, str(uuid.uuid4()), "resume", address, 10, datetime.now())
+            db.add_to_position(conn, "resume", address, 10)
+    ledger.close_ledger()
+
+    class Crash(BaseException):
+        pass
+
+    submit_blob = payouts.submit_blob
+    crash_after = int(args.holders * args.crash_at)
+    submitted = [0]
+
+    def crashing_submit(client, tx_blob):
+        if submitted[0] == crash_after:
+            raise Crash()
+        submitted[0] += 1
+        return submit_blob(client, tx_blob)
+
+    payouts.submit_blob = crashing_submit
+    start = time.perf_counter()
+    try:
+        solar_crowdfunding.run_distribute_dividends({"name": "resume", "total_dividend_xrp": args.holders})
+    except Crash:
+        pass
+    crashed_after = time.perf_counter() - start
+    payouts.submit_blob = submit_blob
+    dividend_id = db.list_unfinished_dividends()[0][0]
+    print(f"crashed after {crash_after}/{args.holders} submits ({crashed_after:.2f}s); "
+          f"payouts by status: {db.count_dividend_payouts(dividend_id)}")
+
+    requests_before = ledger.requests_served
+    start = time.perf_counter()
+    body, status = solar_crowdfunding.run_resume_dividend({"dividend_id": dividend_id})
+    elapsed = time.perf_counter() - start
+    print(f"resume: {body['status']} in {elapsed:.2f}s, {ledger.requests_served - requests_before} RPC calls, "
+          f"{body['confirmed']}/{args.holders} confirmed, {body['paid_this_run']} re-signed")
+
+    # Nobody may be paid twice, or not at all.
+    balances = {address: account["Balance"] for address, account in ledger.accounts.items()}
+    assert all(balances.get(address) == 1000000 for address in holders), "holders paid wrongly"
+    assert body["status"] == 'COMPLETED'
+    solar_crowdfunding.ledger_gateway.close()
+    server.shutdown()
+
+
+def bench_buy_batch(args):
+    """Orders/second: /buy_shares one order at a time vs /buy_shares/batch"""
+    use_temp_database()
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    os.environ['LEDGER_POLL_INTERVAL'] = str(args.close_interval / 4)
+    import solar_crowdfunding
+    import db
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+
+    project_wallet = Wallet.create()
+    ledger.fund(project_wallet.classic_address, 100 * 1000000)
+    with db.transaction() as conn:
+        db.insert_project(conn, "batch", "Synthetic project", "Nowhere", 100.0, 10 ** 9, 50000,
+                          project_wallet.classic_address, project_wallet.seed, 'FUNDING', datetime.now())
+    buyers = [Wallet.create() for _ in range(max(args.buyers, args.single))]
+    for wallet in buyers:
+        ledger.fund(wallet.classic_address, 1000 * 1000000)
+    ledger.close_ledger()
+
+    for wallet in buyers[:args.single]:
+        solar_crowdfunding.wallet_pool.add(wallet)
+    start = time.perf_counter()
+    for _ in range(args.single):
+        body, status = solar_crowdfunding.run_buy_shares({"name": "batch", "shares_amount": 10})
+        assert status == 200, body
+    single = args.single / (time.perf_counter() - start)
+    print(f"single orders:  {args.single:5d} orders  {single:8.1f} orders/s")
+
+    orders = [{"name": "batch", "shares_amount": 10, "buyer_seed": buyers[i % args.buyers].seed}
+              for i in range(args.orders)]
+    start = time.perf_counter()
+    body, status = solar_crowdfunding.run_buy_shares_batch({"orders": orders})
+    elapsed = time.perf_counter() - start
+    assert body["confirmed"] == args.orders, [o for o in body["orders"] if o["status"] != 'CONFIRMED'][:3]
+    print(f"batch of {args.orders} ({args.buyers} buyers): {args.orders / elapsed:8.1f} orders/s "
+          f"({elapsed:.2f}s, {args.orders / elapsed / single:.1f}x)")
+    project = db.get_project("batch")
+    assert project[10] == 10 * (args.single + args.orders)
+    solar_crowdfunding.ledger_gateway.close()
+    server.shutdown()
+
+
+def bench_positions(args):
+    """Dividend planning from per-purchase rows vs the positions table"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+    import money
+
+    now = datetime.now()
+    purchases = [(f"rHolder{h}", 1 + (h + p) % 7) for p in range(args.purchases) for h in range(args.holders)]
+    with db.transaction() as conn:
+        db.insert_project(conn, "big", "Synthetic project", "Nowhere", 100.0, 10 ** 9, 50000,
+                          "rProject", "sSeed", 'FUNDING', now)
+    start = time.perf_counter()
+    with db.transaction() as conn:
+        for address, shares in purchases:
+            db.insert_shareholder(conn, str(uuid.uuid4()), "big", address, shares, now)
+            db.add_to_position(conn, "big", address, shares)
+    elapsed = time.perf_counter() - start
+    print(f"{len(purchases)} purchases recorded with positions upkeep: {elapsed / len(purchases) * 1e6:.1f} us each")
+
+    total = 10 ** 12
+
+    def plan_from_purchases():
+        holders = sorted(db.list_shareholders("big"), key=lambda holder: (holder[2], holder[0]))
+        return money.allocate(total, [holder[3] for holder in holders])
+
+    def plan_from_positions():
+        project = db.get_project("big")
+        positions = db.list_positions("big")
+        return money.allocate(total, [position[1] for position in positions], weight_sum=project[10])
+
+    before, after = plan_from_purchases(), plan_from_positions()
+    assert sum(before) == sum(after) == total
+    measure(f"plan from purchases ({len(before)} payments)", plan_from_purchases, args.requests)
+    measure(f"plan from positions ({len(after)} payments)", plan_from_positions, args.requests)
+
+
+def bench_money(args):
+    """Dividend split time for a large holder list, against the float split it replaced"""
+    import money
+
+    rng = random.Random(args.seed)
+    weights = [rng.randint(1, args.max_shares) for _ in range(args.holders)]
+    total = 123456789012
+    measure(f"allocate {args.holders} holders", lambda: money.allocate(total, weights), args.requests)
+
+    def float_split():
+        weight_sum = sum(weights)
+        return [int((w / weight_sum) * (total / 1000000) * 1000000) for w in weights]
+
+    lost = total - sum(float_split())
+    measure(f"float split {args.holders} holders", float_split, args.requests)
+    print(f"float split loses {lost} drops of {total}; allocate loses 0")
+
+
+def oversell_worker(database, mode, threads, orders, ttl, pay_delay, seed):
+    """One buyer process for bench_oversell: `threads` threads placing `orders` orders each"""
+    os.environ['DATABASE'] = database
+    import db
+
+    def buyer(t):
+        rng = random.Random(seed * 1000 + t)
+        counts = {"committed": 0, "rejected": 0, "released": 0, "abandoned": 0, "refund_due": 0}
+        for _ in range(orders):
+            shares = rng.randint(1, 5)
+            holder = f"rBuyer{seed}-{t}-{rng.randrange(20)}"
+            if mode == 'naive':
+                # Check, pay, then record: what a purchase did without reservations.
+                project = db.get_project("scarce")
+                if project[10] + shares > project[4]:
+                    counts["rejected"] += 1
+                    continue
+                time.sleep(rng.uniform(0, pay_delay))
+                with db.transaction() as conn:
+                    db.insert_shareholder(conn, str(uuid.uuid4()), "scarce", holder, shares, datetime.now())
+                    db.add_to_position(conn, "scarce", holder, shares)
+                counts["committed"] += 1
+                continue
+            reservation_id = str(uuid.uuid4())
+            with db.transaction(immediate=True) as conn:
+                reserved = db.reserve_shares(conn, reservation_id, "scarce", shares, ttl)
+            if not reserved:
+                counts["rejected"] += 1
+                continue
+            time.sleep(rng.uniform(0, pay_delay))
+            outcome = rng.random()
+            if outcome < 0.8:
+                with db.transaction(immediate=True) as conn:
+                    committed = db.commit_reservation(conn, reservation_id, holder)
+                    if committed:
+                        db.insert_shareholder(conn, str(uuid.uuid4()), "scarce", holder, shares, datetime.now())
+                        db.add_to_position(conn, "scarce", holder, shares)
+                counts["committed" if committed else "refund_due"] += 1
+            elif outcome < 0.9:
+                with db.transaction(immediate=True) as conn:
+                    db.release_reservation(conn, reservation_id)
+                counts["released"] += 1
+            else:
+                counts["abandoned"] += 1  # never paid; left to expire
+        db.close_connection()
+        return counts
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(buyer, range(threads)))
+    return {key: sum(counts[key] for counts in results) for key in results[0]}
+
+
+def bench_oversell(args):
+    """Many buyer processes racing for a scarce project, checking then paying vs reserving first"""
+    database = use_temp_database()
+    import solar_crowdfunding
+    import db
+
+    for mode in ('naive', 'reserve'):
+        with db.transaction(immediate=True) as conn:
+            conn.execute('DELETE FROM reservations')
+            conn.execute('DELETE FROM positions')
+            conn.execute('DELETE FROM shareholders')
+            conn.execute('DELETE FROM projects')
+            db.insert_project(conn, "scarce", "Synthetic project", "Nowhere", 100.0, args.supply, 50000,
+                              "rProject", "sSeed", 'FUNDING', datetime.now())
+        context = multiprocessing.get_context('spawn')
+        start = time.perf_counter()
+        with context.Pool(args.processes) as pool:
+            results = pool.starmap(oversell_worker, [
+                (database, mode, args.threads, args.orders, args.ttl, args.pay_delay, seed)
+                for seed in range(args.processes)])
+        elapsed = time.perf_counter() - start
+        counts = {key: sum(result[key] for result in results) for key in results[0]}
+        attempts = args.processes * args.threads * args.orders
+
+        project = db.get_project("scarce")
+        oversold = max(project[10] - args.supply, 0)
+        print(f"{mode:<8} {args.processes}x{args.threads} buyers, {attempts} orders in {elapsed:.2f}s "
+              f"({attempts / elapsed:.0f} orders/s): sold {project[10]}/{args.supply}, oversold {oversold}, {counts}")
+
+
+def bench_snapshots(args):
+    """GET /project/<name>: rebuilt per request vs the snapshot cache, its SQLite copy and 304s"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+    from snapshot_cache import SnapshotCache
+
+    with db.transaction() as conn:
+        seed_database(conn, args.projects, args.holders, args.dividends)
+    solar_crowdfunding.check_wallet_balance = lambda address: 0
+    client = solar_crowdfunding.app.test_client()
+    cache = solar_crowdfunding.project_snapshots
+    names = [f"project-{p:06d}" for p in range(args.projects)]
+    rng = random.Random(1)
+
+    def read(headers=None):
+        # Popular projects get most of the traffic.
+        name = names[min(int(rng.paretovariate(1.2)) - 1, len(names) - 1)]
+        return client.get(f"/project/{name}", headers=headers)
+
+    cache.ttl = 0  # every request rebuilds, as before the cache
+    rebuilt = measure("rebuilt every request", read, args.requests)
+    cache.ttl = 60
+    before = cache.stats()
+    cached = measure("snapshot cache", read, args.requests)
+    after = cache.stats()
+    hit_ratio = (after["hits"] - before["hits"]) / args.requests
+
+    first = client.get(f"/project/{names[0]}")
+    etag = first.headers['ETag']
+    assert client.get(f"/project/{names[0]}", headers={'If-None-Match': etag}).status_code == 304
+    not_modified = measure("If-None-Match (304)",
+                           lambda: client.get(f"/project/{names[0]}", headers={'If-None-Match': etag}),
+                           args.requests)
+    with db.transaction() as conn:
+        db.add_to_position(conn, names[0], "rNewHolder", 1)
+    changed = client.get(f"/project/{names[0]}", headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.json["project"]["shares_sold"] == 10 * args.holders + 1
+
+    # Another process's view: nothing in memory, snapshots shared through SQLite.
+    solar_crowdfunding.project_snapshots = SnapshotCache(
+        solar_crowdfunding.build_project_snapshot, db.get_project_version, max_entries=0, ttl=60,
+        store=solar_crowdfunding.ProjectSnapshotStore())
+    for name in names:
+        client.get(f"/project/{name}")
+    stored = measure("SQLite snapshot copy", read, args.requests)
+    print(f"memory hit ratio {hit_ratio:.3f}; speedup {rebuilt / cached:.1f}x cached, "
+          f"{rebuilt / not_modified:.1f}x 304, {rebuilt / stored:.1f}x from SQLite copy")
+
+
+def bench_scheduler(args):
+    """Scheduled dividends for many projects from a synthetic production feed"""
+    use_temp_database()
+    import math
+    from xrpl.core.addresscodec import encode_classic_address
+
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    os.environ['LEDGER_POLL_INTERVAL'] = str(args.close_interval / 4)
+    import solar_crowdfunding
+    import db
+    import jobs
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+    client = solar_crowdfunding.app.test_client()
+
+    names = [f"solar-{p:04d}" for p in range(args.projects)]
+    with db.transaction() as conn:
+        for name in names:
+            wallet = Wallet.create()
+            ledger.fund(wallet.classic_address, 1000 * 1000000)
+            db.insert_project(conn, name, "Synthetic project", "Nowhere", 100.0, 10 ** 6, 50000,
+                              wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+            for h in range(args.holders):
+                db.add_to_position(conn, name, encode_classic_address(os.urandom(20)), h + 1)
+    ledger.close_ledger()
+
+    def feed(first_hour, hours):
+        """Hourly readings of a 100 kW plant on a daylight curve, as CSV, and the Wh per project"""
+        lines = ["name,read_at,kwh"]
+        produced = dict.fromkeys(names, 0)
+        start = time.time() - 86400 * 400
+        for p, name in enumerate(names):
+            for hour in range(first_hour, first_hour + hours):
+                kwh = f"{max(0.0, 100 * math.sin((hour % 24 - 6) / 12 * math.pi)) * (0.8 + p % 5 / 20):.3f}"
+                lines.append(f"{name},{start + hour * 3600},{kwh}")
+                produced[name] += round(float(kwh) * 1000)
+        return "\n".join(lines), produced
+
+    def ingest(csv_text):
+        rows = csv_text.count("\n")
+        start = time.perf_counter()
+        response = client.post("/production_readings", data=csv_text, content_type='text/csv')
+        assert response.status_code == 200, response.json
+        elapsed = time.perf_counter() - start
+        print(f"ingested {rows} readings in {elapsed:.2f}s ({rows / elapsed:.0f} readings/s)")
+
+    def settle(cycle):
+        start = time.perf_counter()
+        while db.query_one("SELECT COUNT(*) FROM jobs WHERE status IN ('QUEUED', 'RUNNING')")[0]:
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        failed = db.query_all("SELECT kind, result FROM jobs WHERE status = 'FAILED'")
+        assert not failed, failed[:3]
+        payments = len(cycle["enqueued"]) * args.holders
+        print(f"{len(cycle['enqueued'])} dividends ({payments} payments) paid by {args.workers} workers "
+              f"in {elapsed:.1f}s ({payments / elapsed:.1f} payments/s)")
+
+    def check(produced):
+        paid = dict(db.query_all('''
+            SELECT d.project_name, d.amount_drops FROM dividends d WHERE d.distribution_date = (
+                SELECT MAX(distribution_date) FROM dividends WHERE project_name = d.project_name)
+        '''))
+        for name in names:
+            assert paid[name] == produced[name] * tariff // 1000, (name, paid[name], produced[name])
+        unpaid = db.query_one("SELECT COUNT(*) FROM dividend_payouts WHERE status != 'CONFIRMED'")[0]
+        assert unpaid == 0, unpaid
+
+    tariff = 130  # drops per kWh
+    csv_text, produced = feed(0, args.days * 24)
+    ingest(csv_text)
+    now = time.time()
+    for name in names:
+        response = client.post("/dividend_schedule", json={
+            "name": name, "tariff_xrp_per_kwh": tariff / 1000000, "interval_days": 91, "first_run_at": now})
+        assert response.status_code == 200, response.json
+
+    cycle = solar_crowdfunding.dividend_scheduler.run_cycle(now)
+    print(f"cycle over {args.projects} due projects took {cycle['elapsed_seconds'] * 1000:.1f} ms")
+    assert len(cycle["enqueued"]) == args.projects, cycle["skipped"][:3]
+    assert not solar_crowdfunding.dividend_scheduler.run_cycle(now)["enqueued"], "paid twice"
+    jobs.start_workers(args.workers)
+    settle(cycle)
+    check(produced)
+
+    # A quarter later only the readings that arrived since are paid.
+    csv_text, produced = feed(args.days * 24, 24)
+    ingest(csv_text)
+    cycle = solar_crowdfunding.dividend_scheduler.run_cycle(now + 91 * 86400)
+    assert len(cycle["enqueued"]) == args.projects
+    settle(cycle)
+    check(produced)
+    print("every dividend equals its new production times the tariff")
+    jobs.stop_workers()
+    solar_crowdfunding.ledger_gateway.close()
+    server.shutdown()
+
+
+def bench_production(args):
+    """Ingest a year of meter readings, then chart it from rollups vs aggregating raw readings"""
+    use_temp_database()
+    import math
+    import solar_crowdfunding
+    import db
+
+    with db.transaction() as conn:
+        seed_database(conn, args.projects, 1, 0)
+    client = solar_crowdfunding.app.test_client()
+    names = [f"project-{p:06d}" for p in range(args.projects)]
+    start = 1735689600  # 2025-01-01 UTC
+    step = 86400 / args.readings_per_day
+
+    # One POST per day, carrying that day's readings for every project.
+    batches = []
+    for day in range(365):
+        lines = ["name,read_at,kwh"]
+        for name in names:
+            for i in range(args.readings_per_day):
+                hour = i * 24 / args.readings_per_day
+                kwh = max(0.0, math.sin((hour - 6) / 12 * math.pi)) * 100 / args.readings_per_day * 24
+                lines.append(f"{name},{start + day * 86400 + i * step},{kwh:.3f}")
+        batches.append("\n".join(lines))
+    readings = len(names) * args.readings_per_day * 365
+    began = time.perf_counter()
+    for batch in batches:
+        response = client.post("/production_readings", data=batch, content_type='text/csv')
+        assert response.status_code == 200 and not response.json["duplicates"], response.json
+    elapsed = time.perf_counter() - began
+    print(f"ingested {readings} readings in {len(batches)} batches in {elapsed:.1f}s "
+          f"({readings / elapsed:.0f} readings/s, rollups included)")
+    resent = client.post("/production_readings", data=batches[0], content_type='text/csv').json
+    assert resent["inserted"] == 0, resent
+
+    year = {"start": start, "end": start + 365 * 86400}
+    for resolution in db.PRODUCTION_BUCKETS:
+        body = client.get(f"/production/{names[0]}", query_string=dict(year, resolution=resolution)).json
+        measure(f"year by {resolution} ({len(body['bucket_start'])})",
+                lambda: client.get(f"/production/{names[0]}", query_string=dict(year, resolution=resolution)),
+                args.requests)
+
+    def raw_days():
+        return db.query_all(f'''
+            SELECT {db.PRODUCTION_BUCKETS['day']} AS bucket_start, SUM(wh), COUNT(*) FROM production_readings
+            WHERE project_name = ? AND read_at >= ? AND read_at < ? GROUP BY bucket_start ORDER BY bucket_start
+        ''', (names[0], year["start"], year["end"]))
+    measure("raw readings by day", raw_days, max(args.requests // 10, 1))
+    assert raw_days() == db.get_production_series(names[0], 'day', year["start"], year["end"])
+    print("rollups match the raw readings")
+
+
+def bench_analytics(args):
+    """/portfolio and /yield on a million purchases: uncached SQL, cached, and the old full scan"""
+    use_temp_database()
+    import solar_crowdfunding
+    import db
+
+    rng = random.Random(1)
+    now = datetime.now()
+    began = time.perf_counter()
+    with db.transaction() as conn:
+        for p in range(args.projects):
+            name = f"project-{p:06d}"
+            conn.execute('INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                name, "Synthetic project", "Nowhere", 100.0, 10 ** 6, 50000,
+                f"rProject{p}", "sSeed", 'FUNDING', now - timedelta(days=rng.randint(30, 1000)), 0, 0))
+            db.bump_project_version(conn, name)
+            conn.executemany('INSERT INTO shareholders VALUES (?, ?, ?, ?, ?)', [
+                (str(uuid.uuid4()), name, f"rHolder{rng.randrange(args.holders)}", rng.randint(1, 100), now)
+                for _ in range(args.purchases)])
+        conn.execute('''
+            INSERT INTO positions SELECT project_name, holder_wallet_address, SUM(shares_amount)
+            FROM shareholders GROUP BY project_name, holder_wallet_address
+        ''')
+        conn.execute('''
+            UPDATE projects SET shares_sold = (SELECT SUM(shares) FROM positions WHERE project_name = name)
+        ''')
+        # Completed dividends, then one still being paid with half its payouts confirmed.
+        for d in range(args.dividends):
+            status = 'COMPLETED' if d < args.dividends - 1 else 'PARTIAL'
+            conn.execute('''
+                INSERT INTO dividends (id, project_name, amount_drops, distribution_date, status)
+                SELECT name || '-' || ?, name, 0, ?, ? FROM projects
+            ''', (d, now, status))
+            conn.execute('''
+                INSERT INTO dividend_payouts (dividend_id, holder_wallet_address, drops, status)
+                SELECT project_name || '-' || ?, holder_wallet_address, shares * 7,
+                       CASE WHEN ? = 'COMPLETED' OR rowid % 2 THEN 'CONFIRMED' ELSE 'SIGNED' END
+                FROM positions
+            ''', (d, status))
+        conn.execute('''
+            UPDATE dividends SET amount_drops = (
+                SELECT SUM(drops) FROM dividend_payouts WHERE dividend_id = dividends.id)
+        ''')
+    purchases = db.query_one('SELECT COUNT(*) FROM shareholders')[0]
+    payouts = db.query_one('SELECT COUNT(*) FROM dividend_payouts')[0]
+    print(f"seeded {purchases} purchases and {payouts} payouts in {time.perf_counter() - began:.1f}s")
+
+    client = solar_crowdfunding.app.test_client()
+    holders = [f"rHolder{h}" for h in range(args.holders)]
+    names = [f"project-{p:06d}" for p in range(args.projects)]
+    hot = holders[:100]
+
+    def expected_portfolio(holder):
+        """Received and invested drops recomputed from the raw tables"""
+        invested = sum(row[0] * 50000 for row in db.query_all(
+            'SELECT shares_amount FROM shareholders WHERE holder_wallet_address = ?', (holder,)))
+        received = db.query_one('''
+            SELECT COALESCE(SUM(drops), 0) FROM dividend_payouts
+            WHERE holder_wallet_address = ? AND status = 'CONFIRMED'
+        ''', (holder,))[0]
+        return invested, received
+
+    for holder in hot[:10]:
+        body = client.get(f"/portfolio/{holder}").json
+        assert (body["invested_drops"], body["dividends_received_drops"]) == expected_portfolio(holder), holder
+    paid = dict(db.query_all('''
+        SELECT d.project_name, SUM(dp.drops) FROM dividend_payouts dp JOIN dividends d ON d.id = dp.dividend_id
+        WHERE dp.status = 'CONFIRMED' GROUP BY d.project_name
+    '''))
+    assert all(p["dividends_paid_drops"] == paid[p["name"]] for p in client.get("/yield").json["projects"])
+    print("portfolios and yields match the raw tables")
+
+    caches = (solar_crowdfunding.portfolios, solar_crowdfunding.project_yields,
+              solar_crowdfunding.all_project_yields)
+    for cache in caches:
+        cache.ttl = 0  # every request recomputes
+    measure("portfolio, uncached", lambda: client.get(f"/portfolio/{rng.choice(holders)}"), args.requests)
+    measure("project yield, uncached", lambda: client.get(f"/yield/{rng.choice(names)}"), args.requests)
+    measure("all yields, uncached", lambda: client.get("/yield"), max(args.requests // 100, 1))
+    for cache in caches:
+        cache.ttl = 300
+    measure("portfolio, cached", lambda: client.get(f"/portfolio/{rng.choice(hot)}"), args.requests)
+    measure("project yield, cached", lambda: client.get(f"/yield/{rng.choice(names)}"), args.requests)
+    measure("all yields, cached", lambda: client.get("/yield"), args.requests)
+
+    def full_scan():
+        """What a portfolio took before: every purchase of every project"""
+        return sum(row[3] for row in db.list_all_shareholders() if row[2] == hot[0])
+    measure("portfolio from a full scan", full_scan, 1)
+
+    # A purchase invalidates the holder's cached portfolio and the project's yield.
+    before = client.get(f"/portfolio/{hot[0]}").json["invested_drops"]
+    with db.transaction() as conn:
+        db.add_to_position(conn, names[0], hot[0], 2)
+    assert client.get(f"/portfolio/{hot[0]}").json["invested_drops"] == before + 2 * 50000
+    assert client.get(f"/yield/{names[0]}").json["shares_sold"] == db.get_project(names[0])[10]
+    print("a purchase invalidates the cached portfolio and yield")
+
+
+def bench_tokens(args):
+    """Tokenize a project, open every holder's trust line pipelined and deliver their tokens"""
+    use_temp_database()
+    from decimal import Decimal
+
+    from xrpl.transaction import submit_and_wait
+
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    os.environ['LEDGER_POLL_INTERVAL'] = str(args.close_interval / 4)
+    import solar_crowdfunding
+    import db
+    import tokens
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+
+    shares_each = args.shares // args.holders
+    start = time.perf_counter()
+    holders = [Wallet.create() for _ in range(args.holders)]
+    project_wallet = Wallet.create()
+    print(f"created {args.holders + 1} wallets in {time.perf_counter() - start:.1f}s")
+    ledger.fund(project_wallet.classic_address, 1000 * 1000000)
+    for wallet in holders:
+        ledger.fund(wallet.classic_address, 20 * 1000000)
+    with db.transaction() as conn:
+        db.insert_project(conn, "solar-token", "Synthetic project", "Nowhere", 100.0, args.shares + 100, 1000,
+                          project_wallet.classic_address, project_wallet.seed, 'FUNDING', datetime.now())
+        for wallet in holders:
+            db.add_to_position(conn, "solar-token", wallet.classic_address, shares_each)
+    ledger.close_ledger()
+
+    body, status = solar_crowdfunding.run_tokenize_project({"name": "solar-token"})
+    assert status == 200 and body["awaiting_trust_lines"] == args.holders, body
+    issuer, currency = body["issuer"], body["currency"]
+    # Tokenizing again is a no-op.
+    assert solar_crowdfunding.run_tokenize_project({"name": "solar-token"})[0]["awaiting_trust_lines"] == 0
+
+    # Delivering before any trust line exists sends nothing.
+    report, _ = solar_crowdfunding.deliver_tokens(db.get_project("solar-token"))
+    assert report["confirmed"] == 0, report
+
+    # Sequential baseline on a sample: autofill, sign and wait per trust line.
+    sample = holders[:args.sample]
+    start = time.perf_counter()
+    for wallet in sample:
+        result = submit_and_wait(tokens.trust_set(wallet.classic_address, issuer, args.shares),
+                                 solar_crowdfunding.client, wallet)
+        assert result.result["meta"]["TransactionResult"] == 'tesSUCCESS', result.result
+    sequential = (time.perf_counter() - start) / len(sample)
+    print(f"sequential submit_and_wait: {sequential * 1000:.0f} ms per trust line "
+          f"(~{sequential * args.holders:.0f}s for {args.holders})")
+
+    start = time.perf_counter()
+    body, status = solar_crowdfunding.run_open_trust_lines({
+        "name": "solar-token", "holder_seeds": [wallet.seed for wallet in holders]})
+    elapsed = time.perf_counter() - start
+    assert status == 200, body
+    delivery = body["delivery"]
+    print(f"pipelined: {body['opened']} trust lines opened and {delivery['confirmed']} deliveries "
+          f"confirmed in {elapsed:.1f}s ({elapsed / args.holders * 1000:.1f} ms per holder, "
+          f"delivery {delivery['elapsed_seconds']:.1f}s, "
+          f"{sequential * args.holders / elapsed:.1f}x the sequential estimate for trust lines alone)")
+    assert body["opened"] == args.holders and delivery["confirmed"] == args.holders, delivery
+
+    balances = [ledger.line_balance(wallet.classic_address, issuer, currency) for wallet in holders]
+    assert all(balance == Decimal(shares_each) for balance in balances)
+    positions = dict(db.query_all("SELECT holder_wallet_address, shares FROM positions "
+                                  "WHERE project_name = 'solar-token'"))
+    assert sum(balances) == sum(positions.values()) == shares_each * args.holders
+    info = solar_crowdfunding.get_token_info("solar-token")
+    assert info["tokens_delivered"] == sum(positions.values()), info
+    print(f"{info['tokens_delivered']} tokens on the ledger match {len(positions)} positions")
+
+    # A purchase in a tokenized project opens the buyer's trust line with it.
+    buyer = Wallet.create()
+    ledger.fund(buyer.classic_address, 1000 * 1000000)
+    solar_crowdfunding.wallet_pool.add(buyer)
+    body, status = solar_crowdfunding.run_buy_shares({"name": "solar-token", "shares_amount": 7})
+    assert status == 200 and body["token"]["trust_line"] == 'tesSUCCESS', body
+    solar_crowdfunding.run_deliver_tokens({"name": "solar-token"})
+    assert ledger.line_balance(buyer.classic_address, issuer, currency) == 7
+    print("tokenized purchase: trust line and 7 tokens delivered")
+    solar_crowdfunding.ledger_gateway.close()
+    server.shutdown()
+
+
+def bench_holder_snapshot(args):
+    """Snapshot a tokenized project's holders from paginated account_lines, resuming mid-way"""
+    use_temp_database()
+    from xrpl.core.addresscodec import encode_classic_address
+
+    from ledger_gateway import LedgerGateway
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    import solar_crowdfunding
+    import db
+    import money
+    import tokens
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    gateway = solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+
+    def tokenized_project(name, wallet):
+        ledger.fund(wallet.classic_address, 1000 * 1000000)
+        with db.transaction() as conn:
+            db.insert_project(conn, name, "Synthetic project", "Nowhere", 100.0, 10 ** 9, 1000,
+                              wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+            db.insert_project_token(conn, name, tokens.CURRENCY, wallet.classic_address, datetime.now())
+
+    issuer = Wallet.create()
+    tokenized_project("solar-lines", issuer)
+    rng = random.Random(7)
+    expected = {}
+    for i in range(args.lines):
+        holder = encode_classic_address(os.urandom(20))
+        balance = rng.randint(0, 40)
+        ledger.set_line(holder, issuer.classic_address, tokens.CURRENCY, balance, 10 ** 6)
+        if balance:
+            expected[holder] = balance
+    # Lines in another currency, or holding only a fraction of a token, are not shares.
+    for i in range(100):
+        ledger.set_line(encode_classic_address(os.urandom(20)), issuer.classic_address, "USD", 5, 100)
+        ledger.set_line(encode_classic_address(os.urandom(20)), issuer.classic_address, tokens.CURRENCY,
+                        "0.5", 100)
+    ledger.close_ledger()
+    project = db.get_project("solar-lines")
+    print(f"{args.lines + 200} trust lines, {len(expected)} holding tokens")
+
+    # Tokens keep moving while the snapshot is paged in; it must see its own ledger only.
+    pages_read = [0]
+    real_request = gateway.request
+
+    def moving_request(request, fail_after=None):
+        pages_read[0] += 1
+        if pages_read[0] == 10:
+            ledger.close_ledger()
+            for holder in list(expected)[:1000]:
+                ledger.set_line(holder, issuer.classic_address, tokens.CURRENCY, 0, 10 ** 6)
+            ledger.close_ledger()
+        if fail_after is not None and pages_read[0] > fail_after:
+            raise Exception("connection reset")
+        return real_request(request)
+
+    def check(snapshot):
+        assert snapshot[6] == 'COMPLETE', snapshot
+        assert snapshot[8] == len(expected) and snapshot[9] == sum(expected.values()), snapshot
+        assert dict(db.list_holder_snapshot_lines(snapshot[0])) == expected
+
+    gateway.request = moving_request
+    start = time.perf_counter()
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    elapsed = time.perf_counter() - start
+    check(snapshot)
+    print(f"snapshot at ledger {snapshot[4]}: {snapshot[8]} holders, {snapshot[9]} tokens, {snapshot[7]} pages "
+          f"in {elapsed:.2f}s ({(args.lines + 200) / elapsed:.0f} lines/s), despite 1000 lines emptied mid-way")
+
+    # Interrupted after a third of the pages, then resumed from the stored marker.
+    with db.transaction() as conn:
+        db.discard_holder_snapshot(conn, snapshot[0], 'FAILED')
+    for holder in list(expected)[:1000]:
+        ledger.set_line(holder, issuer.classic_address, tokens.CURRENCY, expected[holder], 10 ** 6)
+    ledger.close_ledger()
+    pages = snapshot[7]
+    pages_read[0] = 10  # no more moving tokens
+    gateway.request = lambda request: moving_request(request, fail_after=10 + pages // 3)
+    try:
+        solar_crowdfunding.build_holder_snapshot(project)
+        raise AssertionError("the build should have been interrupted")
+    except Exception as e:
+        assert str(e) == "connection reset", e
+    partial = db.get_building_holder_snapshot("solar-lines")
+    print(f"interrupted after {partial[7]} of {pages} pages")
+    gateway.request = moving_request
+    pages_read[0] = 10
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    assert snapshot[0] == partial[0] and snapshot[7] == pages, snapshot
+    assert pages_read[0] - 10 == pages - partial[7], pages_read
+    check(snapshot)
+    print(f"resumed: {pages_read[0] - 10} more pages read, same {snapshot[8]} holders")
+
+    # Memory: the snapshot streams pages to SQLite; collecting every line first grows with the lines.
+    tracemalloc.start()
+    with db.transaction() as conn:
+        db.discard_holder_snapshot(conn, snapshot[0], 'FAILED')
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    streamed = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    collected, marker = [], None
+    while True:
+        holders, marker = tokens.page_account_lines(gateway.request, issuer.classic_address, snapshot[4], marker)
+        collected.extend(holders)
+        if marker is None:
+            break
+    in_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"peak memory: streamed {streamed / 1e6:.1f} MB, all lines in memory {in_memory / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    positions = db.list_holder_snapshot_lines(snapshot[0])
+    shares = money.allocate(10 ** 9, [position[1] for position in positions], weight_sum=snapshot[9])
+    print(f"planning a dividend from the snapshot: {(time.perf_counter() - start) * 1000:.0f} ms")
+    assert sum(shares) == 10 ** 9
+
+    # A snapshot whose ledger the node has dropped is begun again.
+    with db.transaction() as conn:
+        db.insert_holder_snapshot(conn, "stale", "solar-lines", issuer.classic_address, tokens.CURRENCY, 5,
+                                  datetime.now())
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    assert snapshot[0] != "stale" and db.get_holder_snapshot("stale")[6] == 'FAILED'
+    check(snapshot)
+
+    # End to end: a dividend in a tokenized project pays the ledger's holders, not positions.
+    holders = [Wallet.create() for _ in range(args.paid_holders)]
+    payer = Wallet.create()
+    tokenized_project("solar-paid", payer)
+    for h, wallet in enumerate(holders):
+        ledger.set_line(wallet.classic_address, payer.classic_address, tokens.CURRENCY, h + 1, 10 ** 6)
+    with db.transaction() as conn:
+        db.add_to_position(conn, "solar-paid", holders[0].classic_address, 10 ** 6)
+    ledger.close_ledger()
+    weights = sum(range(1, args.paid_holders + 1))
+    body, status = solar_crowdfunding.run_distribute_dividends({"name": "solar-paid",
+                                                                 "total_dividend_drops": weights * 1000})
+    assert status == 200 and body["confirmed"] == args.paid_holders, body
+    assert [d["amount_drops"] for d in sorted(body["distributions"], key=lambda d: d["amount_drops"])] == \
+        [(h + 1) * 1000 for h in range(args.paid_holders)]
+    assert body["holder_snapshot"]["status"] == 'CONSUMED'
+    assert not db.list_holder_snapshot_lines(body["holder_snapshot"]["snapshot_id"])
+    print(f"dividend paid {args.paid_holders} ledger holders pro rata; snapshot consumed and its lines dropped")
+    gateway.close()
+    server.shutdown()
+
+
+def bench_indexer(args):
+    """Catch a project wallet with a long history up in SQLite, resume after a crash, then read locally"""
+    use_temp_database()
+    from xrpl.models.requests import AccountTx
+
+    from ledger_gateway import LedgerGateway
+    from ledger_indexer import LedgerIndexer
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval)
+    import solar_crowdfunding
+    import db
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    gateway = solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+    client = solar_crowdfunding.app.test_client()
+
+    wallets = [Wallet.create() for _ in range(args.wallets)]
+    payers = [Wallet.create().classic_address for _ in range(10)]
+    for address in payers:
+        ledger.fund(address, 10 ** 15)
+    with db.transaction() as conn:
+        for p, wallet in enumerate(wallets):
+            ledger.fund(wallet.classic_address, 1000 * 1000000)
+            db.insert_project(conn, f"solar-{p:03d}", "Synthetic project", "Nowhere", 100.0, 10 ** 6, 1000,
+                              wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+    big = wallets[0].classic_address
+
+    def history(address, count):
+        """Payments in and out of a wallet, and some that fail, a few hundred per ledger"""
+        for i in range(count):
+            if i % 10 == 9:
+                ledger.pay(address, payers[i % 10], 1000 if i % 20 == 9 else 10 ** 13)  # the latter fails
+            else:
+                ledger.pay(payers[i % 10], address, 1000 + i)
+            if i % 300 == 299:
+                ledger.close_ledger()
+        ledger.close_ledger()
+
+    start = time.perf_counter()
+    history(big, args.transactions)
+    for wallet in wallets[1:]:
+        history(wallet.classic_address, 20)
+    print(f"seeded {args.transactions} transactions on one wallet and 20 on {args.wallets - 1} others "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    def check(address, transactions):
+        balance = ledger.validated_accounts[address]["Balance"]
+        indexed = db.get_wallet_index(address)
+        assert indexed[0] == balance and indexed[2] == transactions, (indexed, balance, transactions)
+        moved = db.query_one('SELECT SUM(delta_drops) - SUM(fee_drops), COUNT(*) FROM wallet_transactions '
+                             'WHERE address = ?', (address,))
+        assert moved == (balance - 1000 * 1000000, transactions), moved
+
+    # The process dies a third of the way through the catch-up...
+    pages = -(-args.transactions // 400)
+    calls = [0]
+    real_request_many = gateway.request_many
+
+    def crashing_request_many(requests):
+        calls[0] += 1
+        if calls[0] > 2 + pages // 3:
+            raise Exception("process killed")
+        return real_request_many(requests)
+
+    indexer = LedgerIndexer(crashing_request_many, batch_size=args.wallets)
+    start = time.perf_counter()
+    try:
+        indexer.run_cycle()
+        raise AssertionError("the catch-up should have been interrupted")
+    except Exception as e:
+        assert str(e) == "process killed", e
+    indexed = db.get_wallet_index(big)
+    assert indexed[1] is None
+    print(f"interrupted with {indexed[2]} of {args.transactions} transactions indexed")
+
+    # ...and a new one carries on from the stored marker.
+    big_pages = [0]
+
+    def counting_request_many(requests):
+        big_pages[0] += sum(1 for r in requests if isinstance(r, AccountTx) and r.account == big)
+        return real_request_many(requests)
+
+    tracemalloc.start()
+    indexer = LedgerIndexer(counting_request_many, batch_size=args.wallets)
+    report = indexer.run_cycle()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    check(big, args.transactions)
+    for wallet in wallets[1:]:
+        check(wallet.classic_address, 20)
+    assert big_pages[0] == pages - indexed[2] // 400, big_pages
+    total = args.transactions + 20 * (args.wallets - 1)
+    print(f"caught up {total} transactions of {args.wallets} wallets in {elapsed:.1f}s "
+          f"({total / elapsed:.0f} transactions/s); resume read {big_pages[0]} of {pages} pages, "
+          f"peak memory {peak / 1e6:.1f} MB")
+
+    # Later cycles only read what is new.
+    history(big, 100)
+    start = time.perf_counter()
+    report = indexer.run_cycle()
+    check(big, args.transactions + 100)
+    assert report["transactions"] == 100, report
+    print(f"incremental cycle over {args.wallets} wallets: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"for 100 new transactions")
+    start = time.perf_counter()
+    assert indexer.run_cycle()["transactions"] == 0
+    print(f"idle cycle: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Reads: SQLite against asking the ledger.
+    def timed(label, read):
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            read()
+        elapsed = (time.perf_counter() - start) / args.requests
+        print(f"{label}: {elapsed * 1000:.2f} ms")
+        return elapsed
+
+    timed("balance from the index", lambda: db.get_wallet_index(big))
+    timed("balance from the ledger", lambda: solar_crowdfunding.fetch_wallet_balance(big))
+    timed("100 newest transactions from the index", lambda: client.get("/wallet_history/solar-000?limit=100"))
+    timed("100 newest transactions from the ledger",
+          lambda: gateway.request(AccountTx(account=big, limit=100)))
+    page = client.get("/wallet_history/solar-000?limit=100").json
+    assert page["balance_drops"] == ledger.validated_accounts[big]["Balance"]
+    older = client.get(f"/wallet_history/solar-000?limit=100&before={page['next_before']}").json
+    assert (older["transactions"][0]["ledger_index"], older["transactions"][0]["transaction_index"]) < \
+        (page["transactions"][-1]["ledger_index"], page["transactions"][-1]["transaction_index"])
+    project = client.get("/project/solar-000").json["project"]
+    assert project["current_balance_xrp"] == ledger.validated_accounts[big]["Balance"] / 1000000
+    gateway.close()
+    server.shutdown()
+
+
+def bench_ledger_pool(args):
+    """Route ledger calls over fast and slow nodes, fail over when the fast one goes down, bound retries"""
+    use_temp_database()
+    from ledger_pool import EndpointPool
+    from ledger_gateway import LedgerGateway, PooledJsonRpcClient
+
+    ledger, primary = fake_ledger.serve(close_interval=args.close_interval)
+    primary.shutdown()
+    latencies = {"slow": args.slow, "medium": args.medium, "fast": args.fast}
+    servers = {name: fake_ledger.serve(latency=latency, ledger=ledger)[1] for name, latency in latencies.items()}
+    urls = {name: fake_ledger.server_url(server) for name, server in servers.items()}
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, 1000 * 1000000)
+    ledger.close_ledger()
+    account_info = AccountInfo(account=wallet.classic_address, ledger_index="validated")
+
+    def timed(label, request, count):
+        errors = 0
+        start = time.perf_counter()
+        for _ in range(count):
+            try:
+                if not request(account_info).is_successful():
+                    errors += 1
+            except Exception:
+                errors += 1
+        elapsed = (time.perf_counter() - start) / count
+        print(f"{label}: {elapsed * 1000:.1f} ms per call, {errors} errors")
+        return elapsed, errors
+
+    # Today: one node, and a new connection per call.
+    single, _ = timed(f"one slow node ({args.slow * 1000:.0f} ms)", JsonRpcClient(urls["slow"]).request,
+                      args.requests)
+    timed(f"one fast node ({args.fast * 1000:.0f} ms)", JsonRpcClient(urls["fast"]).request, args.requests)
+
+    # The endpoint the app used to pin is listed first; the pool still routes to the fastest.
+    os.environ['XRPL_ENDPOINTS'] = ",".join(urls[name] for name in ("slow", "medium", "fast"))
+    os.environ['LEDGER_HEALTH_INTERVAL'] = str(args.health_interval)
+    import solar_crowdfunding
+    import db
+    pool = solar_crowdfunding.ensure_pool()
+    by_url = {endpoint.url: endpoint for endpoint in pool.endpoints}
+    client = solar_crowdfunding.ensure_client()
+    assert isinstance(client, PooledJsonRpcClient)
+    served = {url: endpoint.requests for url, endpoint in by_url.items()}
+    pooled, errors = timed("pool of three", client.request, args.requests)
+    assert errors == 0
+    served = {name: by_url[url].requests - served[url] for name, url in urls.items()}
+    assert served["fast"] >= args.requests, served
+    print(f"  {single / pooled:.1f}x faster than the slow node alone; requests per node "
+          f"(health probes included): {served}")
+
+    # Concurrent reads through the async gateway share the pool's routing.
+    gateway = solar_crowdfunding.ensure_gateway()
+    start = time.perf_counter()
+    responses = gateway.request_many([account_info] * args.requests)
+    assert all(response.is_successful() for response in responses)
+    print(f"gateway over the pool: {args.requests} concurrent calls in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    plain = LedgerGateway(urls["slow"])
+    start = time.perf_counter()
+    assert all(response.is_successful() for response in plain.request_many([account_info] * args.requests))
+    print(f"gateway on the slow node: {args.requests} concurrent calls in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    plain.close()
+
+    # The fast node drops out mid-run: calls move on without an error, and come back once it recovers.
+    failovers = pool.failovers
+    results = []
+    for i in range(args.requests):
+        if i == args.requests // 2:
+            servers["fast"].unavailable = True
+        results.append(client.request(account_info).is_successful())
+    assert all(results), results.count(False)
+    assert pool.failovers - failovers == 1, pool.stats()
+    print(f"fast node down mid-run: {args.requests} calls, 0 errors, {pool.failovers - failovers} failover, "
+          f"then routed to the {min(('slow', 'medium'), key=lambda n: by_url[urls[n]].latency)} node")
+    assert not next(e for e in pool.stats()["endpoints"] if e["url"] == urls["fast"])["healthy"]
+    servers["fast"].unavailable = False
+    deadline = time.time() + args.health_interval * 3 + 5
+    while not next(e for e in pool.stats()["endpoints"] if e["url"] == urls["fast"])["healthy"]:
+        assert time.time() < deadline, "the health check never brought the fast node back"
+        time.sleep(0.05)
+    served = by_url[urls["fast"]].requests
+    timed("after recovery", client.request, args.requests)
+    assert by_url[urls["fast"]].requests - served >= args.requests
+    print("  the health check brought the fast node back and calls returned to it")
+
+    # App reads keep working while a node is down.
+    with db.transaction() as conn:
+        db.insert_project(conn, "solar-pool", "Synthetic project", "Nowhere", 100.0, 1000, 1000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+    servers["fast"].unavailable = True
+    app_client = solar_crowdfunding.app.test_client()
+    project = app_client.get("/project/solar-pool").json["project"]
+    assert project["current_balance_xrp"] == 1000, project
+    stats = app_client.get("/ledger_pool").json
+    print(f"/project with the fast node down: balance {project['current_balance_xrp']} XRP; "
+          f"{stats['failovers']} failovers so far")
+
+    # Every node down: the retry budget keeps failover from tripling the load.
+    for server in servers.values():
+        server.unavailable = True
+    sent = sum(endpoint.requests for endpoint in pool.endpoints)
+    start = time.perf_counter()
+    failed = 0
+    for _ in range(args.outage_requests):
+        try:
+            client.request(account_info)
+        except Exception:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    sent = sum(endpoint.requests for endpoint in pool.endpoints) - sent
+    health_checks = 3 * (elapsed / args.health_interval + 1)
+    allowed = args.outage_requests * (1 + pool.budget.ratio) + pool.budget.capacity + \
+        elapsed * pool.budget.min_per_second + health_checks
+    assert failed == args.outage_requests
+    assert sent <= allowed, (sent, allowed)
+    print(f"all nodes down: {args.outage_requests} calls sent {sent} requests "
+          f"(at most {args.outage_requests * pool.max_attempts} without a retry budget), "
+          f"{pool.budget.exhausted} retries refused")
+    for server in servers.values():
+        server.shutdown()
+
+
+def bench_signer(args):
+    """Sign and submit payments from cached sequences and fee against autofill_and_sign; recover from stale caches"""
+    use_temp_database()
+    from xrpl.core.binarycodec import encode
+    from xrpl.models.requests import SubmitOnly
+    from xrpl.models.transactions import Payment
+    from xrpl.transaction import autofill_and_sign, submit
+
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval, latency=args.latency)
+    os.environ['XRPL_ENDPOINTS'] = fake_ledger.server_url(server)
+    os.environ['LEDGER_POLL_INTERVAL'] = str(args.close_interval / 2)
+    os.environ['FAUCET_URL'] = fake_ledger.faucet_url(server)
+    import solar_crowdfunding
+    import db
+    import tokens
+    from signer import LocalSigner
+    client = solar_crowdfunding.ensure_client()
+    request = solar_crowdfunding.ensure_gateway().request
+    confirmations = solar_crowdfunding.confirmations
+    signer = solar_crowdfunding.signer
+    wallets = [Wallet.create() for _ in range(4)]
+    for wallet in wallets:
+        ledger.fund(wallet.classic_address, 10 ** 12)
+    ledger.close_ledger()
+    destination = Wallet.create().classic_address
+    ledger.fund(destination, 10 ** 9)
+
+    def payment(wallet, drops=1000):
+        return Payment(account=wallet.classic_address, destination=destination, amount=str(drops))
+
+    def signing(label, sign_one):
+        served = ledger.requests_served
+        start = time.perf_counter()
+        for _ in range(args.transactions):
+            sign_one()
+        rate = args.transactions / (time.perf_counter() - start)
+        print(f"{label}: {rate:.0f} signed/s, {(ledger.requests_served - served) / args.transactions:.1f} "
+              f"ledger calls each")
+        return rate
+
+    # Signing alone, each ledger call taking --latency seconds.
+    plain = JsonRpcClient(fake_ledger.server_url(server))
+    signing("autofill_and_sign, new connection per call",
+            lambda: autofill_and_sign(payment(wallets[0]), plain, wallets[0]))
+    baseline = signing("autofill_and_sign, kept-alive pool",
+                       lambda: autofill_and_sign(payment(wallets[0]), client, wallets[0]))
+    cached = LocalSigner(request, confirmations)
+    local = signing("cached autofill", lambda: cached.sign(payment(wallets[1]), wallets[1]))
+    print(f"  {local / baseline:.0f}x the signing throughput of autofill_and_sign")
+
+    # Submitting: every payment validated, in order, from one wallet.
+    def submitting(label, submit_one):
+        served = ledger.requests_served
+        start = time.perf_counter()
+        waiters = [submit_one() for _ in range(args.transactions)]
+        submitted = time.perf_counter() - start
+        calls = (ledger.requests_served - served) / args.transactions
+        outcomes = [waiter.wait(60) for waiter in waiters]
+        assert all(outcome["status"] == 'CONFIRMED' for outcome in outcomes), outcomes
+        elapsed = time.perf_counter() - start
+        print(f"{label}: submitted {args.transactions / submitted:.0f}/s ({calls:.1f} ledger calls each), "
+              f"all validated in {elapsed:.1f}s")
+        return args.transactions / submitted
+
+    def autofill_submit():
+        signed = autofill_and_sign(payment(wallets[3]), client, wallets[3])
+        waiter = confirmations.watch(signed.get_hash(), signed.last_ledger_sequence)
+        submit(signed, client)
+        return waiter
+
+    before = ledger.accounts[destination]["Balance"]
+    baseline = submitting("autofill_and_sign + submit", autofill_submit)
+    local = submitting("LocalSigner.submit", lambda: signer.submit(payment(wallets[0]), wallets[0])[1])
+    assert ledger.accounts[destination]["Balance"] - before == 2 * args.transactions * 1000
+    print(f"  {local / baseline:.0f}x the submit throughput")
+
+    # Another process spends the wallet's next sequence: tefPAST_SEQ, then re-signed once.
+    resyncs = signer.stats()["resyncs"]
+    LocalSigner(request, confirmations).submit(payment(wallets[0], 5), wallets[0])
+    signed, waiter = signer.submit(payment(wallets[0]), wallets[0])
+    assert waiter.wait(60)["status"] == 'CONFIRMED' and signer.stats()["resyncs"] == resyncs + 1
+    print(f"wallet used elsewhere: tefPAST_SEQ, re-signed at sequence {signed.sequence} and validated")
+
+    # A signed payment is lost before it reaches the ledger; once it has
+    # expired, the next one fills its sequence and applies as signed.
+    lost = signer.sign(payment(wallets[0], 7), wallets[0])
+    for _ in range(signer.ledger_offset + 1):
+        ledger.close_ledger()
+    gaps = signer.stats()["gaps_filled"]
+    signed, waiter = signer.submit(payment(wallets[0]), wallets[0])
+    assert signed.sequence > lost.sequence
+    assert waiter.wait(60)["status"] == 'CONFIRMED' and signer.stats()["gaps_filled"] == gaps + 1
+    rebroadcast = request(SubmitOnly(tx_blob=encode(lost.to_xrpl()))).result["engine_result"]
+    assert rebroadcast.startswith('tef'), rebroadcast
+    print(f"lost sequence {lost.sequence}: next payment held (terPRE_SEQ), gap filled with a no-op, "
+          f"payment validated; the lost one now gets {rebroadcast}")
+
+    # Many threads on one wallet, some transactions malformed: submissions
+    # race out of order, nothing applies twice and nothing is left stuck.
+    before = ledger.accounts[destination]["Balance"]
+
+    def one(i):
+        if i % 10 == 9:
+            try:
+                signer.submit(tokens.trust_set(wallets[0].classic_address, wallets[0].classic_address, 10),
+                              wallets[0])
+                raise AssertionError("a TrustSet to itself should be rejected")
+            except Exception as e:
+                assert 'temDST_IS_SRC' in str(e), e
+                return None
+        return signer.submit(payment(wallets[0]), wallets[0])[1]
+
+    gaps = signer.stats()["gaps_filled"]
+    with ThreadPoolExecutor(args.threads) as pool:
+        waiters = [waiter for waiter in pool.map(one, range(args.transactions)) if waiter]
+    assert all(waiter.wait(60)["status"] == 'CONFIRMED' for waiter in waiters)
+    assert ledger.accounts[destination]["Balance"] - before == len(waiters) * 1000
+    print(f"{args.threads} threads, one wallet: {len(waiters)} payments validated exactly once, "
+          f"{args.transactions - len(waiters)} rejected, {signer.stats()['gaps_filled'] - gaps} gaps filled")
+
+    # The app: a tokenized buy sends a TrustSet and a payment from consecutive cached sequences.
+    owner = Wallet.create()
+    ledger.fund(owner.classic_address, 10 ** 9)
+    solar_crowdfunding.wallet_pool.add(owner)
+    ledger.close_ledger()
+    body, status = solar_crowdfunding.run_create_project({"name": "solar-signed", "description": "d",
+                                                          "location": "l", "total_power_kw": 5,
+                                                          "total_shares": 100, "share_price_xrp": 0.5})
+    assert status == 200, body
+    assert solar_crowdfunding.run_tokenize_project({"name": "solar-signed"})[1] == 200
+    buyer = Wallet.create()
+    ledger.fund(buyer.classic_address, 10 ** 9)
+    solar_crowdfunding.wallet_pool.add(buyer)
+    ledger.close_ledger()
+    served = ledger.requests_served
+    start = time.perf_counter()
+    body, status = solar_crowdfunding.run_buy_shares({"name": "solar-signed", "shares_amount": 10})
+    assert status == 200 and body["token"]["trust_line"] == 'tesSUCCESS', body
+    print(f"/buy_shares in a tokenized project: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{ledger.requests_served - served} ledger calls")
+    print(solar_crowdfunding.app.test_client().get("/signer").json)
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    payouts = subparsers.add_parser("payouts", help=bench_payouts.__doc__)
+    payouts.add_argument("--holders", type=int, default=500)
+    payouts.add_argument("--close-interval", type=float, default=1.0)
+    payouts.set_defaults(func=bench_payouts)
+
+    project_reads = subparsers.add_parser("project_reads", help=bench_project_reads.__doc__)
+    project_reads.add_argument("--projects", type=int, default=200)
+    project_reads.add_argument("--holders", type=int, default=20)
+    project_reads.add_argument("--dividends", type=int, default=4)
+    project_reads.add_argument("--requests", type=int, default=2000)
+    project_reads.set_defaults(func=bench_project_reads)
+
+    all_projects = subparsers.add_parser("all_projects", help=bench_all_projects.__doc__)
+    all_projects.add_argument("--projects", type=int, default=5000)
+    all_projects.add_argument("--holders", type=int, default=10)
+    all_projects.add_argument("--dividends", type=int, default=2)
+    all_projects.add_argument("--requests", type=int, default=5)
+    all_projects.add_argument("--skip-legacy", action="store_true")
+    all_projects.set_defaults(func=bench_all_projects)
+
+    stream_memory = subparsers.add_parser("stream_memory", help=bench_stream_memory.__doc__)
+    stream_memory.add_argument("--projects", type=int, default=2000)
+    stream_memory.add_argument("--holders", type=int, default=10)
+    stream_memory.set_defaults(func=bench_stream_memory)
+
+    balance_cache = subparsers.add_parser("balance_cache", help=bench_balance_cache.__doc__)
+    balance_cache.add_argument("--holders", type=int, default=20)
+    balance_cache.add_argument("--requests", type=int, default=500)
+    balance_cache.add_argument("--ttl", type=float, default=10.0)
+    balance_cache.set_defaults(func=bench_balance_cache)
+
+    wallet_pool = subparsers.add_parser("wallet_pool", help=bench_wallet_pool.__doc__)
+    wallet_pool.add_argument("--size", type=int, default=50)
+    wallet_pool.add_argument("--requests", type=int, default=20)
+    wallet_pool.add_argument("--faucet-delay", type=float, default=0.5)
+    wallet_pool.add_argument("--refill-workers", type=int, default=4)
+    wallet_pool.set_defaults(func=bench_wallet_pool)
+
+    concurrent_reads = subparsers.add_parser("concurrent_reads", help=bench_concurrent_reads.__doc__)
+    concurrent_reads.add_argument("--projects", type=int, default=100)
+    concurrent_reads.add_argument("--rounds", type=int, default=3)
+    concurrent_reads.add_argument("--threads", type=int, default=16)
+    concurrent_reads.add_argument("--latency", type=float, default=0.02)
+    concurrent_reads.set_defaults(func=bench_concurrent_reads)
+
+    resume = subparsers.add_parser("resume", help=bench_resume.__doc__)
+    resume.add_argument("--holders", type=int, default=1000)
+    resume.add_argument("--crash-at", type=float, default=0.9)
+    resume.add_argument("--close-interval", type=float, default=0.5)
+    resume.set_defaults(func=bench_resume)
+
+    buy_batch = subparsers.add_parser("buy_batch", help=bench_buy_batch.__doc__)
+    buy_batch.add_argument("--orders", type=int, default=500)
+    buy_batch.add_argument("--buyers", type=int, default=50)
+    buy_batch.add_argument("--single", type=int, default=10)
+    buy_batch.add_argument("--close-interval", type=float, default=0.5)
+    buy_batch.set_defaults(func=bench_buy_batch)
+
+    positions = subparsers.add_parser("positions", help=bench_positions.__doc__)
+    positions.add_argument("--holders", type=int, default=20000)
+    positions.add_argument("--purchases", type=int, default=5)
+    positions.add_argument("--requests", type=int, default=5)
+    positions.set_defaults(func=bench_positions)
+
+    money = subparsers.add_parser("money", help=bench_money.__doc__)
+    money.add_argument("--holders", type=int, default=100000)
+    money.add_argument("--requests", type=int, default=10)
+    money.add_argument("--max-shares", type=int, default=1000)
+    money.add_argument("--seed", type=int, default=7)
+    money.set_defaults(func=bench_money)
+
+    oversell = subparsers.add_parser("oversell", help=bench_oversell.__doc__)
+    oversell.add_argument("--supply", type=int, default=2000)
+    oversell.add_argument("--processes", type=int, default=4)
+    oversell.add_argument("--threads", type=int, default=8)
+    oversell.add_argument("--orders", type=int, default=50)
+    oversell.add_argument("--ttl", type=float, default=0.05)
+    oversell.add_argument("--pay-delay", type=float, default=0.02)
+    oversell.set_defaults(func=bench_oversell)
+
+    snapshots = subparsers.add_parser("snapshots", help=bench_snapshots.__doc__)
+    snapshots.add_argument("--projects", type=int, default=500)
+    snapshots.add_argument("--holders", type=int, default=200)
+    snapshots.add_argument("--dividends", type=int, default=12)
+    snapshots.add_argument("--requests", type=int, default=2000)
+    snapshots.set_defaults(func=bench_snapshots)
+
+    scheduler = subparsers.add_parser("scheduler", help=bench_scheduler.__doc__)
+    scheduler.add_argument("--projects", type=int, default=200)
+    scheduler.add_argument("--holders", type=int, default=3)
+    scheduler.add_argument("--days", type=int, default=90)
+    scheduler.add_argument("--workers", type=int, default=8)
+    scheduler.add_argument("--close-interval", type=float, default=0.5)
+    scheduler.set_defaults(func=bench_scheduler)
+
+    production = subparsers.add_parser("production", help=bench_production.__doc__)
+    production.add_argument("--projects", type=int, default=20)
+    production.add_argument("--readings-per-day", type=int, default=96)
+    production.add_argument("--requests", type=int, default=500)
+    production.set_defaults(func=bench_production)
+
+    analytics = subparsers.add_parser("analytics", help=bench_analytics.__doc__)
+    analytics.add_argument("--projects", type=int, default=1000)
+    analytics.add_argument("--purchases", type=int, default=1000, help="per project")
+    analytics.add_argument("--holders", type=int, default=50000)
+    analytics.add_argument("--dividends", type=int, default=3, help="per project")
+    analytics.add_argument("--requests", type=int, default=500)
+    analytics.set_defaults(func=bench_analytics)
+
+    token_parser = subparsers.add_parser("tokens", help=bench_tokens.__doc__)
+    token_parser.add_argument("--shares", type=int, default=30000)
+    token_parser.add_argument("--holders", type=int, default=2000)
+    token_parser.add_argument("--sample", type=int, default=10, help="trust lines sent sequentially")
+    token_parser.add_argument("--close-interval", type=float, default=0.5)
+    token_parser.set_defaults(func=bench_tokens)
+
+    holder_snapshot = subparsers.add_parser("holder_snapshot", help=bench_holder_snapshot.__doc__)
+    holder_snapshot.add_argument("--lines", type=int, default=100000)
+    holder_snapshot.add_argument("--paid-holders", type=int, default=20)
+    holder_snapshot.add_argument("--close-interval", type=float, default=0.5)
+    holder_snapshot.set_defaults(func=bench_holder_snapshot)
+
+    indexer = subparsers.add_parser("indexer", help=bench_indexer.__doc__)
+    indexer.add_argument("--transactions", type=int, default=100000)
+    indexer.add_argument("--wallets", type=int, default=50)
+    indexer.add_argument("--requests", type=int, default=200)
+    indexer.add_argument("--close-interval", type=float, default=0.5)
+    indexer.set_defaults(func=bench_indexer)
+
+    ledger_pool = subparsers.add_parser("ledger_pool", help=bench_ledger_pool.__doc__)
+    ledger_pool.add_argument("--requests", type=int, default=200)
+    ledger_pool.add_argument("--outage-requests", type=int, default=1000)
+    ledger_pool.add_argument("--slow", type=float, default=0.1, help="seconds per call")
+    ledger_pool.add_argument("--medium", type=float, default=0.02)
+    ledger_pool.add_argument("--fast", type=float, default=0.002)
+    ledger_pool.add_argument("--health-interval", type=float, default=0.5)
+    ledger_pool.add_argument("--close-interval", type=float, default=0.5)
+    ledger_pool.set_defaults(func=bench_ledger_pool)
+
+    signer = subparsers.add_parser("signer", help=bench_signer.__doc__)
+    signer.add_argument("--transactions", type=int, default=200)
+    signer.add_argument("--threads", type=int, default=8)
+    signer.add_argument("--latency", type=float, default=0.005, help="seconds per ledger call")
+    signer.add_argument("--close-interval", type=float, default=0.2)
+    signer.set_defaults(func=bench_signer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,27 @@
-import sqlite3
+import db
 
 def clear_tables():
     """Clear all data from the database tables"""
-    conn = sqlite3.connect('solar_crowdfunding.db')
-    c = conn.cursor()
-    
-    # Clear tables in the correct order to respect foreign key constraints
-    c.execute('DELETE FROM dividends')
-    c.execute('DELETE FROM shareholders')
-    c.execute('DELETE FROM projects')
-    
-    conn.commit()
-    conn.close()
+    with db.transaction('clear_tables') as conn:
+        # Clear tables in the correct order to respect foreign key constraints
+        conn.execute('DELETE FROM dividend_payouts')
+        conn.execute('DELETE FROM token_deliveries')
+        conn.execute('DELETE FROM wallet_transactions')
+        conn.execute('DELETE FROM wallet_index_cursors')
+        conn.execute('DELETE FROM holder_snapshot_lines')
+        conn.execute('DELETE FROM holder_snapshots')
+        conn.execute('DELETE FROM project_tokens')
+        conn.execute('DELETE FROM dividends')
+        conn.execute('DELETE FROM positions')
+        conn.execute('DELETE FROM reservations')
+        conn.execute('DELETE FROM wallet_leases')
+        conn.execute('DELETE FROM dividend_schedules')
+        conn.execute('DELETE FROM production_readings')
+        conn.execute('DELETE FROM production_rollups')
+        conn.execute('DELETE FROM project_snapshots')
+        conn.execute('DELETE FROM shareholders')
+        conn.execute('DELETE FROM projects')
+    db.close_connection()
     print("All tables have been cleared successfully!")
 
 if __name__ == "__main__":
@@ -3,8 +3,39 @@ import os
 class Config:
     DEBUG = False
     TESTING = False
-    DATABASE = 'solar_crowdfunding.db'
-    XRPL_CLIENT_URL = "https://s.altnet.rippletest.net:51234"  # Testnet
+    DATABASE = os.environ.get('DATABASE', 'solar_crowdfunding.db')
+    XRPL_CLIENT_URL = os.environ.get('XRPL_CLIENT_URL', "https://s.altnet.rippletest.net:51234")  # Testnet
+    # A ws:// URL gives the async ledger gateway its own websocket; otherwise it
+    # shares the endpoint pool, and an http:// URL joins the pool's endpoints
+    XRPL_GATEWAY_URL = os.environ.get('XRPL_GATEWAY_URL', "")
+    # rippled JSON-RPC nodes, comma separated; calls go to the fastest healthy one
+    XRPL_ENDPOINTS = [url.strip() for url in os.environ.get('XRPL_ENDPOINTS', ",".join(
+        [XRPL_CLIENT_URL] + ([XRPL_GATEWAY_URL] if XRPL_GATEWAY_URL.startswith('http') else []))).split(",")
+        if url.strip()]
+    LEDGER_MAX_CONCURRENCY = int(os.environ.get('LEDGER_MAX_CONCURRENCY', 16))
+    LEDGER_MAX_ATTEMPTS = int(os.environ.get('LEDGER_MAX_ATTEMPTS', 3))  # endpoints one call may try
+    LEDGER_FAILOVER_COOLDOWN = float(os.environ.get('LEDGER_FAILOVER_COOLDOWN', 10))  # seconds a failed endpoint sits out
+    LEDGER_HEALTH_INTERVAL = float(os.environ.get('LEDGER_HEALTH_INTERVAL', 5))  # seconds between server_info probes; 0 disables
+    SIGNER_REFRESH_INTERVAL = float(os.environ.get('SIGNER_REFRESH_INTERVAL', 5))  # seconds between fee and ledger index refreshes for local signing; 0 refreshes on use
+    LEDGER_POLL_INTERVAL = float(os.environ.get('LEDGER_POLL_INTERVAL', 1.0))  # seconds between validated-ledger checks
+    CONFIRMATION_TIMEOUT = 900  # seconds to wait for a submitted transaction to validate
+    RESERVATION_TTL = float(os.environ.get('RESERVATION_TTL', 900))  # seconds shares stay held for an unpaid purchase
+    FAUCET_URL = os.environ.get('FAUCET_URL', "https://faucet.altnet.rippletest.net/accounts")
+    WALLET_POOL_SIZE = int(os.environ.get('WALLET_POOL_SIZE', 5))  # 0 disables background funding
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_LEASE_SECONDS = 3600  # a RUNNING job whose worker has not renewed its lease for this long is considered dead
+    WALLET_LEASE_WAIT = float(os.environ.get('WALLET_LEASE_WAIT', 900))  # seconds a pay-out run waits for a busy wallet before failing
+    DIVIDEND_SCHEDULER_INTERVAL = float(os.environ.get('DIVIDEND_SCHEDULER_INTERVAL', 60))  # seconds between checks for due dividends; 0 disables
+    LEDGER_INDEXER_INTERVAL = float(os.environ.get('LEDGER_INDEXER_INTERVAL', 10))  # seconds between project wallet history syncs; 0 disables
+    PAGE_SIZE = 100  # default page size for /get_all_project_info
+    MAX_PAGE_SIZE = 1000
+    BALANCE_CACHE_TTL = float(os.environ.get('BALANCE_CACHE_TTL', 10))  # seconds
+    # /project/<name> responses; entries also expire after the balance cache TTL, as they embed a balance
+    SNAPSHOT_CACHE_SIZE = int(os.environ.get('SNAPSHOT_CACHE_SIZE', 1000))  # projects kept in memory
+    SNAPSHOT_CACHE_DISK = os.environ.get('SNAPSHOT_CACHE_DISK', '0') == '1'  # share snapshots through SQLite
+    # /portfolio and /yield responses; writes invalidate them, the TTL only ages annualized yields
+    ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 10000))  # holders kept in memory
+    ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 300))  # seconds
 
 class ProductionConfig(Config):
     ENV = 'production'
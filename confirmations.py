@@ -0,0 +1,213 @@
+import threading
+import time
+
+from xrpl.models.requests import Ledger
+
+
+class Waiter:
+    """Handle for one pending confirmation; wait() blocks until it resolves"""
+
+    def __init__(self, key, last_ledger_sequence=None, account=None, sequence=None):
+        self.key = key
+        self.last_ledger_sequence = last_ledger_sequence
+        self.account = account
+        self.sequence = sequence
+        self.event = threading.Event()
+        self.outcome = None
+
+    def resolve(self, status, result=None, ledger_index=None, tx=None):
+        self.outcome = {"status": status, "result": result, "ledger_index": ledger_index, "tx": tx}
+        self.event.set()
+
+    def done(self):
+        return self.event.is_set()
+
+    def wait(self, timeout=None):
+        if not self.event.wait(timeout):
+            return {"status": 'TIMEOUT', "result": None, "ledger_index": None, "tx": None}
+        return self.outcome
+
+
+def account_sequences(tx, meta):
+    """(account, next sequence) for every account whose sequence a validated transaction shows"""
+    if tx.get('Account') and tx.get('Sequence'):  # 0 when it used a ticket
+        yield tx['Account'], tx['Sequence'] + 1
+    for node in meta.get('AffectedNodes', []):
+        entry = node.get('ModifiedNode') or node.get('CreatedNode') or {}
+        fields = entry.get('FinalFields') or entry.get('NewFields') or {}
+        if entry.get('LedgerEntryType') == 'AccountRoot' and 'Account' in fields and 'Sequence' in fields:
+            yield fields['Account'], fields['Sequence']
+
+
+class ConfirmationService:
+    """Confirms many transactions with one ledger fetch per validated ledger.
+
+    Callers register a waiter (by transaction hash, or by destination account
+    for faucet funding) *before* submitting, then block on it. A single
+    background thread follows the validated ledger, fetches each new ledger
+    once with its transactions, and resolves every matching waiter, so the
+    RPC cost per ledger does not grow with the number of pending payments.
+    `request` is any callable that sends an xrpl-py request and returns the
+    response (a sync client's request or the ledger gateway's).
+    `on_validated(ledger_index)` hears of each validated ledger it reads.
+    """
+
+    def __init__(self, request, poll_interval=1.0, on_validated=None):
+        self.request = request
+        self.poll_interval = poll_interval
+        self.on_validated = on_validated
+        self.lock = threading.Lock()
+        self.scanned = threading.Condition(self.lock)
+        self.by_hash = {}
+        self.by_destination = {}
+        self.next_ledger = None
+        self.thread = None
+        self.ledgers_scanned = 0
+        self.resolved = 0
+
+    def latest_validated(self):
+        response = self.request(Ledger(ledger_index="validated"))
+        if not response.is_successful():
+            raise Exception(f"Could not read validated ledger: {response.result}")
+        return int(response.result['ledger_index'])
+
+    def _register(self, table, waiter, since=None):
+        with self.lock:
+            idle = not self.by_hash and not self.by_destination
+        start = self.latest_validated() + 1 if idle or self.next_ledger is None else None
+        with self.lock:
+            # Another waiter may have registered while the ledger was read; it
+            # depends on next_ledger, so only move it if nothing is pending.
+            if start is not None and (self.next_ledger is None or not self.by_hash and not self.by_destination):
+                # Nothing was being followed; start from the current validated ledger.
+                self.next_ledger = start
+            if since is not None and since < self.next_ledger:
+                self.next_ledger = since
+            table.setdefault(waiter.key, []).append(waiter)
+        self._ensure_running()
+        return waiter
+
+    def watch(self, tx_hash, last_ledger_sequence=None, account=None, sequence=None, since=None):
+        """Wait for a transaction by hash. Register before submitting it.
+
+        `since` rescans from an earlier ledger, for transactions that may
+        already have been submitted (e.g. by a run that crashed).
+        """
+        return self._register(self.by_hash, Waiter(tx_hash, last_ledger_sequence, account, sequence), since)
+
+    def watch_account(self, address):
+        """Wait for a successful payment into an address (e.g. faucet funding)"""
+        return self._register(self.by_destination, Waiter(address))
+
+    def wait_scanned(self, ledger_index, timeout=None):
+        """Block until every ledger up to ledger_index is scanned or nothing is pending"""
+        with self.scanned:
+            return self.scanned.wait_for(lambda: self.next_ledger > ledger_index or self.thread is None, timeout)
+
+    def cancel(self, waiter):
+        with self.lock:
+            for table in (self.by_hash, self.by_destination):
+                waiters = table.get(waiter.key, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del table[waiter.key]
+
+    def _ensure_running(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="confirmations", daemon=True)
+                self.thread.start()
+
+    def _pop(self, table, key):
+        with self.lock:
+            return table.pop(key, [])
+
+    def _scan_ledger(self, index):
+        """Resolve every waiter that matches a transaction in one validated ledger.
+
+        Returns {account: next sequence} for the accounts its transactions
+        show, or None if the ledger could not be read.
+        """
+        response = self.request(Ledger(ledger_index=index, transactions=True, expand=True))
+        if not response.is_successful():
+            return None
+        self.ledgers_scanned += 1
+        sequences = {}
+        for tx in response.result['ledger'].get('transactions', []):
+            meta = tx.get('metaData') or tx.get('meta') or {}
+            result = meta.get('TransactionResult')
+            for account, sequence in account_sequences(tx, meta):
+                sequences[account] = max(sequences.get(account, 0), sequence)
+            for waiter in self._pop(self.by_hash, tx.get('hash')):
+                waiter.resolve('CONFIRMED' if result == 'tesSUCCESS' else 'FAILED', result, index, tx)
+                self.resolved += 1
+            if result == 'tesSUCCESS' and tx.get('TransactionType') == 'Payment' and isinstance(tx.get('Amount'), str):
+                for waiter in self._pop(self.by_destination, tx.get('Destination')):
+                    waiter.resolve('CONFIRMED', result, index, tx)
+                    self.resolved += 1
+        return sequences
+
+    def _expire(self, sequences):
+        """Resolve waiters that can no longer appear in a ledger not yet scanned.
+
+        `sequences` are the accounts' next sequences shown by the ledger just
+        scanned, so no account is looked up: a waiter whose sequence is below
+        its account's was passed over, as a matching hash would have resolved
+        it first.
+        """
+        with self.lock:
+            scanned = self.next_ledger - 1
+            pending = [w for waiters in self.by_hash.values() for w in waiters]
+        for waiter in pending:
+            if waiter.last_ledger_sequence is not None and scanned >= waiter.last_ledger_sequence:
+                status = 'EXPIRED'
+            elif waiter.sequence is not None and waiter.sequence < sequences.get(waiter.account, 0):
+                status = 'DROPPED'  # its sequence was consumed by another transaction
+            else:
+                continue
+            self.cancel(waiter)
+            waiter.resolve(status)
+            self.resolved += 1
+
+    def _run(self):
+        while True:
+            with self.scanned:
+                if not self.by_hash and not self.by_destination:
+                    self.thread = None
+                    self.scanned.notify_all()
+                    return
+            try:
+                validated = self.latest_validated()
+                if self.on_validated:
+                    self.on_validated(validated)
+                while self.next_ledger <= validated:
+                    index = self.next_ledger
+                    sequences = self._scan_ledger(index)
+                    if sequences is None:
+                        break
+                    with self.scanned:
+                        rewound = self.next_ledger != index  # by a watch(since=...) meanwhile
+                        if not rewound:
+                            self.next_ledger = index + 1
+                        self.scanned.notify_all()
+                    # Expire as we go, so a long rescan stops once nothing is left to find.
+                    # After a rewind the earlier ledgers come first: a sequence used
+                    # in this one may be a rescanned waiter's own.
+                    self._expire({} if rewound else sequences)
+                    with self.lock:
+                        if not self.by_hash and not self.by_destination:
+                            break
+            except Exception as e:
+                print(f"Confirmation service error: {e}")
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending_transactions": sum(len(w) for w in self.by_hash.values()),
+                "pending_accounts": sum(len(w) for w in self.by_destination.values()),
+                "ledgers_scanned": self.ledgers_scanned,
+                "resolved": self.resolved,
+                "next_ledger": self.next_ledger
+            }
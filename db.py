@@ -0,0 +1,819 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+from metrics import DB_QUERIES
+
+# Data-access layer. Each thread keeps one open connection, so requests reuse
+# it (and sqlite3's per-connection statement cache) instead of reconnecting.
+
+_local = threading.local()
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=30000',
+    'PRAGMA cache_size=-16000',  # 16 MB page cache
+    'PRAGMA mmap_size=268435456',  # 256 MB memory-mapped I/O
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+def get_connection():
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        # isolation_level=None: reads run in autocommit and writes use the
+        # explicit transactions opened by transaction() below.
+        conn = sqlite3.connect(Config.DATABASE, timeout=30, isolation_level=None,
+                               cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+    return conn
+
+
+def close_connection():
+    """Close this thread's connection, if it has one"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction(caller='other', immediate=False):
+    """Run a block in one transaction, committing on success and rolling back on error.
+
+    It is timed under `caller`, which names the operation it belongs to.
+    """
+    with DB_QUERIES.time('transaction', caller):
+        conn = get_connection()
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+# Reads outside a transaction. The helpers below that use them are timed one
+# by one with DB_QUERIES.timed().
+
+def query_one(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+
+def query_all(sql, params=()):
+    return get_connection().execute(sql, params).fetchall()
+
+
+# Projects
+
+@DB_QUERIES.timed('query', 'get_project')
+def get_project(name):
+    return query_one('SELECT * FROM projects WHERE name = ?', (name,))
+
+
+@DB_QUERIES.timed('query', 'list_projects')
+def list_projects():
+    return query_all('SELECT * FROM projects')
+
+
+@DB_QUERIES.timed('query', 'list_projects_page')
+def list_projects_page(after, limit):
+    return query_all('SELECT * FROM projects WHERE name > ? ORDER BY name LIMIT ?', (after, limit))
+
+
+@DB_QUERIES.timed('query', 'list_project_supply')
+def list_project_supply(names):
+    """Return (name, total_shares, shares_sold, share_price_drops, wallet_address) for many projects in one query"""
+    return query_all('''
+        SELECT name, total_shares, shares_sold, share_price_drops, wallet_address FROM projects
+        WHERE name IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(names)),))
+
+
+def insert_project(conn, name, description, location, total_power_kw, total_shares,
+                   share_price_drops, wallet_address, wallet_seed, status, created_at):
+    conn.execute('''
+        INSERT INTO projects (
+            name, description, location, total_power_kw,
+            total_shares, share_price_drops, wallet_address,
+            wallet_seed, status, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (name, description, location, total_power_kw, total_shares,
+          share_price_drops, wallet_address, wallet_seed, status, created_at))
+    bump_project_version(conn, name)
+
+
+# Project versions: bumped by every write that changes what /project/<name>
+# shows, in the same transaction, so cached snapshots can tell they are stale.
+
+@DB_QUERIES.timed('query', 'get_project_version')
+def get_project_version(project_name):
+    row = query_one('SELECT version FROM project_versions WHERE project_name = ?', (project_name,))
+    return row[0] if row else 0
+
+
+def bump_project_version(conn, project_name):
+    conn.execute('''
+        INSERT INTO project_versions (project_name, version) VALUES (?, 1)
+        ON CONFLICT (project_name) DO UPDATE SET version = version + 1
+    ''', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'get_project_snapshot')
+def get_project_snapshot(project_name):
+    """Return the stored (version, etag, body, built_at) of a project page, if any"""
+    return query_one('''
+        SELECT version, etag, body, built_at FROM project_snapshots WHERE project_name = ?
+    ''', (project_name,))
+
+
+def save_project_snapshot(project_name, version, etag, body, built_at):
+    get_connection().execute('''
+        INSERT INTO project_snapshots (project_name, version, etag, body, built_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (project_name) DO UPDATE SET
+            version = excluded.version, etag = excluded.etag, body = excluded.body, built_at = excluded.built_at
+        WHERE excluded.version >= project_snapshots.version
+    ''', (project_name, version, etag, body, built_at))
+
+
+# Shareholders
+
+@DB_QUERIES.timed('query', 'list_shareholders')
+def list_shareholders(project_name):
+    return query_all('SELECT * FROM shareholders WHERE project_name = ?', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'list_all_shareholders')
+def list_all_shareholders():
+    return query_all('SELECT * FROM shareholders')
+
+
+@DB_QUERIES.timed('query', 'list_shareholders_between')
+def list_shareholders_between(first_project, last_project):
+    return query_all('SELECT * FROM shareholders WHERE project_name BETWEEN ? AND ?',
+                     (first_project, last_project))
+
+
+def insert_shareholder(conn, id, project_name, holder_wallet_address, shares_amount, purchase_date):
+    conn.execute('''
+        INSERT INTO shareholders (
+            id, project_name, holder_wallet_address,
+            shares_amount, purchase_date
+        ) VALUES (?, ?, ?, ?, ?)
+    ''', (id, project_name, holder_wallet_address, shares_amount, purchase_date))
+
+
+# Positions: total shares per (project, holder)
+
+@DB_QUERIES.timed('query', 'list_positions')
+def list_positions(project_name):
+    """Return (holder_wallet_address, shares) for a project, ordered by address"""
+    return query_all('''
+        SELECT holder_wallet_address, shares FROM positions
+        WHERE project_name = ? AND shares > 0 ORDER BY holder_wallet_address
+    ''', (project_name,))
+
+
+def add_to_position(conn, project_name, holder_wallet_address, shares):
+    """Credit a purchase to the holder's position and the project's shares_sold"""
+    conn.execute('''
+        INSERT INTO positions (project_name, holder_wallet_address, shares) VALUES (?, ?, ?)
+        ON CONFLICT (project_name, holder_wallet_address) DO UPDATE SET shares = shares + excluded.shares
+    ''', (project_name, holder_wallet_address, shares))
+    conn.execute('UPDATE projects SET shares_sold = shares_sold + ? WHERE name = ?', (shares, project_name))
+    bump_project_version(conn, project_name)
+
+
+# Reservations: shares held for a purchase until its payment settles. Every
+# function here expects to run inside transaction(immediate=True), so the
+# check and the update happen under SQLite's single write lock, across
+# threads and processes alike. projects.shares_reserved counts HELD shares;
+# shares_sold + shares_reserved never exceeds total_shares.
+
+def expire_reservations(conn, project_name, now):
+    """Return the shares of a project's lapsed reservations to the supply"""
+    expired = conn.execute('''
+        SELECT COALESCE(SUM(shares), 0) FROM reservations
+        WHERE project_name = ? AND status = 'HELD' AND expires_at < ?
+    ''', (project_name, now)).fetchone()[0]
+    if expired:
+        conn.execute('''
+            UPDATE reservations SET status = 'EXPIRED'
+            WHERE project_name = ? AND status = 'HELD' AND expires_at < ?
+        ''', (project_name, now))
+        conn.execute('UPDATE projects SET shares_reserved = shares_reserved - ? WHERE name = ?',
+                     (expired, project_name))
+        bump_project_version(conn, project_name)
+
+
+def reserve_shares(conn, id, project_name, shares, ttl_seconds):
+    """Hold shares for a purchase; returns False if the project does not have them left"""
+    now = time.time()
+    expire_reservations(conn, project_name, now)
+    cursor = conn.execute('''
+        UPDATE projects SET shares_reserved = shares_reserved + ?
+        WHERE name = ? AND shares_sold + shares_reserved + ? <= total_shares
+    ''', (shares, project_name, shares))
+    if cursor.rowcount != 1:
+        return False
+    bump_project_version(conn, project_name)
+    conn.execute('''
+        INSERT INTO reservations (id, project_name, shares, status, created_at, expires_at)
+        VALUES (?, ?, ?, 'HELD', ?, ?)
+    ''', (id, project_name, shares, now, now + ttl_seconds))
+    return True
+
+
+def release_reservation(conn, id):
+    """Give back the shares of a purchase that will not be paid"""
+    row = conn.execute('''
+        UPDATE reservations SET status = 'RELEASED' WHERE id = ? AND status = 'HELD'
+        RETURNING project_name, shares
+    ''', (id,)).fetchone()
+    if row is not None:
+        conn.execute('UPDATE projects SET shares_reserved = shares_reserved - ? WHERE name = ?',
+                     (row[1], row[0]))
+        bump_project_version(conn, row[0])
+
+
+def commit_reservation(conn, id, holder_wallet_address):
+    """Turn a paid reservation into a sale; the caller records the purchase.
+
+    A reservation that expired while its payment was in flight is honoured if
+    the shares are still available. Otherwise it is marked REFUND_DUE and
+    False is returned, so the project is never oversold.
+    """
+    row = conn.execute('''
+        UPDATE reservations SET status = 'COMMITTED', holder_wallet_address = ?
+        WHERE id = ? AND status = 'HELD'
+        RETURNING project_name, shares
+    ''', (holder_wallet_address, id)).fetchone()
+    if row is not None:
+        conn.execute('UPDATE projects SET shares_reserved = shares_reserved - ? WHERE name = ?',
+                     (row[1], row[0]))
+        bump_project_version(conn, row[0])
+        return True
+    row = conn.execute('SELECT project_name, shares, status FROM reservations WHERE id = ?', (id,)).fetchone()
+    if row is None or row[2] != 'EXPIRED':
+        raise Exception(f"Reservation {id} cannot be committed")
+    available = conn.execute('''
+        SELECT 1 FROM projects WHERE name = ? AND shares_sold + shares_reserved + ? <= total_shares
+    ''', (row[0], row[1])).fetchone()
+    status = 'COMMITTED' if available else 'REFUND_DUE'
+    conn.execute('UPDATE reservations SET status = ?, holder_wallet_address = ? WHERE id = ?',
+                 (status, holder_wallet_address, id))
+    return available is not None
+
+
+# Wallet leases: a wallet pays out one batch at a time, across processes
+
+def claim_wallet(address, owner, lease_seconds):
+    """Take the pay-out lease on a wallet for `owner`; returns False if another run holds it"""
+    now = time.time()
+    with transaction('claim_wallet', immediate=True) as conn:
+        cursor = conn.execute('''
+            INSERT INTO wallet_leases (address, owner, lease_expires) VALUES (?, ?, ?)
+            ON CONFLICT (address) DO UPDATE SET owner = excluded.owner, lease_expires = excluded.lease_expires
+            WHERE lease_expires < ?
+        ''', (address, owner, now + lease_seconds, now))
+        return cursor.rowcount == 1
+
+
+def release_wallet(conn, address, owner):
+    conn.execute('DELETE FROM wallet_leases WHERE address = ? AND owner = ?', (address, owner))
+
+
+# Dividends
+
+@DB_QUERIES.timed('query', 'list_dividends')
+def list_dividends(project_name):
+    return query_all('SELECT * FROM dividends WHERE project_name = ?', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'list_all_dividends')
+def list_all_dividends():
+    return query_all('SELECT * FROM dividends')
+
+
+@DB_QUERIES.timed('query', 'list_dividends_between')
+def list_dividends_between(first_project, last_project):
+    return query_all('SELECT * FROM dividends WHERE project_name BETWEEN ? AND ?',
+                     (first_project, last_project))
+
+
+def insert_dividend(conn, id, project_name, amount_drops, distribution_date, status):
+    conn.execute('''
+        INSERT INTO dividends (
+            id, project_name, amount_drops,
+            distribution_date, status
+        ) VALUES (?, ?, ?, ?, ?)
+    ''', (id, project_name, amount_drops, distribution_date, status))
+    bump_project_version(conn, project_name)
+
+
+def set_dividend_status(conn, id, status):
+    row = conn.execute('UPDATE dividends SET status = ? WHERE id = ? RETURNING project_name', (status, id)).fetchone()
+    if row is not None:
+        bump_project_version(conn, row[0])
+
+
+@DB_QUERIES.timed('query', 'get_dividend')
+def get_dividend(id):
+    return query_one('SELECT * FROM dividends WHERE id = ?', (id,))
+
+
+def claim_dividend(id, lease_seconds, force=False):
+    """Take the run lease on a dividend; returns False if another run holds it.
+    force=True takes it anyway, for a run known to have died."""
+    now = time.time()
+    with transaction('claim_dividend', immediate=True) as conn:
+        cursor = conn.execute('''
+            UPDATE dividends SET lease_expires = ?
+            WHERE id = ? AND (lease_expires IS NULL OR lease_expires < ? OR ?)
+        ''', (now + lease_seconds, id, now, force))
+        return cursor.rowcount == 1
+
+
+def release_dividend(conn, id):
+    conn.execute('UPDATE dividends SET lease_expires = NULL WHERE id = ?', (id,))
+
+
+@DB_QUERIES.timed('query', 'list_unfinished_dividends')
+def list_unfinished_dividends():
+    return query_all("SELECT * FROM dividends WHERE status IN ('PROCESSING', 'PARTIAL')")
+
+
+# Dividend payouts: one row per holder per dividend, journaled before submission
+
+def insert_dividend_payouts(conn, dividend_id, allocations):
+    """Record the planned (holder_wallet_address, drops) payments of a dividend"""
+    conn.executemany('''
+        INSERT INTO dividend_payouts (dividend_id, holder_wallet_address, drops, status)
+        VALUES (?, ?, ?, 'PLANNED')
+    ''', [(dividend_id, address, drops) for address, drops in allocations])
+
+
+@DB_QUERIES.timed('query', 'list_open_dividend_payouts')
+def list_open_dividend_payouts(dividend_id):
+    return query_all('''
+        SELECT id, holder_wallet_address, drops, status, sequence, last_ledger_sequence, tx_blob, tx_hash
+        FROM dividend_payouts WHERE dividend_id = ? AND status != 'CONFIRMED'
+        ORDER BY id
+    ''', (dividend_id,))
+
+
+@DB_QUERIES.timed('query', 'count_dividend_payouts')
+def count_dividend_payouts(dividend_id):
+    """Return {status: count} for a dividend's payouts"""
+    return dict(query_all('''
+        SELECT status, COUNT(*) FROM dividend_payouts WHERE dividend_id = ? GROUP BY status
+    ''', (dividend_id,)))
+
+
+def set_dividend_payouts_signed(conn, rows):
+    """rows: (sequence, last_ledger_sequence, tx_blob, tx_hash, id)"""
+    conn.executemany('''
+        UPDATE dividend_payouts
+        SET status = 'SIGNED', sequence = ?, last_ledger_sequence = ?, tx_blob = ?, tx_hash = ?
+        WHERE id = ?
+    ''', rows)
+
+
+def set_dividend_payout_results(conn, rows):
+    """rows: (status, result, ledger_index, id)"""
+    conn.executemany('''
+        UPDATE dividend_payouts SET status = ?, result = ?, ledger_index = ? WHERE id = ?
+    ''', rows)
+
+
+# Project tokens: projects whose shares are issued as tokens from the project
+# wallet, and the token deliveries owed to their holders. A delivery goes
+# PENDING -> SIGNED (journaled before submission) -> CONFIRMED, or waits in
+# AWAITING_TRUST_LINE until the holder can receive tokens.
+
+@DB_QUERIES.timed('query', 'get_project_token')
+def get_project_token(project_name):
+    """Return (project_name, currency, issuer, created_at, lease_expires), or None if not tokenized"""
+    return query_one('SELECT * FROM project_tokens WHERE project_name = ?', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'list_tokenized_projects')
+def list_tokenized_projects(names):
+    """Return the names among `names` whose shares are tokens"""
+    return {row[0] for row in query_all('''
+        SELECT project_name FROM project_tokens WHERE project_name IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(names)),))}
+
+
+def insert_project_token(conn, project_name, currency, issuer, created_at):
+    """Record a project as tokenized; returns False if it already was"""
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO project_tokens (project_name, currency, issuer, created_at) VALUES (?, ?, ?, ?)
+    ''', (project_name, currency, issuer, created_at))
+    return cursor.rowcount == 1
+
+
+def queue_position_token_deliveries(conn, project_name, created_at):
+    """Owe every current holder their shares as tokens, once they open a trust line"""
+    return conn.execute('''
+        INSERT INTO token_deliveries (project_name, holder_wallet_address, shares, status, created_at)
+        SELECT project_name, holder_wallet_address, shares, 'AWAITING_TRUST_LINE', ?
+        FROM positions WHERE project_name = ? AND shares > 0
+    ''', (created_at, project_name)).rowcount
+
+
+def insert_token_delivery(conn, project_name, holder_wallet_address, shares, created_at):
+    conn.execute('''
+        INSERT INTO token_deliveries (project_name, holder_wallet_address, shares, status, created_at)
+        VALUES (?, ?, ?, 'PENDING', ?)
+    ''', (project_name, holder_wallet_address, shares, created_at))
+
+
+def retry_token_deliveries(conn, project_name, holder_wallet_addresses):
+    """Make the deliveries waiting on these holders' trust lines pending again"""
+    return conn.execute('''
+        UPDATE token_deliveries SET status = 'PENDING'
+        WHERE project_name = ? AND status = 'AWAITING_TRUST_LINE'
+          AND holder_wallet_address IN (SELECT value FROM json_each(?))
+    ''', (project_name, json.dumps(list(holder_wallet_addresses)))).rowcount
+
+
+def claim_token_deliveries(project_name, lease_seconds):
+    """Take the delivery lease on a project; returns False if another run holds it"""
+    now = time.time()
+    with transaction('claim_token_deliveries', immediate=True) as conn:
+        cursor = conn.execute('''
+            UPDATE project_tokens SET lease_expires = ?
+            WHERE project_name = ? AND (lease_expires IS NULL OR lease_expires < ?)
+        ''', (now + lease_seconds, project_name, now))
+        return cursor.rowcount == 1
+
+
+def release_token_deliveries(conn, project_name):
+    conn.execute('UPDATE project_tokens SET lease_expires = NULL WHERE project_name = ?', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'list_open_token_deliveries')
+def list_open_token_deliveries(project_name):
+    return query_all('''
+        SELECT id, holder_wallet_address, shares, status, sequence, last_ledger_sequence, tx_blob, tx_hash
+        FROM token_deliveries WHERE project_name = ? AND status IN ('PENDING', 'SIGNED')
+        ORDER BY id
+    ''', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'count_token_deliveries')
+def count_token_deliveries(project_name):
+    """Return {status: (deliveries, shares)} for a project's token deliveries"""
+    return {row[0]: (row[1], row[2]) for row in query_all('''
+        SELECT status, COUNT(*), SUM(shares) FROM token_deliveries WHERE project_name = ? GROUP BY status
+    ''', (project_name,))}
+
+
+def set_token_deliveries_signed(conn, rows):
+    """rows: (sequence, last_ledger_sequence, tx_blob, tx_hash, id)"""
+    conn.executemany('''
+        UPDATE token_deliveries
+        SET status = 'SIGNED', sequence = ?, last_ledger_sequence = ?, tx_blob = ?, tx_hash = ?
+        WHERE id = ?
+    ''', rows)
+
+
+def set_token_delivery_results(conn, rows):
+    """rows: (status, result, ledger_index, id)"""
+    conn.executemany('''
+        UPDATE token_deliveries SET status = ?, result = ?, ledger_index = ? WHERE id = ?
+    ''', rows)
+
+
+# Holder snapshots: a tokenized project's holders as the ledger saw them at
+# one validated ledger, built page by page so a crash resumes at the marker.
+
+@DB_QUERIES.timed('query', 'get_holder_snapshot')
+def get_holder_snapshot(snapshot_id):
+    """Return (id, project_name, issuer, currency, ledger_index, marker, status, pages, holders, tokens,
+    dividend_id, created_at, completed_at)"""
+    return query_one('SELECT * FROM holder_snapshots WHERE id = ?', (snapshot_id,))
+
+
+@DB_QUERIES.timed('query', 'get_building_holder_snapshot')
+def get_building_holder_snapshot(project_name):
+    """The project's most recent snapshot still being paged in, if any"""
+    return query_one('''
+        SELECT * FROM holder_snapshots WHERE project_name = ? AND status = 'BUILDING'
+        ORDER BY created_at DESC LIMIT 1
+    ''', (project_name,))
+
+
+def insert_holder_snapshot(conn, snapshot_id, project_name, issuer, currency, ledger_index, created_at):
+    conn.execute('''
+        INSERT INTO holder_snapshots (id, project_name, issuer, currency, ledger_index, status, created_at)
+        VALUES (?, ?, ?, ?, ?, 'BUILDING', ?)
+    ''', (snapshot_id, project_name, issuer, currency, ledger_index, created_at))
+
+
+def add_holder_snapshot_page(conn, snapshot_id, holders, marker):
+    """Store one page of (holder, tokens) and the marker of the next; a page read twice is stored once"""
+    conn.executemany('''
+        INSERT OR IGNORE INTO holder_snapshot_lines (snapshot_id, holder_wallet_address, tokens) VALUES (?, ?, ?)
+    ''', [(snapshot_id, holder, tokens) for holder, tokens in holders])
+    conn.execute('UPDATE holder_snapshots SET marker = ?, pages = pages + 1 WHERE id = ?', (marker, snapshot_id))
+
+
+def complete_holder_snapshot(conn, snapshot_id, completed_at):
+    conn.execute('''
+        UPDATE holder_snapshots SET status = 'COMPLETE', marker = NULL, completed_at = ?,
+            (holders, tokens) = (SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM holder_snapshot_lines
+                                 WHERE snapshot_id = ?)
+        WHERE id = ?
+    ''', (completed_at, snapshot_id, snapshot_id))
+
+
+def discard_holder_snapshot(conn, snapshot_id, status, dividend_id=None):
+    """Drop a snapshot's lines, marking it CONSUMED by a dividend or FAILED"""
+    conn.execute('DELETE FROM holder_snapshot_lines WHERE snapshot_id = ?', (snapshot_id,))
+    conn.execute('UPDATE holder_snapshots SET status = ?, marker = NULL, dividend_id = ? WHERE id = ?',
+                 (status, dividend_id, snapshot_id))
+
+
+@DB_QUERIES.timed('query', 'list_holder_snapshot_lines')
+def list_holder_snapshot_lines(snapshot_id):
+    """Return (holder_wallet_address, tokens) ordered by address, like list_positions()"""
+    return query_all('''
+        SELECT holder_wallet_address, tokens FROM holder_snapshot_lines WHERE snapshot_id = ?
+        ORDER BY holder_wallet_address
+    ''', (snapshot_id,))
+
+
+# Wallet index: each project wallet's validated transactions and balance,
+# copied from the ledger by ledger_indexer.LedgerIndexer.
+
+def add_wallet_index_cursors(conn):
+    """Start following every project wallet that has no cursor yet"""
+    conn.execute('''
+        INSERT OR IGNORE INTO wallet_index_cursors (address, project_name)
+        SELECT wallet_address, name FROM projects WHERE wallet_address IS NOT NULL
+    ''')
+
+
+@DB_QUERIES.timed('query', 'list_wallet_index_cursors')
+def list_wallet_index_cursors():
+    """Return (address, next_ledger, pass_max_ledger, marker) for every followed wallet"""
+    return query_all('''
+        SELECT address, next_ledger, pass_max_ledger, marker FROM wallet_index_cursors ORDER BY address
+    ''')
+
+
+def start_wallet_index_pass(conn, address, pass_max_ledger, balance_drops):
+    conn.execute('''
+        UPDATE wallet_index_cursors SET pass_max_ledger = ?, pass_balance_drops = ?, marker = NULL
+        WHERE address = ?
+    ''', (pass_max_ledger, balance_drops, address))
+
+
+def add_wallet_transactions(conn, address, rows, marker):
+    """Store a page of normalized transactions and the marker of the next; returns how many were new"""
+    inserted = conn.executemany('''
+        INSERT OR IGNORE INTO wallet_transactions (
+            address, ledger_index, transaction_index, tx_hash, transaction_type, counterparty,
+            delta_drops, fee_drops, currency, issuer, value, result, close_time
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows).rowcount
+    conn.execute('''
+        UPDATE wallet_index_cursors SET marker = ?, transactions = transactions + ? WHERE address = ?
+    ''', (marker, inserted, address))
+    return inserted
+
+
+def complete_wallet_index_pass(conn, address, updated_at):
+    """Serve the balance read for a finished pass, and bump the project's version if it changed"""
+    row = conn.execute('''
+        SELECT project_name, balance_drops, pass_balance_drops FROM wallet_index_cursors WHERE address = ?
+    ''', (address,)).fetchone()
+    conn.execute('''
+        UPDATE wallet_index_cursors
+        SET next_ledger = pass_max_ledger + 1, balance_ledger = pass_max_ledger, balance_drops = pass_balance_drops,
+            pass_max_ledger = NULL, pass_balance_drops = NULL, marker = NULL, updated_at = ?
+        WHERE address = ?
+    ''', (updated_at, address))
+    if row[1] != row[2]:
+        bump_project_version(conn, row[0])
+
+
+@DB_QUERIES.timed('query', 'get_wallet_index')
+def get_wallet_index(address):
+    """Return (balance_drops, balance_ledger, transactions, updated_at), or None if not followed;
+    balance_ledger is None until the first pass is done"""
+    return query_one('''
+        SELECT balance_drops, balance_ledger, transactions, updated_at FROM wallet_index_cursors WHERE address = ?
+    ''', (address,))
+
+
+@DB_QUERIES.timed('query', 'list_wallet_transactions')
+def list_wallet_transactions(address, before=None, limit=100):
+    """Return a wallet's indexed transactions newest first, starting below the (ledger_index,
+    transaction_index) `before`: (ledger_index, transaction_index, tx_hash, transaction_type,
+    counterparty, delta_drops, fee_drops, currency, issuer, value, result, close_time)"""
+    before = before or (2 ** 62, 0)
+    return query_all('''
+        SELECT ledger_index, transaction_index, tx_hash, transaction_type, counterparty,
+               delta_drops, fee_drops, currency, issuer, value, result, close_time
+        FROM wallet_transactions
+        WHERE address = ? AND (ledger_index, transaction_index) < (?, ?)
+        ORDER BY ledger_index DESC, transaction_index DESC LIMIT ?
+    ''', (address, before[0], before[1], limit))
+
+
+# Production readings: energy generated per project, appended by ingestion.
+# Ids only grow, so consumers remember the last id they have counted. Each
+# insert also adds the new readings to production_rollups, so charts read a
+# few rows per bucket however many readings there are.
+
+# UTC bucket start, in unix seconds, of a reading's read_at
+PRODUCTION_BUCKETS = {
+    'hour': "CAST(read_at / 3600 AS INTEGER) * 3600",
+    'day': "CAST(read_at / 86400 AS INTEGER) * 86400",
+    'month': "CAST(strftime('%s', read_at, 'unixepoch', 'start of month') AS INTEGER)",
+}
+
+
+def insert_production_readings(conn, rows):
+    """rows: (project_name, read_at, wh). Readings already stored for the same
+    project and time are ignored. Returns how many were inserted; call inside
+    transaction(immediate=True) so the new ids are ours alone."""
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM production_readings').fetchone()[0]
+    conn.executemany('INSERT OR IGNORE INTO production_readings (project_name, read_at, wh) VALUES (?, ?, ?)', rows)
+    return rollup_production_readings(conn, last_id)
+
+
+def rollup_production_readings(conn, after_id):
+    """Add the readings with id > after_id to every rollup; returns how many there were"""
+    # NOT INDEXED keeps SQLite on the rowid range; otherwise it may scan a
+    # whole (project_name, ...) index to group by project.
+    for resolution, bucket in PRODUCTION_BUCKETS.items():
+        conn.execute(f'''
+            INSERT INTO production_rollups (project_name, resolution, bucket_start, wh, readings)
+            SELECT project_name, ?, {bucket}, SUM(wh), COUNT(*)
+            FROM production_readings NOT INDEXED WHERE id > ?
+            GROUP BY project_name, 3
+            ON CONFLICT (project_name, resolution, bucket_start) DO UPDATE SET
+                wh = wh + excluded.wh,
+                readings = readings + excluded.readings
+        ''', (resolution, after_id))
+    return conn.execute('SELECT COUNT(*) FROM production_readings WHERE id > ?', (after_id,)).fetchone()[0]
+
+
+@DB_QUERIES.timed('query', 'get_production_series')
+def get_production_series(project_name, resolution, start, end):
+    """(bucket_start, wh, readings) for the buckets starting in [start, end), oldest first"""
+    return query_all('''
+        SELECT bucket_start, wh, readings FROM production_rollups
+        WHERE project_name = ? AND resolution = ? AND bucket_start >= ? AND bucket_start < ?
+        ORDER BY bucket_start
+    ''', (project_name, resolution, start, end))
+
+
+
+# Analytics: holdings, dividends and yields computed in SQL, one query per
+# response. Callers cache the results under the versions below.
+
+@DB_QUERIES.timed('query', 'get_projects_version')
+def get_projects_version():
+    """Changes whenever any project's version does (versions only grow)"""
+    return query_one('SELECT COALESCE(SUM(version), 0) FROM project_versions')[0]
+
+
+@DB_QUERIES.timed('query', 'get_holder_version')
+def get_holder_version(holder_wallet_address):
+    """Changes whenever a project the holder is in changes, including the holder joining it"""
+    return query_one('''
+        SELECT COALESCE(SUM(v.version), 0) FROM positions pos
+        JOIN project_versions v ON v.project_name = pos.project_name
+        WHERE pos.holder_wallet_address = ?
+    ''', (holder_wallet_address,))[0]
+
+
+@DB_QUERIES.timed('query', 'get_holder_portfolio')
+def get_holder_portfolio(holder_wallet_address):
+    """Return (project_name, shares, total_shares, share_price_drops, status,
+    received_drops, payments) for every project the holder has shares in"""
+    return query_all('''
+        SELECT p.name, pos.shares, p.total_shares, p.share_price_drops, p.status,
+               COALESCE(r.received, 0), COALESCE(r.payments, 0)
+        FROM positions pos
+        JOIN projects p ON p.name = pos.project_name
+        LEFT JOIN (
+            SELECT d.project_name, SUM(dp.drops) AS received, COUNT(*) AS payments
+            FROM dividend_payouts dp JOIN dividends d ON d.id = dp.dividend_id
+            WHERE dp.holder_wallet_address = ? AND dp.status = 'CONFIRMED'
+            GROUP BY d.project_name
+        ) r ON r.project_name = p.name
+        WHERE pos.holder_wallet_address = ? AND pos.shares > 0
+        ORDER BY p.name
+    ''', (holder_wallet_address, holder_wallet_address))
+
+
+# A COMPLETED dividend paid exactly its amount (the allocations sum to it), so
+# only unfinished ones need their confirmed payouts added up. Purchases only
+# add shares, so holders are counted from the positions key alone.
+PROJECT_YIELDS = '''
+    SELECT p.name, p.total_shares, p.shares_sold, p.share_price_drops, p.status, p.created_at,
+           julianday('now') - julianday(p.created_at),
+           (SELECT COUNT(*) FROM positions WHERE project_name = p.name),
+           COUNT(d.id),
+           COALESCE(SUM(CASE WHEN d.status = 'COMPLETED' THEN d.amount_drops ELSE (
+               SELECT COALESCE(SUM(drops), 0) FROM dividend_payouts
+               WHERE dividend_id = d.id AND status = 'CONFIRMED') END), 0),
+           MAX(d.distribution_date),
+           (SELECT COALESCE(SUM(wh), 0) FROM production_rollups
+            WHERE project_name = p.name AND resolution = 'month')
+    FROM projects p LEFT JOIN dividends d ON d.project_name = p.name
+'''
+
+
+@DB_QUERIES.timed('query', 'get_project_yield')
+def get_project_yield(project_name):
+    """Return (name, total_shares, shares_sold, share_price_drops, status, created_at,
+    age_days, holders, dividends, paid_drops, last_dividend_date, production_wh)"""
+    return query_one(PROJECT_YIELDS + ' WHERE p.name = ? GROUP BY p.name', (project_name,))
+
+
+@DB_QUERIES.timed('query', 'list_project_yields')
+def list_project_yields():
+    """get_project_yield for every project, in one query"""
+    return query_all(PROJECT_YIELDS + ' GROUP BY p.name ORDER BY p.name')
+
+
+# Dividend schedules: periodic dividends paid from production revenue
+
+def upsert_dividend_schedule(conn, project_name, tariff_drops_per_kwh, interval_seconds, next_run_at):
+    """Create or change a project's schedule; readings already counted stay counted"""
+    conn.execute('''
+        INSERT INTO dividend_schedules (project_name, tariff_drops_per_kwh, interval_seconds, next_run_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (project_name) DO UPDATE SET
+            tariff_drops_per_kwh = excluded.tariff_drops_per_kwh,
+            interval_seconds = excluded.interval_seconds,
+            next_run_at = excluded.next_run_at
+    ''', (project_name, tariff_drops_per_kwh, interval_seconds, next_run_at))
+
+
+@DB_QUERIES.timed('query', 'list_due_dividend_schedules')
+def list_due_dividend_schedules(now):
+    """Return every schedule due at `now` with the energy produced since its last run.
+
+    Rows are (project_name, tariff_drops_per_kwh, interval_seconds,
+    next_run_at, shares_sold, wh, max_reading_id), in one query however many
+    projects are due. A schedule whose last run is still queued or running
+    waits for it. Call inside transaction(immediate=True) when acting on the
+    result, so no reading arrives and no other scheduler pays the same run in
+    between.
+    """
+    return query_all('''
+        SELECT s.project_name, s.tariff_drops_per_kwh, s.interval_seconds, s.next_run_at, p.shares_sold,
+               COALESCE(SUM(r.wh), 0), MAX(r.id)
+        FROM dividend_schedules s
+        JOIN projects p ON p.name = s.project_name
+        LEFT JOIN production_readings r ON r.project_name = s.project_name AND r.id > s.last_reading_id
+        WHERE s.next_run_at <= ?
+          AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.id = s.last_job_id AND j.status IN ('QUEUED', 'RUNNING'))
+        GROUP BY s.project_name
+        ORDER BY s.next_run_at
+    ''', (now,))
+
+
+def advance_dividend_schedule(conn, project_name, next_run_at, last_reading_id=None, job_id=None):
+    """Move a schedule to its next run. last_reading_id=None leaves the readings
+    uncounted, so their revenue is paid by a later run. Otherwise the old
+    watermark is kept, for reopen_failed_dividend_runs()."""
+    conn.execute('''
+        UPDATE dividend_schedules
+        SET next_run_at = ?,
+            previous_reading_id = CASE WHEN ? IS NULL THEN previous_reading_id ELSE last_reading_id END,
+            last_reading_id = COALESCE(?, last_reading_id), last_job_id = COALESCE(?, last_job_id)
+        WHERE project_name = ?
+    ''', (next_run_at, last_reading_id, last_reading_id, job_id, project_name))
+
+
+def reopen_failed_dividend_runs(conn, now):
+    """Uncount the readings of every scheduled run whose job failed before
+    journaling its dividend, and make the schedule due at `now`; returns how
+    many were reopened. A run whose dividend was journaled stays counted: its
+    revenue is in the dividend, and /resume_dividend pays what is left."""
+    return conn.execute('''
+        UPDATE dividend_schedules
+        SET last_reading_id = previous_reading_id, previous_reading_id = NULL, next_run_at = MIN(next_run_at, ?)
+        WHERE previous_reading_id IS NOT NULL AND last_job_id IN (
+            SELECT j.id FROM jobs j
+            WHERE j.status = 'FAILED'
+              AND NOT EXISTS (SELECT 1 FROM dividends d WHERE d.id = json_extract(j.payload, '$.dividend_id'))
+        )
+    ''', (now,)).rowcount
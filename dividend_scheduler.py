@@ -0,0 +1,98 @@
+import threading
+import time
+import uuid
+
+import db
+import jobs
+
+
+class DividendScheduler:
+    """Pays each scheduled project's production revenue as a periodic dividend.
+
+    A project with a row in dividend_schedules is paid every
+    `interval_seconds`. The amount is the energy in the readings it has not
+    counted yet times its feed-in tariff. Each payment is queued as a
+    distribute_dividends job, so runs survive restarts and the job workers
+    bound how many distributions are in flight. If that job fails before
+    journaling its dividend, the readings are counted again and the run is
+    queued once more at the next cycle. A background thread looks
+    for due schedules every `check_interval` seconds. Any number of
+    processes can run one, since a cycle reads and advances the schedules
+    under one write lock.
+    """
+
+    def __init__(self, check_interval=60.0):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.enqueued = 0
+        self.last_cycle_seconds = None
+
+    def run_cycle(self, now=None):
+        """Queue a dividend for every due schedule and return what was done"""
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        enqueued = []
+        skipped = []
+        with db.transaction('schedule_dividends', immediate=True) as conn:
+            reopened = db.reopen_failed_dividend_runs(conn, now)
+            for name, tariff, interval, next_run_at, shares_sold, wh, last_reading_id in \
+                    db.list_due_dividend_schedules(now):
+                # The next run stays on the schedule's grid, skipping runs missed while down.
+                next_run_at += interval * ((now - next_run_at) // interval + 1)
+                revenue_drops = wh * tariff // 1000
+                if not shares_sold or not revenue_drops:
+                    # Keep the readings, so their revenue goes into a later run.
+                    db.advance_dividend_schedule(conn, name, next_run_at)
+                    skipped.append({"name": name, "reason": "no shareholders" if not shares_sold else "no revenue"})
+                    continue
+                job_id = jobs.enqueue('distribute_dividends', {
+                    "name": name,
+                    "total_dividend_drops": revenue_drops,
+                    "production_wh": wh,
+                    "dividend_id": str(uuid.uuid4())
+                })
+                db.advance_dividend_schedule(conn, name, next_run_at, last_reading_id, job_id)
+                enqueued.append({"name": name, "job_id": job_id, "production_wh": wh,
+                                 "total_dividend_drops": revenue_drops})
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.cycles += 1
+            self.enqueued += len(enqueued)
+            self.last_cycle_seconds = elapsed
+        if enqueued or skipped:
+            print(f"Dividend cycle: queued {len(enqueued)} dividends ({reopened} failed runs again), "
+                  f"skipped {len(skipped)} in {elapsed:.3f}s")
+        return {"enqueued": enqueued, "skipped": skipped, "reopened": reopened, "elapsed_seconds": elapsed}
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                print(f"Dividend cycle failed: {e}")
+
+    def start(self):
+        """Start the background thread; check_interval <= 0 disables it"""
+        if self.check_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="dividend-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "check_interval": self.check_interval,
+                "cycles": self.cycles,
+                "enqueued": self.enqueued,
+                "last_cycle_seconds": self.last_cycle_seconds
+            }
@@ -0,0 +1,589 @@
+import hashlib
+import json
+import socket
+from bisect import bisect_left
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from xrpl.core.binarycodec import decode
+
+# Local stand-in for a rippled JSON-RPC node and the testnet faucet. It
+# implements just enough of the API (account_info, account_lines, account_tx,
+# submit, tx, ledger, fee, server_info) for the app and the payout engine to run against it without the
+# public testnet; POST /accounts funds an address like the faucet does. Besides
+# XRP payments it applies AccountSet (DefaultRipple only), TrustSet and
+# issued-currency payments, without reserves, quality or partial payments.
+
+BASE_FEE_DROPS = 10
+FAUCET_DROPS = 1000 * 1000000  # what one faucet call pays
+GENESIS_ADDRESS = 'rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh'  # pays faucet requests
+HISTORY_LEDGERS = 256  # validated account snapshots kept for historical account_info
+TX_HASH_PREFIX = bytes.fromhex('54584E00')  # "TXN\0"
+ASF_DEFAULT_RIPPLE = 8
+ACCOUNT_LINES_LIMIT = (10, 200, 400)  # rippled's minimum, default and maximum page size
+ACCOUNT_TX_LIMIT = (10, 200, 400)
+RIPPLE_EPOCH = 946684800  # unix time of the ledger's "date" zero
+LSF_DEFAULT_RIPPLE = 0x00800000
+
+
+def tx_hash(tx_blob):
+    """Return the rippled transaction hash of a signed blob"""
+    return hashlib.sha512(TX_HASH_PREFIX + bytes.fromhex(tx_blob)).digest()[:32].hex().upper()
+
+
+class FakeLedger:
+    """In-memory ledger state shared by all request handler threads"""
+
+    def __init__(self, close_interval=1.0, start_ledger=1000, latency=0.0):
+        self.close_interval = close_interval
+        self.latency = latency  # seconds added to every RPC, like a remote node
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.validated_accounts = {}
+        self.history = {}
+        self.validated_index = start_ledger
+        self.ledgers = {start_ledger: []}
+        self.close_times = {start_ledger: int(time.time())}
+        self.account_txs = {}  # address -> [(ledger_index, transaction_index, hash)] in ledger order
+        self.open_txs = []
+        self.held = {}
+        self.txs = {}
+        self.lines = {}  # (holder, issuer, currency) -> {"balance": Decimal, "limit": Decimal}
+        # Validated trust line states: key -> [(ledger_index, balance, limit)],
+        # one entry per ledger the line changed in, so account_lines can read
+        # any validated ledger without copying every line at every close.
+        self.line_history = {}
+        self.account_line_keys = {}  # address -> keys of its lines, either side, in creation order
+        self.changed_lines = set()
+        self.requests_served = 0
+        self.accounts[GENESIS_ADDRESS] = {"Balance": 10 ** 17, "Sequence": 1}
+
+    def fund(self, address, drops):
+        """Create or top up an account directly in the validated state"""
+        with self.lock:
+            account = self.accounts.setdefault(address, {"Balance": 0, "Sequence": self.validated_index})
+            account["Balance"] += int(drops)
+            self.validated_accounts[address] = dict(account)
+
+    def faucet(self, destination, drops=FAUCET_DROPS):
+        """Pay an address from the genesis account in the open ledger, as the faucet does"""
+        return self.pay(GENESIS_ADDRESS, destination, drops)
+
+    def pay(self, source, destination, drops):
+        """Apply an XRP payment from an existing account without signing it, e.g. to build up history"""
+        with self.lock:
+            tx_json = {
+                "TransactionType": 'Payment',
+                "Account": source,
+                "Destination": destination,
+                "Amount": str(drops),
+                "Fee": str(BASE_FEE_DROPS),
+                "Sequence": self.accounts[source]["Sequence"],
+            }
+            blob_hash = hashlib.sha512(json.dumps(tx_json, sort_keys=True).encode()).digest()[:32].hex().upper()
+            return self._apply(tx_json, blob_hash)[0]
+
+    def close_ledger(self):
+        """Validate the open ledger and retry any held transactions"""
+        with self.lock:
+            self.validated_index += 1
+            hashes = []
+            for position, entry in enumerate(self.open_txs):
+                entry["ledger_index"] = self.validated_index
+                entry["transaction_index"] = position
+                entry["validated"] = True
+                hashes.append(entry["hash"])
+                for address in self._threaded_accounts(entry["tx_json"]):
+                    self.account_txs.setdefault(address, []).append((self.validated_index, position, entry["hash"]))
+            self.ledgers[self.validated_index] = hashes
+            self.close_times[self.validated_index] = int(time.time())
+            self.open_txs = []
+            self.validated_accounts = {address: dict(account) for address, account in self.accounts.items()}
+            for key in self.changed_lines:
+                line = self.lines[key]
+                self.line_history[key].append((self.validated_index, line["balance"], line["limit"]))
+            self.changed_lines = set()
+            self.history[self.validated_index] = self.validated_accounts
+            self.history.pop(self.validated_index - HISTORY_LEDGERS, None)
+            for account, queued in list(self.held.items()):
+                for sequence in sorted(queued):
+                    tx_json, blob_hash = queued[sequence]
+                    if tx_json.get("LastLedgerSequence", self.validated_index + 1) <= self.validated_index:
+                        del queued[sequence]
+                        continue
+                    if self._apply(tx_json, blob_hash)[0] != 'terPRE_SEQ':
+                        del queued[sequence]
+                if not queued:
+                    del self.held[account]
+
+    def _apply(self, tx_json, blob_hash):
+        """Apply a decoded transaction to the open ledger; caller holds the lock"""
+        account = self.accounts.get(tx_json["Account"])
+        if account is None:
+            return 'terNO_ACCOUNT', 'The source account does not exist.'
+        # Like rippled's preflight, malformed transactions fail before the sequence is looked at.
+        malformed = self._malformed(tx_json)
+        if malformed:
+            return malformed, 'Malformed transaction.'
+        if tx_json.get("LastLedgerSequence", self.validated_index + 1) <= self.validated_index:
+            return 'tefMAX_LEDGER', 'Ledger sequence too high.'
+        if tx_json["Sequence"] < account["Sequence"]:
+            return 'tefPAST_SEQ', 'This sequence number has already passed.'
+        if tx_json["Sequence"] > account["Sequence"]:
+            self.held.setdefault(tx_json["Account"], {})[tx_json["Sequence"]] = (tx_json, blob_hash)
+            return 'terPRE_SEQ', 'Missing/inapplicable prior transaction.'
+        fee = int(tx_json["Fee"])
+        if account["Balance"] < fee:
+            return 'terINSUF_FEE_B', 'Account balance can\'t pay fee.'
+        account["Sequence"] += 1
+        account["Balance"] -= fee
+        apply = {
+            'Payment': self._apply_payment,
+            'TrustSet': self._apply_trust_set,
+            'AccountSet': self._apply_account_set,
+        }.get(tx_json["TransactionType"])
+        result = apply(tx_json, account) if apply else 'tesSUCCESS'
+        self.open_txs.append({"hash": blob_hash, "tx_json": tx_json, "result": result})
+        self.txs[blob_hash] = self.open_txs[-1]
+        return result, 'The transaction was applied.' if result == 'tesSUCCESS' else result
+
+    def _threaded_accounts(self, tx_json):
+        """The accounts whose account_tx lists a transaction"""
+        accounts = {tx_json["Account"]}
+        if "Destination" in tx_json:
+            accounts.add(tx_json["Destination"])
+        for field in ("Amount", "LimitAmount"):
+            if isinstance(tx_json.get(field), dict):
+                accounts.add(tx_json[field]["issuer"])
+        return accounts
+
+    def _malformed(self, tx_json):
+        """The tem code of a transaction that can never apply, or None; nothing is charged for it"""
+        if tx_json["TransactionType"] == 'Payment' and isinstance(tx_json["Amount"], dict) and \
+                Decimal(tx_json["Amount"]["value"]) <= 0:
+            return 'temBAD_AMOUNT'
+        if tx_json["TransactionType"] == 'TrustSet' and tx_json["LimitAmount"]["issuer"] == tx_json["Account"]:
+            return 'temDST_IS_SRC'
+        return None
+
+    def _apply_payment(self, tx_json, account):
+        """Move XRP between accounts, creating the destination if needed"""
+        amount = tx_json["Amount"]
+        if not isinstance(amount, str):
+            return self._apply_token_payment(tx_json, amount)
+        amount = int(amount)
+        if account["Balance"] < amount:
+            return 'tecUNFUNDED_PAYMENT'
+        account["Balance"] -= amount
+        destination = self.accounts.setdefault(tx_json["Destination"], {"Balance": 0, "Sequence": self.validated_index})
+        destination["Balance"] += amount
+        return 'tesSUCCESS'
+
+    def _apply_token_payment(self, tx_json, amount):
+        """Move an issued currency along trust lines: issuer to holder, back, or between holders"""
+        source, destination, issuer = tx_json["Account"], tx_json["Destination"], amount["issuer"]
+        value = Decimal(amount["value"])
+        sending = self.lines.get((source, issuer, amount["currency"])) if source != issuer else None
+        receiving = self.lines.get((destination, issuer, amount["currency"])) if destination != issuer else None
+        if source != issuer and (sending is None or sending["balance"] < value):
+            return 'tecPATH_PARTIAL'
+        if destination != issuer and receiving is None:
+            return 'tecPATH_DRY'
+        if source != issuer and destination != issuer and \
+                not self.accounts.get(issuer, {}).get("Flags", 0) & LSF_DEFAULT_RIPPLE:
+            return 'tecPATH_DRY'  # the issuer does not let its currency ripple between holders
+        if receiving is not None and receiving["balance"] + value > receiving["limit"]:
+            return 'tecPATH_PARTIAL'
+        if sending is not None:
+            sending["balance"] -= value
+            self.changed_lines.add((source, issuer, amount["currency"]))
+        if receiving is not None:
+            receiving["balance"] += value
+            self.changed_lines.add((destination, issuer, amount["currency"]))
+        return 'tesSUCCESS'
+
+    def _apply_trust_set(self, tx_json, account):
+        """Create a trust line or change its limit"""
+        limit = tx_json["LimitAmount"]
+        if limit["issuer"] not in self.accounts:
+            return 'tecNO_ISSUER'
+        key = (tx_json["Account"], limit["issuer"], limit["currency"])
+        self._line(key)["limit"] = Decimal(limit["value"])
+        self.changed_lines.add(key)
+        return 'tesSUCCESS'
+
+    def _line(self, key):
+        """The open state of a trust line, created empty if new; caller holds the lock"""
+        line = self.lines.get(key)
+        if line is None:
+            line = self.lines[key] = {"balance": Decimal(0), "limit": Decimal(0)}
+            self.line_history[key] = []
+            self.account_line_keys.setdefault(key[0], []).append(key)
+            self.account_line_keys.setdefault(key[1], []).append(key)
+        return line
+
+    def set_line(self, holder, issuer, currency, balance, limit):
+        """Create or overwrite a trust line directly in the validated state, like fund()"""
+        with self.lock:
+            key = (holder, issuer, currency)
+            line = self._line(key)
+            line["balance"], line["limit"] = Decimal(balance), Decimal(limit)
+            history = self.line_history[key]
+            if history and history[-1][0] == self.validated_index:
+                history.pop()
+            history.append((self.validated_index, line["balance"], line["limit"]))
+
+    def _apply_account_set(self, tx_json, account):
+        if tx_json.get("SetFlag") == ASF_DEFAULT_RIPPLE:
+            account["Flags"] = account.get("Flags", 0) | LSF_DEFAULT_RIPPLE
+        if tx_json.get("ClearFlag") == ASF_DEFAULT_RIPPLE:
+            account["Flags"] = account.get("Flags", 0) & ~LSF_DEFAULT_RIPPLE
+        return 'tesSUCCESS'
+
+    def line_balance(self, holder, issuer, currency):
+        """A holder's balance of an issued currency, as a Decimal (0 without a trust line)"""
+        with self.lock:
+            line = self.lines.get((holder, issuer, currency))
+            return line["balance"] if line else Decimal(0)
+
+    # JSON-RPC methods
+
+    def account_info(self, params):
+        with self.lock:
+            address = params.get("account")
+            index = params.get("ledger_index")
+            if index in ('current', 'open'):
+                account = self.accounts.get(address)
+                ledger = {"ledger_current_index": self.validated_index + 1}
+            elif isinstance(index, int) and index in self.history:
+                account = self.history[index].get(address)
+                ledger = {"ledger_index": index, "validated": True}
+            else:
+                account = self.validated_accounts.get(address)
+                ledger = {"ledger_index": self.validated_index, "validated": True}
+            if account is None:
+                return {"error": "actNotFound", "error_message": "Account not found.", "account": address, **ledger}
+            data = {"Account": address, "Balance": str(account["Balance"]), "Sequence": account["Sequence"],
+                    "Flags": account.get("Flags", 0)}
+            return {"account_data": data, **ledger}
+
+    def account_lines(self, params):
+        """An account's trust lines in a validated ledger, a page at a time.
+
+        The marker is opaque to callers (here: the position of the next line)
+        and only valid with the ledger_index it was returned with.
+        """
+        with self.lock:
+            address = params.get("account")
+            index = params.get("ledger_index", 'validated')
+            if index in ('validated', 'closed'):
+                index = self.validated_index
+            if index == self.validated_index:
+                accounts = self.validated_accounts
+            elif isinstance(index, int) and index in self.history:
+                accounts = self.history[index]
+            else:
+                return {"error": "lgrNotFound", "error_message": "ledgerNotFound"}
+            if address not in accounts:
+                return {"error": "actNotFound", "error_message": "Account not found.", "account": address,
+                        "ledger_index": index, "validated": True}
+            low, default, high = ACCOUNT_LINES_LIMIT
+            limit = min(max(int(params.get("limit", default)), low), high)
+            keys = self.account_line_keys.get(address, [])
+            try:
+                position = int(params.get("marker", 0))
+            except ValueError:
+                return {"error": "invalidParams", "error_message": "Invalid field 'marker'."}
+            lines = []
+            while position < len(keys) and len(lines) < limit:
+                key = keys[position]
+                position += 1
+                state = None
+                for ledger_index, balance, line_limit in reversed(self.line_history[key]):
+                    if ledger_index <= index:
+                        state = (balance, line_limit)
+                        break
+                if state is None:
+                    continue  # created after this ledger
+                holder, issuer, currency = key
+                balance, line_limit = state
+                mine = address == holder
+                lines.append({
+                    "account": issuer if mine else holder,
+                    "balance": str(balance if mine else -balance),
+                    "currency": currency,
+                    "limit": str(line_limit if mine else 0),
+                    "limit_peer": str(0 if mine else line_limit),
+                    "quality_in": 0,
+                    "quality_out": 0,
+                    "no_ripple": mine,
+                    "no_ripple_peer": not mine,
+                })
+            result = {"account": address, "lines": lines, "ledger_index": index, "validated": True}
+            if position < len(keys):
+                result["marker"] = str(position)
+            result["limit"] = limit
+            return result
+
+    def account_tx(self, params):
+        """Validated transactions touching an account between two ledgers, a page at a time.
+
+        Pages run oldest first with forward=true, else newest first. The
+        marker names the next transaction as {"ledger", "seq"}, as rippled's does.
+        """
+        with self.lock:
+            address = params.get("account")
+            if address not in self.validated_accounts:
+                return {"error": "actNotFound", "error_message": "Account not found.", "account": address}
+            first = min(self.ledgers)
+            low = params.get("ledger_index_min", -1)
+            high = params.get("ledger_index_max", -1)
+            low = first if low == -1 else low
+            high = self.validated_index if high == -1 else high
+            if low < first or high > self.validated_index or low > high:
+                return {"error": "lgrIdxsInvalid", "error_message": "Ledger indexes invalid."}
+            low_limit, default, high_limit = ACCOUNT_TX_LIMIT
+            limit = min(max(int(params.get("limit", default)), low_limit), high_limit)
+            forward = bool(params.get("forward"))
+            marker = params.get("marker")
+            entries = self.account_txs.get(address, [])
+            if forward:
+                position = bisect_left(entries, (marker["ledger"], marker["seq"]) if marker else (low,))
+                end = bisect_left(entries, (high + 1,))
+                page = entries[position:min(position + limit, end)]
+                following = entries[position + limit] if position + limit < end else None
+            else:
+                position = bisect_left(entries, (marker["ledger"], marker["seq"] + 1) if marker else (high + 1,))
+                start = bisect_left(entries, (low,))
+                page = entries[max(position - limit, start):position][::-1]
+                following = entries[position - limit - 1] if position - limit > start else None
+            transactions = []
+            for ledger_index, transaction_index, blob_hash in page:
+                entry = self.txs[blob_hash]
+                meta = {"TransactionResult": entry["result"], "TransactionIndex": transaction_index}
+                if entry["result"] == 'tesSUCCESS' and entry["tx_json"]["TransactionType"] == 'Payment':
+                    meta["delivered_amount"] = entry["tx_json"]["Amount"]
+                transactions.append({
+                    "tx": {**entry["tx_json"], "hash": blob_hash, "ledger_index": ledger_index,
+                           "date": self.close_times[ledger_index] - RIPPLE_EPOCH},
+                    "meta": meta,
+                    "validated": True,
+                })
+            result = {"account": address, "ledger_index_min": low, "ledger_index_max": high, "limit": limit,
+                      "transactions": transactions, "validated": True}
+            if following is not None:
+                result["marker"] = {"ledger": following[0], "seq": following[1]}
+            return result
+
+    def submit(self, params):
+        blob = params.get("tx_blob")
+        try:
+            tx_json = decode(blob)
+        except Exception as e:
+            return {"error": "invalidTransaction", "error_message": str(e)}
+        blob_hash = tx_hash(blob)
+        with self.lock:
+            if blob_hash in self.txs:
+                engine_result, message = 'tefALREADY', 'The exact transaction was already in this ledger.'
+            else:
+                engine_result, message = self._apply(tx_json, blob_hash)
+        return {
+            "engine_result": engine_result,
+            "engine_result_message": message,
+            "tx_blob": blob,
+            "tx_json": {**tx_json, "hash": blob_hash},
+            "accepted": engine_result == 'tesSUCCESS' or engine_result.startswith('tec'),
+        }
+
+    def tx(self, params):
+        with self.lock:
+            entry = self.txs.get(params.get("transaction"))
+            if entry is None:
+                return {"error": "txnNotFound", "error_message": "Transaction not found."}
+            return self._tx_result(entry)
+
+    def _tx_result(self, entry):
+        result = {**entry["tx_json"], "hash": entry["hash"], "meta": {"TransactionResult": entry["result"]}}
+        if entry.get("validated"):
+            result["ledger_index"] = entry["ledger_index"]
+            result["validated"] = True
+        else:
+            result["validated"] = False
+        return result
+
+    def ledger(self, params):
+        with self.lock:
+            index = params.get("ledger_index", 'validated')
+            if index in ('current', 'open'):
+                return {"ledger_current_index": self.validated_index + 1, "ledger": {"closed": False}, "validated": False}
+            if index in ('validated', 'closed'):
+                index = self.validated_index
+            index = int(index)
+            if index not in self.ledgers:
+                return {"error": "lgrNotFound", "error_message": "ledgerNotFound"}
+            ledger = {"ledger_index": str(index), "closed": True}
+            if params.get("transactions"):
+                hashes = self.ledgers[index]
+                if params.get("expand"):
+                    ledger["transactions"] = [
+                        {**self._tx_result(self.txs[h]), "metaData": {"TransactionResult": self.txs[h]["result"]}}
+                        for h in hashes
+                    ]
+                else:
+                    ledger["transactions"] = list(hashes)
+            return {"ledger": ledger, "ledger_hash": f"{index:064X}", "ledger_index": index, "validated": True}
+
+    def fee(self, params):
+        with self.lock:
+            return {
+                "current_ledger_size": str(len(self.open_txs)),
+                "current_queue_size": "0",
+                "expected_ledger_size": "1000",
+                "ledger_current_index": self.validated_index + 1,
+                "max_queue_size": "2000",
+                "drops": {
+                    "base_fee": str(BASE_FEE_DROPS),
+                    "median_fee": "5000",
+                    "minimum_fee": str(BASE_FEE_DROPS),
+                    "open_ledger_fee": str(BASE_FEE_DROPS),
+                },
+            }
+
+    def server_info(self, params):
+        with self.lock:
+            return {"info": {
+                "build_version": "1.12.0",
+                "server_state": "full",
+                "validated_ledger": {
+                    "seq": self.validated_index,
+                    "base_fee_xrp": BASE_FEE_DROPS / 1000000,
+                    "reserve_base_xrp": 10,
+                    "reserve_inc_xrp": 2,
+                },
+            }}
+
+    def handle(self, method, params):
+        """Dispatch a JSON-RPC call and wrap it in a rippled-style envelope"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests_served += 1
+        handler = getattr(self, method, None) if method in RPC_METHODS else None
+        if handler is None:
+            result = {"error": "unknownCmd", "error_message": "Unknown method."}
+        else:
+            result = handler(params)
+        result["status"] = 'error' if "error" in result else 'success'
+        return {"result": result}
+
+
+RPC_METHODS = {'account_info', 'account_lines', 'account_tx', 'submit', 'tx', 'ledger', 'fee', 'server_info'}
+
+
+def make_handler(ledger, latency=0.0):
+    """Build a request handler class bound to a FakeLedger, adding `latency` seconds to every call"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Headers and body are written separately; without this a kept-alive
+            # connection waits out the client's delayed ACK on every response.
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            payload = json.loads(body or b'{}')
+            status = 200
+            if latency:
+                time.sleep(latency)
+            if getattr(self.server, 'unavailable', False):
+                # Like a node behind a load balancer that has taken it out.
+                status, response = 503, b'Service Unavailable'
+            elif self.path.rstrip('/').endswith('/accounts'):
+                status, result = self.fund(payload.get("destination"))
+                response = json.dumps(result).encode()
+            else:
+                params = (payload.get("params") or [{}])[0]
+                response = json.dumps(ledger.handle(payload.get("method"), params)).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def fund(self, destination):
+            """Answer a faucet request the way the testnet faucet does"""
+            if not destination:
+                return 400, {"error": "destination is required"}
+            if ledger.latency:
+                time.sleep(ledger.latency)
+            result = ledger.faucet(destination)
+            if result != 'tesSUCCESS':
+                return 500, {"error": f"Funding failed: {result}"}
+            amount = FAUCET_DROPS / 1000000
+            return 200, {"account": {"classicAddress": destination, "address": destination},
+                         "amount": amount, "balance": amount}
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=0, close_interval=1.0, latency=0.0, ledger=None):
+    """Start a fake ledger in background threads and return (ledger, server).
+
+    Given an existing `ledger`, start one more server for it instead, like
+    another node of the same network, with its own `latency`. Setting
+    `server.unavailable = True` makes a server answer 503 until cleared.
+    """
+    if ledger is not None:
+        server = ThreadingHTTPServer((host, port), make_handler(ledger, latency))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return ledger, server
+    ledger = FakeLedger(close_interval=close_interval, latency=latency)
+    server = ThreadingHTTPServer((host, port), make_handler(ledger))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def close_loop():
+        while True:
+            time.sleep(ledger.close_interval)
+            ledger.close_ledger()
+
+    threading.Thread(target=close_loop, daemon=True).start()
+    return ledger, server
+
+
+def server_url(server):
+    """Return the JSON-RPC URL of a running fake ledger server"""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/"
+
+
+def faucet_url(server):
+    """Return the faucet URL of a running fake ledger server"""
+    return server_url(server) + "accounts"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local rippled JSON-RPC and faucet stand-in")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--close-interval", type=float, default=1.0, help="seconds between ledger closes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    args = parser.parse_args()
+    ledger, server = serve(args.host, args.port, args.close_interval, args.latency)
+    print(f"Fake ledger listening on {server_url(server)}")
+    print("Point the app at it with:")
+    print(f"  XRPL_CLIENT_URL={server_url(server)} XRPL_GATEWAY_URL={server_url(server)} "
+          f"FAUCET_URL={faucet_url(server)}")
+    while True:
+        time.sleep(60)
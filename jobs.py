@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import db
+from config import Config
+from metrics import JOBS
+
+# Background job queue backed by a SQLite table, so queued work survives
+# restarts and any number of worker threads (in any number of processes) can
+# share it. Handlers are registered by kind and return (body, http_status).
+
+handlers = {}
+_workers = []
+_stop = threading.Event()
+
+
+def register(kind, handler):
+    """Register the function that executes jobs of the given kind"""
+    handlers[kind] = handler
+
+
+def _query_one(sql, params=()):
+    cursor = db.get_connection().cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(sql, params).fetchone()
+
+
+def init_jobs_table():
+    """Create the jobs table if it does not exist"""
+    conn = db.get_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT,
+            payload TEXT,
+            status TEXT,
+            result TEXT,
+            http_status INTEGER,
+            created_at TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            lease_expires REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+
+
+def enqueue(kind, payload):
+    """Store a new job and return its id"""
+    if kind not in handlers:
+        raise Exception(f"No handler registered for job kind '{kind}'")
+    job_id = str(uuid.uuid4())
+    db.get_connection().execute('''
+        INSERT INTO jobs (id, kind, payload, status, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (job_id, kind, json.dumps(payload), 'QUEUED', datetime.now()))
+    return job_id
+
+
+def get_job(job_id):
+    """Return a job as a dict, or None if it does not exist"""
+    row = _query_one('SELECT * FROM jobs WHERE id = ?', (job_id,))
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "http_status": row["http_status"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"]
+    }
+
+
+def claim_next():
+    """Atomically move the oldest queued job to RUNNING and return it"""
+    with db.transaction('claim_next', immediate=True) as conn:
+        # Jobs whose worker died mid-run are not retried automatically: ledger
+        # payments may already have gone out.
+        conn.execute('''
+            UPDATE jobs SET status = 'FAILED', http_status = 500, finished_at = ?,
+                result = '{"error": "Job interrupted before completion"}'
+            WHERE status = 'RUNNING' AND lease_expires < ?
+        ''', (datetime.now(), time.time()))
+        row = _query_one('''
+            SELECT * FROM jobs WHERE status = 'QUEUED' ORDER BY created_at LIMIT 1
+        ''')
+        if row is not None:
+            conn.execute('''
+                UPDATE jobs SET status = 'RUNNING', started_at = ?, lease_expires = ?
+                WHERE id = ?
+            ''', (datetime.now(), time.time() + Config.JOB_LEASE_SECONDS, row["id"]))
+    return row
+
+
+def renew_lease(job_id, done):
+    """Extend a running job's lease until `done` is set, so a long run is not taken for a dead one"""
+    while not done.wait(Config.JOB_LEASE_SECONDS / 3):
+        try:
+            with db.transaction('renew_lease', immediate=True) as conn:
+                conn.execute('''
+                    UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'RUNNING'
+                ''', (time.time() + Config.JOB_LEASE_SECONDS, job_id))
+        except sqlite3.OperationalError as e:
+            print(f"Could not renew the lease of job {job_id}: {e}")
+    db.close_connection()
+
+
+def run_job(row):
+    """Execute one claimed job and record its outcome"""
+    start = time.perf_counter()
+    done = threading.Event()
+    renewer = threading.Thread(target=renew_lease, args=(row["id"], done), name=f"job-lease-{row['id']}", daemon=True)
+    renewer.start()
+    try:
+        body, http_status = handlers[row["kind"]](json.loads(row["payload"]))
+    except Exception as e:
+        print(f"Error in job {row['id']} ({row['kind']}): {e}")
+        body, http_status = {"error": str(e)}, 500
+    finally:
+        done.set()
+        renewer.join()
+    status = 'COMPLETED' if http_status < 400 else 'FAILED'
+    JOBS.observe(time.perf_counter() - start, row["kind"], status)
+    db.get_connection().execute('''
+        UPDATE jobs SET status = ?, result = ?, http_status = ?, finished_at = ?
+        WHERE id = ?
+    ''', (status, json.dumps(body, default=str), http_status, datetime.now(), row["id"]))
+
+
+def worker_loop(poll_interval=0.5):
+    """Claim and run jobs until the pool is stopped"""
+    while not _stop.is_set():
+        try:
+            row = claim_next()
+        except sqlite3.OperationalError as e:
+            print(f"Job queue busy: {e}")
+            row = None
+        if row is None:
+            _stop.wait(poll_interval)
+            continue
+        run_job(row)
+
+
+def start_workers(count=None):
+    """Start the background worker threads for this process"""
+    count = Config.JOB_WORKERS if count is None else count
+    _stop.clear()
+    for i in range(count):
+        worker = threading.Thread(target=worker_loop, name=f"job-worker-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+
+
+def stop_workers():
+    """Signal the worker threads to exit after their current job"""
+    _stop.set()
+    for worker in _workers:
+        worker.join()
+    _workers.clear()
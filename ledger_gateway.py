@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import httpx
+from xrpl.asyncio.clients import AsyncJsonRpcClient, AsyncWebsocketClient
+from xrpl.asyncio.clients.utils import json_to_response, request_to_json_rpc
+from xrpl.clients import JsonRpcClient
+
+from metrics import LEDGER_REQUESTS
+
+
+class KeepAliveJsonRpcClient(AsyncJsonRpcClient):
+    """AsyncJsonRpcClient that reuses one pooled HTTP connection set.
+
+    xrpl-py opens a fresh httpx client (and TCP/TLS connection) per request;
+    this keeps them alive for the lifetime of the gateway.
+    """
+
+    def __init__(self, url, max_connections=32, timeout=10.0):
+        super().__init__(url)
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def _request_impl(self, request):
+        response = await self.http.post(self.url, json=request_to_json_rpc(request))
+        return json_to_response(response.json())
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class PooledJsonRpcClient(JsonRpcClient):
+    """Sync client for xrpl-py's helpers that sends every call through an EndpointPool.
+
+    xrpl-py's helpers (autofill_and_sign, submit, get_fee, ...) all go through
+    _request_impl, so each of their RPCs is routed and timed separately.
+    """
+
+    def __init__(self, pool):
+        super().__init__(pool.endpoints[0].url)
+        self.pool = pool
+
+    async def _request_impl(self, request):
+        with LEDGER_REQUESTS.time('sync', request.method.value):
+            return self.pool.request(request)
+
+
+class PooledAsyncJsonRpcClient(AsyncJsonRpcClient):
+    """AsyncJsonRpcClient that sends through an EndpointPool over its own kept-alive connections"""
+
+    def __init__(self, pool):
+        super().__init__(pool.endpoints[0].url)
+        self.pool = pool
+        self.http = httpx.AsyncClient(timeout=pool.timeout, limits=pool.limits())
+
+    async def _request_impl(self, request):
+        return await self.pool.request_async(request, self.http)
+
+    async def close(self):
+        await self.http.aclose()
+
+
+class LedgerGateway:
+    """Runs xrpl-py's async clients on a private event loop thread.
+
+    Flask handlers are synchronous, so request() and request_many() submit
+    coroutines to that loop and block for the result. A websocket URL keeps one
+    persistent connection; an HTTP URL uses keep-alive JSON-RPC; an
+    EndpointPool (`pool`, instead of a URL) spreads calls over its nodes. At
+    most `max_concurrency` calls are in flight at once, and each one that takes
+    longer than `timeout` comes back as an exception.
+    """
+
+    def __init__(self, url=None, max_concurrency=16, timeout=30.0, pool=None):
+        self.url = url
+        self.pool = pool
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ledger-gateway", daemon=True)
+        self.thread.start()
+        self.client = None
+        self.semaphore = None
+        self.open_lock = None
+        self._run(self._setup())
+
+    def _run(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def _setup(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.open_lock = asyncio.Lock()
+        if self.pool is not None:
+            self.client = PooledAsyncJsonRpcClient(self.pool)
+        elif self.url.startswith(('ws://', 'wss://')):
+            self.client = AsyncWebsocketClient(self.url)
+        else:
+            self.client = KeepAliveJsonRpcClient(self.url, max_connections=self.max_concurrency)
+
+    def _is_websocket(self):
+        return isinstance(self.client, AsyncWebsocketClient)
+
+    async def _ensure_open(self):
+        if self._is_websocket() and not self.client.is_open():
+            async with self.open_lock:
+                if not self.client.is_open():
+                    await self.client.open()
+
+    async def _request(self, request):
+        async with self.semaphore:
+            await self._ensure_open()
+            try:
+                with LEDGER_REQUESTS.time('gateway', request.method.value):
+                    return await asyncio.wait_for(self.client.request(request), self.timeout)
+            except Exception:
+                # Drop a broken websocket so the next call reconnects.
+                if self._is_websocket() and self.client.is_open():
+                    await self.client.close()
+                raise
+
+    async def _request_many(self, requests):
+        return await asyncio.gather(*(self._request(r) for r in requests), return_exceptions=True)
+
+    def request(self, request):
+        """Send one request and wait for its response"""
+        return self._run(self._request(request))
+
+    def request_many(self, requests):
+        """Send many requests concurrently; failed ones come back as exceptions.
+
+        Requests queued behind `max_concurrency` others are not timed while
+        they wait, so a large batch is waited on until every request in it
+        has been answered or has timed out on its own.
+        """
+        return self._run(self._request_many(list(requests)))
+
+    async def _close(self):
+        if self._is_websocket():
+            if self.client.is_open():
+                await self.client.close()
+        elif self.client is not None:
+            await self.client.close()
+
+    def close(self):
+        self._run(self._close(), self.timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
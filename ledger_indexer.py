@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+
+from xrpl.models.requests import AccountInfo, AccountTx, Ledger
+
+import db
+
+# Transactions per account_tx call; rippled serves at most 400.
+ACCOUNT_TX_PAGE = 400
+RIPPLE_EPOCH = 946684800  # unix time of the ledger's "date" zero
+
+
+def normalize_transaction(address, entry):
+    """One account_tx entry as a wallet_transactions row, seen from `address`.
+
+    XRP delivered to the wallet counts positive in delta_drops and XRP it
+    sent negative; the fee is kept apart, and only charged to the sender.
+    Issued currencies go in currency/issuer/value with the same sign.
+    """
+    tx = entry.get("tx") or entry.get("tx_json")
+    meta = entry["meta"]
+    result = meta["TransactionResult"]
+    outgoing = tx["Account"] == address
+    counterparty = tx.get("Destination") if outgoing else tx["Account"]
+    if tx["TransactionType"] == 'TrustSet':
+        counterparty = tx["LimitAmount"]["issuer"] if outgoing else tx["Account"]
+    delta_drops, currency, issuer, value = 0, None, None, None
+    if tx["TransactionType"] == 'Payment' and result == 'tesSUCCESS':
+        delivered = meta.get("delivered_amount", tx.get("Amount"))
+        if delivered == 'unavailable':
+            delivered = tx["Amount"]
+        sign = 0 if outgoing and tx["Destination"] == address else -1 if outgoing else 1
+        if isinstance(delivered, str):
+            delta_drops = sign * int(delivered)
+        else:
+            currency, issuer = delivered["currency"], delivered["issuer"]
+            value = delivered["value"] if sign >= 0 else f"-{delivered['value']}"
+    return (
+        address,
+        tx.get("ledger_index", entry.get("ledger_index")),
+        meta["TransactionIndex"],
+        tx.get("hash", entry.get("hash")),
+        tx["TransactionType"],
+        counterparty,
+        delta_drops,
+        int(tx["Fee"]) if outgoing else 0,
+        currency,
+        issuer,
+        value,
+        result,
+        tx["date"] + RIPPLE_EPOCH if "date" in tx else None
+    )
+
+
+class LedgerIndexer:
+    """Copies every project wallet's validated history and balance into SQLite.
+
+    Each wallet has a cursor in wallet_index_cursors. A pass indexes the
+    ledgers after the last one it finished up to the validated ledger it
+    started at, oldest first, through account_tx. Every page is written in
+    one transaction together with the marker of the next, so a pass resumes
+    where a restart left it and memory holds one page per wallet. The
+    balance read at the pass's last ledger is served once the pass is done,
+    so balance and history always describe the same ledger. Wallets are
+    paged `batch_size` at a time through `request_many` (e.g. the ledger
+    gateway's). Any number of processes can run one: rows are keyed by
+    their position in the ledger, so a page written twice is stored once.
+    """
+
+    def __init__(self, request_many, check_interval=10.0, page_size=ACCOUNT_TX_PAGE, batch_size=16):
+        self.request_many = request_many
+        self.check_interval = check_interval
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.pages = 0
+        self.transactions = 0
+        self.errors = 0
+        self.last_cycle_seconds = None
+
+    def run_cycle(self):
+        """Index every project wallet up to the current validated ledger and return what was done"""
+        start = time.perf_counter()
+        with db.transaction('index_ledger') as conn:
+            db.add_wallet_index_cursors(conn)
+        response = self.request_many([Ledger(ledger_index="validated")])[0]
+        if isinstance(response, Exception):
+            raise response
+        validated = response.result["ledger_index"]
+        report = {"wallets": 0, "pages": 0, "transactions": 0, "errors": []}
+        cursors = db.list_wallet_index_cursors()
+        for i in range(0, len(cursors), self.batch_size):
+            self._index_batch(cursors[i:i + self.batch_size], validated, report)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.cycles += 1
+            self.pages += report["pages"]
+            self.transactions += report["transactions"]
+            self.errors += len(report["errors"])
+            self.last_cycle_seconds = elapsed
+        if report["transactions"] or report["errors"]:
+            print(f"Ledger index cycle: {report['transactions']} transactions from {report['wallets']} wallets "
+                  f"in {report['pages']} pages, {len(report['errors'])} errors in {elapsed:.3f}s")
+        report["validated_ledger"] = validated
+        report["elapsed_seconds"] = elapsed
+        return report
+
+    def _index_batch(self, cursors, validated, report):
+        """Run the passes of up to batch_size wallets to completion, one page of each per round"""
+        # (address, first ledger, last ledger, marker) of every pass in progress
+        passes = [(c[0], c[1], c[2], json.loads(c[3]) if c[3] else None) for c in cursors if c[2] is not None]
+        starting = [c for c in cursors if c[2] is None and c[1] <= validated]
+        if starting:
+            responses = self.request_many([AccountInfo(account=c[0], ledger_index=validated) for c in starting])
+            with db.transaction('index_batch') as conn:
+                for cursor, response in zip(starting, responses):
+                    if isinstance(response, Exception) or not response.is_successful():
+                        continue  # not funded yet, or the node is behind; try next cycle
+                    balance = int(response.result['account_data']['Balance'])
+                    db.start_wallet_index_pass(conn, cursor[0], validated, balance)
+                    passes.append((cursor[0], cursor[1], validated, None))
+        report["wallets"] += len(passes)
+        while passes:
+            responses = self.request_many([
+                AccountTx(account=address, ledger_index_min=first, ledger_index_max=last, forward=True,
+                          limit=self.page_size, marker=marker)
+                for address, first, last, marker in passes
+            ])
+            following = []
+            with db.transaction('index_batch') as conn:
+                for (address, first, last, marker), response in zip(passes, responses):
+                    if isinstance(response, Exception) or not response.is_successful():
+                        report["errors"].append({"address": address, "error": str(
+                            response if isinstance(response, Exception) else response.result)})
+                        continue  # the cursor still holds this page's marker
+                    rows = [normalize_transaction(address, entry) for entry in response.result["transactions"]]
+                    next_marker = response.result.get("marker")
+                    report["transactions"] += db.add_wallet_transactions(
+                        conn, address, rows, None if next_marker is None else json.dumps(next_marker))
+                    report["pages"] += 1
+                    if next_marker is None:
+                        db.complete_wallet_index_pass(conn, address, time.time())
+                    else:
+                        following.append((address, first, last, next_marker))
+            passes = following
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                print(f"Ledger index cycle failed: {e}")
+
+    def start(self):
+        """Start the background thread; check_interval <= 0 disables it"""
+        if self.check_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ledger-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "check_interval": self.check_interval,
+                "cycles": self.cycles,
+                "pages": self.pages,
+                "transactions": self.transactions,
+                "errors": self.errors,
+                "last_cycle_seconds": self.last_cycle_seconds
+            }
@@ -0,0 +1,290 @@
+import threading
+import time
+
+import httpx
+from xrpl.asyncio.clients.utils import json_to_response, request_to_json_rpc
+from xrpl.models.requests import ServerInfo
+
+# rippled errors meaning this node cannot answer right now, though another
+# might: overloaded, out of sync, or missing the ledger asked for.
+RETRYABLE_ERRORS = ('tooBusy', 'slowDown', 'noNetwork', 'noCurrent', 'noClosed', 'lgrNotFound')
+
+# Calls that must not be sent twice after an ambiguous failure: the first node
+# may have applied the transaction, and a second would answer tefALREADY or
+# tefPAST_SEQ, which callers read as "not applied".
+UNSAFE_TO_RESEND = ('submit', 'submit_multisigned')
+
+
+class Endpoint:
+    """One rippled JSON-RPC URL and what the pool has seen of it"""
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None  # moving average of successful calls, in seconds
+        self.in_flight = 0
+        self.failures = 0  # in a row
+        self.down_until = 0.0
+        self.lagging = False
+        self.validated_ledger = None
+        self.requests = 0
+        self.errors = 0
+
+
+class RetryBudget:
+    """Allows retries in proportion to requests, so failover cannot multiply the load on a struggling network.
+
+    Every request adds `ratio` of a retry to the budget and every retry takes
+    one out; `min_per_second` more trickle in so a quiet process can still
+    fail over. The budget never holds more than `capacity` retries.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=10.0, capacity=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.balance = capacity
+        self.updated = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self, deposit):
+        now = time.monotonic()
+        self.balance = min(self.capacity, self.balance + deposit + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        with self.lock:
+            self._refill(self.ratio)
+
+    def withdraw(self):
+        """Take one retry from the budget; False if there is none left"""
+        with self.lock:
+            self._refill(0)
+            if self.balance < 1:
+                self.exhausted += 1
+                return False
+            self.balance -= 1
+            return True
+
+
+class EndpointPool:
+    """Spreads JSON-RPC calls over several rippled nodes, fastest healthy node first.
+
+    Each call goes to the node with the lowest moving-average latency among
+    those not cooling down after a failure and not lagging behind the others'
+    validated ledger. A connection error, a 5xx/429, or a rippled error from
+    RETRYABLE_ERRORS moves the call to the next node, up to `max_attempts`
+    nodes and as the retry budget allows; the failed node sits out
+    `cooldown` seconds. A submit that timed out is not resent (see
+    UNSAFE_TO_RESEND): the caller settles it by its hash instead. A
+    background check calls server_info on every node each `health_interval`
+    seconds, which measures idle nodes and brings recovered ones back. Every
+    node keeps a pool of kept-alive connections.
+
+    Both xrpl-py's sync helpers (through ledger_gateway.PooledJsonRpcClient)
+    and the async gateway use one pool, so they share what it has learned.
+    """
+
+    def __init__(self, urls, timeout=10.0, max_connections=32, max_attempts=3, cooldown=10.0,
+                 health_interval=5.0, max_ledger_lag=3, retry_ratio=0.2, alpha=0.2):
+        if not urls:
+            raise ValueError("At least one ledger endpoint is required")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_attempts = max_attempts
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.max_ledger_lag = max_ledger_lag
+        self.alpha = alpha
+        self.budget = RetryBudget(ratio=retry_ratio)
+        self.lock = threading.Lock()
+        self.http = httpx.Client(timeout=timeout, limits=self.limits())
+        self.failovers = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def limits(self):
+        # Connection limits are per client, and one client serves every node.
+        connections = self.max_connections * len(self.endpoints)
+        return httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    def ranked(self):
+        """Endpoints in the order a call tries them: healthy by latency, then the rest"""
+        now = time.monotonic()
+        with self.lock:
+            # Unmeasured nodes go first, so they get measured.
+            return sorted(self.endpoints, key=lambda e: (
+                e.down_until > now or e.lagging,
+                e.latency or 0.0,
+                e.in_flight
+            ))
+
+    def _begin(self, endpoint):
+        with self.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        return time.monotonic()
+
+    def _succeeded(self, endpoint, started):
+        elapsed = time.monotonic() - started
+        with self.lock:
+            endpoint.in_flight -= 1
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = elapsed
+            else:
+                endpoint.latency += self.alpha * (elapsed - endpoint.latency)
+
+    def _failed(self, endpoint):
+        with self.lock:
+            endpoint.in_flight -= 1
+            endpoint.errors += 1
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + self.cooldown
+
+    def _retryable(self, status_code, data):
+        if status_code >= 500 or status_code == 429:
+            return True
+        result = data.get("result", {}) if isinstance(data, dict) else {}
+        return result.get("error") in RETRYABLE_ERRORS
+
+    def _may_resend(self, request, error):
+        """Whether a call that raised `error` can go to another node"""
+        return request.method.value not in UNSAFE_TO_RESEND or isinstance(error, (httpx.ConnectError,
+                                                                                httpx.ConnectTimeout))
+
+    def _attempts(self):
+        """The endpoints one call may try, stopping when max_attempts or the retry budget runs out"""
+        self.budget.deposit()
+        for attempt, endpoint in enumerate(self.ranked()[:self.max_attempts]):
+            if attempt:
+                if not self.budget.withdraw():
+                    return
+                with self.lock:
+                    self.failovers += 1
+            yield endpoint
+
+    def _respond(self, response):
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {"result": {"status": "error", "error": response.status_code,
+                                                     "error_message": response.text}}
+
+    def request(self, request):
+        """Send one request, failing over to the next node if needed; returns an xrpl Response"""
+        payload = request_to_json_rpc(request)
+        last = None
+        for endpoint in self._attempts():
+            started = self._begin(endpoint)
+            try:
+                status_code, data = self._respond(self.http.post(endpoint.url, json=payload))
+            except httpx.HTTPError as e:
+                self._failed(endpoint)
+                if not self._may_resend(request, e):
+                    raise
+                last = e
+                continue
+            if self._retryable(status_code, data):
+                self._failed(endpoint)
+                last = data
+                continue
+            self._succeeded(endpoint, started)
+            return json_to_response(data)
+        return self._give_up(last)
+
+    async def request_async(self, request, http):
+        """request() for an event loop, sending through `http`, an httpx.AsyncClient"""
+        payload = request_to_json_rpc(request)
+        last = None
+        for endpoint in self._attempts():
+            started = self._begin(endpoint)
+            try:
+                status_code, data = self._respond(await http.post(endpoint.url, json=payload))
+            except httpx.HTTPError as e:
+                self._failed(endpoint)
+                if not self._may_resend(request, e):
+                    raise
+                last = e
+                continue
+            if self._retryable(status_code, data):
+                self._failed(endpoint)
+                last = data
+                continue
+            self._succeeded(endpoint, started)
+            return json_to_response(data)
+        return self._give_up(last)
+
+    def _give_up(self, last):
+        if isinstance(last, dict) and "result" in last:
+            return json_to_response(last)  # the node's own answer, e.g. lgrNotFound everywhere
+        raise Exception(f"No ledger endpoint could answer: {last}")
+
+    def check_health(self):
+        """Probe every endpoint with server_info, then mark those behind the best validated ledger"""
+        payload = request_to_json_rpc(ServerInfo())
+        for endpoint in self.endpoints:
+            started = self._begin(endpoint)
+            try:
+                status_code, data = self._respond(self.http.post(endpoint.url, json=payload,
+                                                                 timeout=min(self.timeout, 2.0)))
+                validated = data["result"]["info"]["validated_ledger"]["seq"]
+            except (httpx.HTTPError, KeyError, TypeError):
+                self._failed(endpoint)
+                continue
+            self._succeeded(endpoint, started)
+            with self.lock:
+                endpoint.down_until = 0.0
+                endpoint.validated_ledger = validated
+        with self.lock:
+            best = max((e.validated_ledger or 0 for e in self.endpoints), default=0)
+            for endpoint in self.endpoints:
+                endpoint.lagging = endpoint.validated_ledger is not None and \
+                    best - endpoint.validated_ledger > self.max_ledger_lag
+
+    def _loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"Ledger health check failed: {e}")
+
+    def start(self):
+        """Measure every endpoint once, then keep checking in the background; health_interval <= 0 disables it"""
+        if self._thread is not None:
+            return
+        self.check_health()
+        if self.health_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ledger-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.http.close()
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "endpoints": [{
+                    "url": e.url,
+                    "healthy": e.down_until <= now and not e.lagging,
+                    "latency_ms": None if e.latency is None else e.latency * 1000,
+                    "in_flight": e.in_flight,
+                    "validated_ledger": e.validated_ledger,
+                    "requests": e.requests,
+                    "errors": e.errors
+                } for e in self.endpoints],
+                "failovers": self.failovers,
+                "retry_budget": self.budget.balance,
+                "retries_refused": self.budget.exhausted
+            }
@@ -0,0 +1,225 @@
+import argparse
+import itertools
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fake_ledger
+
+# End-to-end load test. Drives the HTTP API at a fixed request rate and reports
+# latency percentiles and throughput per endpoint. By default the whole stack
+# runs in this process: the fake ledger and faucet, and the app on a temporary
+# database with its job workers and wallet pool. Pass --app-url to load an app
+# that is already running instead.
+#
+# Requests are sent on schedule whether or not earlier ones have finished, and
+# latency is measured from the scheduled send time, so a backlog shows up in
+# the percentiles instead of silently lowering the request rate.
+
+JOB_POLL_INTERVAL = 0.05
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+def start_local_stack(args):
+    """Start the fake ledger and the app on free ports and return the app's base URL"""
+    ledger, server = fake_ledger.serve(close_interval=args.close_interval, latency=args.ledger_latency)
+    os.environ.update({
+        'DATABASE': os.path.join(tempfile.mkdtemp(prefix="solar-load-"), "load.db"),
+        'XRPL_CLIENT_URL': fake_ledger.server_url(server),
+        'XRPL_GATEWAY_URL': fake_ledger.server_url(server),
+        'FAUCET_URL': fake_ledger.faucet_url(server),
+        'LEDGER_POLL_INTERVAL': str(args.close_interval / 4),
+        'WALLET_POOL_SIZE': str(args.wallet_pool),
+        'JOB_WORKERS': str(args.job_workers),
+    })
+    from werkzeug.serving import make_server
+    import solar_crowdfunding
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no line per request
+    app_server = make_server('127.0.0.1', 0, solar_crowdfunding.app, threaded=True)
+    threading.Thread(target=app_server.serve_forever, daemon=True).start()
+    print(f"Fake ledger at {fake_ledger.server_url(server)}, app at http://127.0.0.1:{app_server.server_port}")
+    return f"http://127.0.0.1:{app_server.server_port}"
+
+
+class LoadTest:
+    """Issues API calls and records their latencies, thread-safely"""
+
+    def __init__(self, base_url, job_timeout):
+        self.base_url = base_url.rstrip('/')
+        self.job_timeout = job_timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.projects = []
+        self.funded_projects = []
+        self.names = itertools.count()
+        self.run_id = f"{int(time.time()) % 100000:05d}"
+
+    def session(self):
+        if getattr(self.local, 'session', None) is None:
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def record(self, label, started, ok, error=None):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            if ok:
+                self.latencies.setdefault(label, []).append(elapsed)
+            else:
+                self.errors.setdefault(label, []).append(error)
+
+    def post_job(self, label, path, data, started):
+        """POST a write request and wait for its job; records enqueue and completion latency"""
+        try:
+            response = self.session().post(f"{self.base_url}{path}", json=data, timeout=30)
+            if response.status_code != 202:
+                self.record(f"{label} (enqueue)", started, False, f"HTTP {response.status_code}")
+                return None
+            self.record(f"{label} (enqueue)", started, True)
+            status_url = response.json()["status_url"]
+            deadline = time.time() + self.job_timeout
+            while time.time() < deadline:
+                job = self.session().get(f"{self.base_url}{status_url}", timeout=30).json()
+                if job["status"] in ('COMPLETED', 'FAILED'):
+                    ok = job["status"] == 'COMPLETED'
+                    self.record(label, started, ok, None if ok else (job["result"] or {}).get("error"))
+                    return job["result"] if ok else None
+                time.sleep(JOB_POLL_INTERVAL)
+            self.record(label, started, False, "job timed out")
+        except Exception as e:
+            self.record(label, started, False, str(e))
+        return None
+
+    def create_project(self, started):
+        name = f"load-{self.run_id}-{next(self.names)}"
+        result = self.post_job("create_project", "/create_project", {
+            "name": name,
+            "description": "Load test project",
+            "location": "Nowhere",
+            "total_power_kw": 100,
+            "total_shares": 1000000,
+            "share_price_xrp": 0.001
+        }, started)
+        if result is not None:
+            with self.lock:
+                self.projects.append(name)
+
+    def buy_shares(self, started, name=None):
+        name = name or random.choice(self.projects)
+        result = self.post_job("buy_shares", "/buy_shares",
+                               {"name": name, "shares_amount": random.randint(1, 10)}, started)
+        if result is not None:
+            with self.lock:
+                if name not in self.funded_projects:
+                    self.funded_projects.append(name)
+
+    def distribute_dividends(self, started):
+        self.post_job("distribute_dividends", "/distribute_dividends",
+                      {"name": random.choice(self.funded_projects), "total_dividend_xrp": 0.01}, started)
+
+    def get_project(self, started):
+        try:
+            response = self.session().get(f"{self.base_url}/project/{random.choice(self.projects)}", timeout=30)
+            self.record("project", started, response.status_code == 200, f"HTTP {response.status_code}")
+        except Exception as e:
+            self.record("project", started, False, str(e))
+
+    def setup(self, projects):
+        """Create projects and give each a holder, so every endpoint has something to act on"""
+        for _ in range(projects):
+            self.create_project(time.perf_counter())
+        if not self.projects:
+            raise Exception(f"Could not create any project: {self.errors}")
+        for name in list(self.projects):
+            self.buy_shares(time.perf_counter(), name)
+        if not self.funded_projects:
+            raise Exception(f"Could not buy shares in any project: {self.errors}")
+        self.latencies.clear()
+        self.errors.clear()
+
+    def run(self, mix, rate, duration, concurrency):
+        """Send rate * duration calls picked by weight from `mix`, on a fixed schedule"""
+        operations = {
+            "project": self.get_project,
+            "buy": self.buy_shares,
+            "dividend": self.distribute_dividends,
+            "create": self.create_project,
+        }
+        names, weights = zip(*mix.items())
+        total = int(rate * duration)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for i in range(total):
+                scheduled = start + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(operations[random.choices(names, weights)[0]], scheduled)
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        print(f"{'endpoint':<32} {'ok':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'max ms':>9}")
+        for label in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(label, []))
+            print(f"{label:<32} {len(values):>6} {len(self.errors.get(label, [])):>5} "
+                  f"{len(values) / elapsed:>8.2f} {percentile(values, 50) * 1000:>9.1f} "
+                  f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f} "
+                  f"{(values[-1] if values else 0) * 1000:>9.1f}")
+        for label, errors in sorted(self.errors.items()):
+            print(f"{label} errors, first: {errors[0]}")
+
+
+def parse_mix(text):
+    """Parse 'project=70,buy=20' into {'project': 70.0, 'buy': 20.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        if name not in ('project', 'buy', 'dividend', 'create'):
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of the HTTP API")
+    parser.add_argument("--app-url", help="load a running app instead of starting a local stack")
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("project=70,buy=20,dividend=5,create=5"))
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--projects", type=int, default=3, help="projects created before the run")
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--close-interval", type=float, default=1.0, help="local stack: seconds per ledger")
+    parser.add_argument("--ledger-latency", type=float, default=0.0, help="local stack: seconds per ledger call")
+    parser.add_argument("--wallet-pool", type=int, default=20, help="local stack: funded wallets kept ready")
+    parser.add_argument("--job-workers", type=int, default=4, help="local stack: background job workers")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    base_url = args.app_url or start_local_stack(args)
+    load = LoadTest(base_url, args.job_timeout)
+    load.setup(args.projects)
+    print(f"Sending {int(args.rate * args.duration)} requests at {args.rate:g}/s, mix {args.mix}")
+    elapsed = load.run(args.mix, args.rate, args.duration, args.concurrency)
+    load.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# In-process latency histograms, rendered in the Prometheus text format by
+# the /metrics endpoint. Each process keeps its own numbers; with several
+# gunicorn workers, scrape each worker or aggregate the samples by instance.
+
+# Upper bounds in seconds, from a fast SQLite read to a slow ledger validation.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by label values"""
+
+    def __init__(self, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, seconds, *labelvalues):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """Time a block; it is recorded even if the block raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def timed(self, *labelvalues):
+        """Decorator form of time()"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(*labelvalues):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labelvalues, values in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = ','.join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = '{' + ','.join(labels) + '}' if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {values[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Return every histogram in the Prometheus text exposition format"""
+    return '\n'.join(line for histogram in _registry for line in histogram.render()) + '\n'
+
+
+HTTP_REQUESTS = Histogram('http_request_duration_seconds', 'Time to handle an HTTP request.',
+                          ('method', 'endpoint', 'status'))
+JOBS = Histogram('job_duration_seconds', 'Time to run a background job.', ('kind', 'status'))
+LEDGER_REQUESTS = Histogram('ledger_request_duration_seconds', 'Time for one XRPL RPC call.',
+                            ('client', 'method'))
+LEDGER_OPERATIONS = Histogram('ledger_operation_duration_seconds',
+                              'Time for a multi-call ledger step such as signing and submitting.', ('operation',))
+FAUCET_REQUESTS = Histogram('faucet_request_duration_seconds', 'Time for one faucet call.', ('outcome',))
+DB_QUERIES = Histogram('db_query_duration_seconds', 'Time for an SQLite read or write transaction.',
+                       ('kind', 'caller'))
@@ -0,0 +1,75 @@
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+# Exact XRP arithmetic. Amounts are kept as integer drops (1 XRP = 1,000,000
+# drops) everywhere they are stored or paid; XRP floats only appear at the API
+# edge, for display.
+
+DROPS_PER_XRP = 1000000
+
+
+def xrp_to_drops(xrp):
+    """Convert an XRP amount (number or string) to integer drops, exactly.
+
+    Floats go through their shortest decimal repr, so 0.05 becomes 50000 drops
+    rather than 49999. Amounts finer than one drop are rejected.
+    """
+    try:
+        drops = Decimal(str(xrp)) * DROPS_PER_XRP
+    except InvalidOperation:
+        raise ValueError(f"Invalid XRP amount: {xrp!r}")
+    if not drops.is_finite() or drops != drops.to_integral_value():
+        raise ValueError(f"XRP amount {xrp!r} is not a whole number of drops")
+    return int(drops)
+
+
+def drops_to_xrp(drops):
+    """Convert integer drops to an XRP float for display"""
+    return drops / DROPS_PER_XRP
+
+
+def allocate(total, weights, weight_sum=None):
+    """Split `total` drops in proportion to integer `weights`, summing exactly to `total`.
+
+    Largest-remainder method: every entry gets the floor of its exact share,
+    and the drops left over go one each to the entries with the largest
+    remainders (ties to the larger weight, then the earlier entry). Each
+    result is within one drop of its exact share. Pass `weight_sum` when it
+    is already known (e.g. a holder snapshot's weight_sum) to skip summing.
+    """
+    weights = list(weights)
+    if weight_sum is None:
+        weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise ValueError("Weights must sum to a positive number")
+    if total < 0 or any(w < 0 for w in weights):
+        raise ValueError("Total and weights must not be negative")
+
+    # Remainders depend only on the weight, and holders' share counts repeat a
+    # lot, so each distinct weight is divided once and the leftover drops are
+    # handed out a whole weight group at a time.
+    counts = Counter(weights)
+    amounts = {}
+    remainders = {}
+    for w in counts:
+        amounts[w], remainders[w] = divmod(total * w, weight_sum)
+    leftover = total - sum(q * counts[w] for w, q in amounts.items())
+    if not 0 <= leftover <= len(weights):
+        raise ValueError("weight_sum does not match the weights")
+    partial = None
+    if leftover:
+        # Two stable sorts: by remainder, ties by larger weight.
+        by_weight = sorted(counts, reverse=True)
+        for w in sorted(by_weight, key=remainders.__getitem__, reverse=True):
+            if counts[w] > leftover:
+                partial = w
+                break
+            amounts[w] += 1
+            leftover -= counts[w]
+            if not leftover:
+                break
+    shares = [amounts[w] for w in weights]
+    if partial is not None:
+        for i in [i for i, w in enumerate(weights) if w == partial][:leftover]:
+            shares[i] += 1
+    return shares
@@ -0,0 +1,254 @@
+import time
+
+from xrpl.core.binarycodec import encode
+from xrpl.models.requests import AccountInfo, SubmitOnly
+from xrpl.models.transactions import Payment
+from xrpl.ledger import get_fee, get_latest_validated_ledger_sequence
+from xrpl.transaction import sign
+
+from signer import REJECTED_PREFIXES
+
+# Number of ledgers a signed payment stays valid for. Large runs take several
+# ledgers just to submit, so this is wider than xrpl-py's default of 20.
+LEDGER_OFFSET = 200
+
+
+def get_account_sequence(client, address):
+    """Return the next sequence number for an account from the current ledger"""
+    response = client.request(AccountInfo(account=address, ledger_index="current"))
+    if not response.is_successful():
+        raise Exception(f"Could not read account sequence: {response.result}")
+    return response.result['account_data']['Sequence']
+
+
+def sign_payment(wallet, destination, drops, sequence, fee, last_ledger_sequence):
+    """Build and sign a Payment locally with explicit sequence, fee and expiry"""
+    payment = Payment(
+        account=wallet.classic_address,
+        destination=destination,
+        amount=str(drops),
+        sequence=sequence,
+        fee=fee,
+        last_ledger_sequence=last_ledger_sequence
+    )
+    return sign(payment, wallet)
+
+
+def record_signed(outcome, tx):
+    """Store a signed payment's blob, hash and sequence on its outcome"""
+    outcome["tx_blob"] = encode(tx.to_xrpl())
+    outcome["tx_hash"] = tx.get_hash()
+    outcome["sequence"] = tx.sequence
+    outcome["last_ledger_sequence"] = tx.last_ledger_sequence
+
+
+def submit_blob(client, tx_blob):
+    """Submit an already signed blob and return the preliminary engine result"""
+    return client.request(SubmitOnly(tx_blob=tx_blob)).result.get('engine_result', '')
+
+
+def submit_payments(client, confirmations, wallet, outcomes, sequence, fee, last_ledger_sequence,
+                    on_signed=None, signer=sign_payment, sequences=None):
+    """Sign every outcome's payment up front and stream them to the ledger in order.
+
+    Submissions do not wait for validation; each payment is registered with the
+    confirmation service just before it is sent. If a payment is rejected before
+    it consumes its sequence, the payments after it are re-signed so the
+    sequence stays gap-free. `on_signed(outcomes)` is called with every batch
+    of signed outcomes before any of them is submitted, so a caller can
+    journal the blobs first. `signer` builds each payment, and `sequences`
+    is the LocalSigner that reserved the batch's sequences, if any; see pay_out().
+    """
+    address = wallet.classic_address
+    end = sequence + len(outcomes)
+    for i, outcome in enumerate(outcomes):
+        record_signed(outcome, signer(wallet, outcome["holder_address"], outcome["drops"],
+                                      sequence + i, fee, last_ledger_sequence))
+    if on_signed:
+        on_signed(outcomes)
+    next_sequence = sequence
+    for i, outcome in enumerate(outcomes):
+        for attempt in range(2):
+            if outcome["sequence"] != next_sequence:
+                record_signed(outcome, signer(wallet, outcome["holder_address"], outcome["drops"],
+                                              next_sequence, fee, last_ledger_sequence))
+                if on_signed:
+                    on_signed([outcome])
+            outcome["waiter"] = confirmations.watch(outcome["tx_hash"], last_ledger_sequence,
+                                                    wallet.classic_address, outcome["sequence"])
+            try:
+                engine_result = submit_blob(client, outcome["tx_blob"])
+            except Exception as e:
+                # The node may or may not have applied it; let confirmation decide.
+                outcome["engine_result"] = f"submit error: {e}"
+                outcome["status"] = 'SUBMITTED'
+                break
+            outcome["engine_result"] = engine_result
+            if engine_result.startswith(REJECTED_PREFIXES):
+                confirmations.cancel(outcome.pop("waiter"))
+                if engine_result == 'tefPAST_SEQ' and attempt == 0:
+                    if sequences is None:
+                        next_sequence = get_account_sequence(client, address)
+                        continue
+                    # The wallet was used elsewhere: reserve the rest again after its new sequence.
+                    sequences.release_batch(address, range(next_sequence, end))
+                    sequences.resync(address)
+                    next_sequence = sequences.reserve_batch(address, len(outcomes) - i, last_ledger_sequence)
+                    end = next_sequence + len(outcomes) - i
+                    continue
+                outcome["status"] = 'FAILED'
+            else:
+                outcome["status"] = 'SUBMITTED'
+                next_sequence += 1
+            break
+    if sequences is not None:
+        sequences.release_batch(address, range(next_sequence, end))
+    return next_sequence
+
+
+def submit_concurrently(request_many, confirmations, outcomes):
+    """Submit signed payments from many accounts at once, each account's in sequence order.
+
+    Outcomes carry "account" plus what record_signed() stores. They go out in
+    waves through `request_many` (e.g. the ledger gateway's): the first
+    payment of every account, then the second, and so on. After an account
+    has a payment rejected, its later ones are not sent, as they could
+    never apply.
+    """
+    chains = {}
+    for outcome in sorted(outcomes, key=lambda o: o["sequence"]):
+        chains.setdefault(outcome["account"], []).append(outcome)
+    broken = set()
+    for wave in range(max((len(chain) for chain in chains.values()), default=0)):
+        batch = []
+        for account, chain in chains.items():
+            if wave >= len(chain):
+                continue
+            outcome = chain[wave]
+            if account in broken:
+                outcome["status"] = 'FAILED'
+                outcome["engine_result"] = 'not sent: an earlier payment from this account was rejected'
+                continue
+            outcome["waiter"] = confirmations.watch(outcome["tx_hash"], outcome["last_ledger_sequence"],
+                                                    account, outcome["sequence"])
+            batch.append(outcome)
+        responses = request_many([SubmitOnly(tx_blob=outcome["tx_blob"]) for outcome in batch])
+        for outcome, response in zip(batch, responses):
+            if isinstance(response, Exception):
+                # The node may or may not have applied it; let confirmation decide.
+                outcome["engine_result"] = f"submit error: {response}"
+                outcome["status"] = 'SUBMITTED'
+                continue
+            outcome["engine_result"] = response.result.get('engine_result', response.result.get('error', ''))
+            if not response.is_successful() or outcome["engine_result"].startswith(REJECTED_PREFIXES):
+                confirmations.cancel(outcome.pop("waiter"))
+                outcome["status"] = 'FAILED'
+                broken.add(outcome["account"])
+            else:
+                outcome["status"] = 'SUBMITTED'
+
+
+def confirm_payments(confirmations, outcomes, timeout=None):
+    """Wait for the confirmation service to resolve every submitted payment"""
+    deadline = time.time() + timeout if timeout else None
+    for outcome in outcomes:
+        waiter = outcome.pop("waiter", None)
+        if waiter is None:
+            continue
+        resolved = waiter.wait(max(deadline - time.time(), 0) if deadline else None)
+        if resolved["status"] == 'TIMEOUT':
+            confirmations.cancel(waiter)
+        outcome["status"] = resolved["status"]
+        if resolved["result"] is not None:
+            outcome["result"] = resolved["result"]
+            outcome["ledger_index"] = resolved["ledger_index"]
+
+
+def settle_signed(client, confirmations, account, outcomes, timeout=None):
+    """Find out what happened to payments signed by an earlier, interrupted run.
+
+    Each outcome carries the tx_blob, tx_hash, sequence and
+    last_ledger_sequence that were journaled before it was submitted. The
+    confirmation service rescans the ledgers the earlier run could have
+    reached, which costs one request per ledger rather than one per payment.
+    Payments not found there are rebroadcast (a duplicate submit is harmless)
+    and waited on until they validate or can no longer apply. Only outcomes
+    left FAILED, EXPIRED or DROPPED are safe to pay again.
+    """
+    validated = get_latest_validated_ledger_sequence(client)
+    first_ledger = min(o["last_ledger_sequence"] for o in outcomes) - LEDGER_OFFSET + 1
+    for outcome in outcomes:
+        outcome["waiter"] = confirmations.watch(outcome["tx_hash"], outcome["last_ledger_sequence"],
+                                                account, outcome["sequence"], since=first_ledger)
+    confirmations.wait_scanned(validated, timeout)
+
+    pending = [o for o in outcomes if not o["waiter"].done()]
+    print(f"{len(outcomes) - len(pending)} of {len(outcomes)} signed payments settled by rescan, "
+          f"rebroadcasting {len(pending)}")
+    for outcome in sorted(pending, key=lambda o: o["sequence"]):
+        try:
+            outcome["engine_result"] = submit_blob(client, outcome["tx_blob"])
+        except Exception as e:
+            outcome["engine_result"] = f"submit error: {e}"
+        if outcome["engine_result"].startswith('tem'):
+            # Malformed: it can never be applied.
+            confirmations.cancel(outcome.pop("waiter"))
+            outcome["status"] = 'FAILED'
+    confirm_payments(confirmations, outcomes, timeout)
+
+
+def pay_out(client, confirmations, wallet, allocations, timeout=None, on_signed=None, signer=sign_payment,
+            sequences=None):
+    """Pay many holders from one wallet and report per-holder outcomes.
+
+    `allocations` is a list of (holder_address, drops) pairs; each outcome
+    keeps its position in the list as "index". The wallet's sequence, the fee
+    and the validated ledger index are each fetched once for the whole batch,
+    and `confirmations` (a ConfirmationService) settles all of the payments
+    together. See submit_payments() for `on_signed`.
+
+    `signer(wallet, destination, amount, sequence, fee, last_ledger_sequence)`
+    signs one payment; the default pays `amount` in XRP drops, and
+    tokens.sign_token_payment pays it in the wallet's project tokens. The
+    amount is kept in each outcome's "drops" either way.
+
+    `sequences`, a LocalSigner, shares its cache with the batch: the batch's
+    sequences are reserved from it, so transactions it signs for the same
+    wallet meanwhile take others, and its fee and validated ledger are used.
+    Without it they are read from the ledger.
+    """
+    start = time.time()
+    outcomes = [
+        {"index": i, "holder_address": address, "drops": int(drops), "status": 'PENDING'}
+        for i, (address, drops) in enumerate(allocations)
+    ]
+    if not outcomes:
+        return {"outcomes": outcomes, "confirmed": 0, "failed": 0, "submit_seconds": 0.0,
+                "elapsed_seconds": 0.0, "payments_per_second": 0.0}
+
+    if sequences is None:
+        sequence = get_account_sequence(client, wallet.classic_address)
+        fee = get_fee(client)
+        last_ledger_sequence = get_latest_validated_ledger_sequence(client) + LEDGER_OFFSET
+    else:
+        fee, validated = sequences.network_state()
+        last_ledger_sequence = validated + LEDGER_OFFSET
+        sequence = sequences.reserve_batch(wallet.classic_address, len(outcomes), last_ledger_sequence)
+
+    submit_payments(client, confirmations, wallet, outcomes, sequence, fee, last_ledger_sequence, on_signed, signer,
+                    sequences)
+    submitted_at = time.time()
+    confirm_payments(confirmations, outcomes, timeout)
+
+    elapsed = time.time() - start
+    confirmed = sum(1 for o in outcomes if o["status"] == 'CONFIRMED')
+    print(f"Paid {confirmed}/{len(outcomes)} holders in {elapsed:.2f}s "
+          f"({confirmed / elapsed if elapsed else 0:.1f} payments/s)")
+    return {
+        "outcomes": outcomes,
+        "confirmed": confirmed,
+        "failed": len(outcomes) - confirmed,
+        "submit_seconds": submitted_at - start,
+        "elapsed_seconds": elapsed,
+        "payments_per_second": confirmed / elapsed if elapsed else 0.0
+    }
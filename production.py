@@ -0,0 +1,49 @@
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+# Energy production readings as sent by the plants' meters. Energy is kept in
+# integer watt-hours, like money in drops, so revenue sums are exact.
+
+
+def kwh_to_wh(kwh):
+    """Convert a kWh amount (number or string) to integer Wh, to the nearest Wh"""
+    try:
+        wh = (Decimal(str(kwh)) * 1000).to_integral_value(ROUND_HALF_EVEN)
+    except InvalidOperation:
+        raise ValueError(f"Invalid kWh amount: {kwh!r}")
+    if not wh.is_finite() or wh < 0:
+        raise ValueError(f"kWh amount must be a non-negative number: {kwh!r}")
+    return int(wh)
+
+
+def parse_timestamp(value):
+    """Accept unix seconds or an ISO 8601 string and return unix seconds"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+
+def parse_readings(readings):
+    """Turn reading dicts ('name', 'read_at', 'kwh') into (name, read_at, wh) rows.
+    Raises ValueError naming the first bad reading."""
+    rows = []
+    for i, reading in enumerate(readings):
+        try:
+            rows.append((str(reading['name']), parse_timestamp(reading['read_at']), kwh_to_wh(reading['kwh'])))
+        except KeyError as e:
+            raise ValueError(f"Reading {i}: missing {e.args[0]}")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Reading {i}: {e}")
+    return rows
+
+
+def parse_csv(text):
+    """Parse CSV with a header row naming the columns name, read_at and kwh"""
+    return parse_readings(csv.DictReader(io.StringIO(text)))
@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Run in this process only: no background job workers, wallet pool refills,
+# dividend scheduling, ledger indexing or signer refreshes.
+os.environ['JOB_WORKERS'] = '0'
+os.environ['WALLET_POOL_SIZE'] = '0'
+os.environ['DIVIDEND_SCHEDULER_INTERVAL'] = '0'
+os.environ['LEDGER_INDEXER_INTERVAL'] = '0'
+os.environ['SIGNER_REFRESH_INTERVAL'] = '0'
+
+import db
+from solar_crowdfunding import run_resume_dividend
+
+def resume_dividends(dividend_ids=None, force=False):
+    """Resume the given dividends, or every dividend left PROCESSING or PARTIAL.
+    force=True takes over runs whose process died while holding the lease."""
+    if not dividend_ids:
+        dividend_ids = [dividend[0] for dividend in db.list_unfinished_dividends()]
+    for dividend_id in dividend_ids:
+        body, status = run_resume_dividend({"dividend_id": dividend_id, "force": force})
+        if status != 200:
+            print(f"Dividend {dividend_id}: {body.get('error')}")
+            continue
+        print(f"Dividend {dividend_id}: {body['status']}, settled {body['settled_from_earlier_run']} "
+              f"and paid {body['paid_this_run']} payouts, {body['confirmed']} confirmed in total")
+    db.close_connection()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    force = '--force' in args
+    resume_dividends([arg for arg in args if arg != '--force'], force)
@@ -0,0 +1,309 @@
+import threading
+import time
+
+from xrpl.core.binarycodec import encode
+from xrpl.models.requests import AccountInfo, Fee, Ledger, SubmitOnly
+from xrpl.models.transactions import AccountSet
+from xrpl.models.transactions.transaction import Transaction
+from xrpl.transaction import sign
+
+# Ledgers a single transaction stays valid for, as xrpl-py's autofill gives
+# it. Batches use payouts.LEDGER_OFFSET instead.
+AUTOFILL_LEDGER_OFFSET = 20
+
+# Preliminary results that mean the transaction was rejected outright and did
+# not consume its sequence number.
+REJECTED_PREFIXES = ('tem', 'tef', 'tel')
+
+
+class TransactionRejected(Exception):
+    """The ledger rejected a transaction outright (tem, tef or tel), so it was not applied"""
+
+
+class SigningAccount:
+    """What the signer knows of one wallet's sequence numbers"""
+
+    def __init__(self, next_sequence):
+        self.next_sequence = next_sequence
+        self.pending = {}  # sequence handed out -> last ledger its transaction can apply in
+        self.held = None  # (sequence, last ledger) of a transaction the ledger answered terPRE_SEQ
+        self.wallet = None  # kept while a transaction is held, to fill the gap behind it
+        self.used = time.monotonic()
+
+
+class LocalSigner:
+    """Autofills and signs transactions from memory, without ledger round trips per transaction.
+
+    xrpl-py's autofill_and_sign asks the ledger for the account's sequence,
+    the fee and the validated ledger for every transaction. This keeps each
+    wallet's next sequence, and the open-ledger fee and validated ledger
+    index for all of them, refreshing the latter every `refresh_interval`
+    seconds (and whenever observe_ledger() hears of a newer ledger). A
+    wallet's sequence is read once, then handed out locally.
+
+    submit() recovers when the cache is wrong. tefPAST_SEQ means the wallet
+    was used elsewhere: its sequence is read again and the transaction
+    re-signed once. terPRE_SEQ means an earlier sequence handed out here
+    never reached the ledger: the transaction stays held, and every missing
+    sequence that no live transaction of ours can still take is filled with
+    a no-op AccountSet, so it applies as signed and is never paid twice.
+    Gaps still covered by a live transaction are filled once it expires.
+    `request` sends one xrpl request (e.g. the ledger gateway's).
+
+    Batches signed elsewhere (payouts.pay_out, /buy_shares_batch) take their
+    sequences with reserve_batch() and give back what they did not use with
+    release_batch(), so they and single transactions never share a sequence.
+    """
+
+    def __init__(self, request, confirmations, refresh_interval=5.0, max_age=10.0, ledger_offset=AUTOFILL_LEDGER_OFFSET,
+                 max_fee_drops=2000000, account_ttl=300.0):
+        self.request = request
+        self.confirmations = confirmations
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.ledger_offset = ledger_offset
+        self.max_fee_drops = max_fee_drops
+        self.account_ttl = account_ttl
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.fee = None
+        self.validated_ledger = None
+        self.refreshed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.signed = 0
+        self.sequence_reads = 0
+        self.refreshes = 0
+        self.resyncs = 0
+        self.gaps_filled = 0
+
+    def refresh(self):
+        """Read the open-ledger fee and the validated ledger index"""
+        fee = self.request(Fee())
+        ledger = self.request(Ledger(ledger_index="validated"))
+        if not fee.is_successful() or not ledger.is_successful():
+            raise Exception(f"Could not read fee and ledger: {fee.result} {ledger.result}")
+        with self.lock:
+            self.fee = str(min(int(fee.result['drops']['open_ledger_fee']), self.max_fee_drops))
+            self.validated_ledger = max(self.validated_ledger or 0, int(ledger.result['ledger_index']))
+            self.refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+    def observe_ledger(self, ledger_index):
+        """Note a newly validated ledger, e.g. from the confirmation service"""
+        with self.lock:
+            if self.validated_ledger is not None and ledger_index > self.validated_ledger:
+                self.validated_ledger = ledger_index
+
+    def network_state(self):
+        """(fee in drops, validated ledger index), read again if older than max_age seconds"""
+        with self.lock:
+            fresh = self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.max_age
+        if not fresh:
+            self.refresh()
+        with self.lock:
+            return self.fee, self.validated_ledger
+
+    def _ledger_sequence(self, address):
+        response = self.request(AccountInfo(account=address, ledger_index="current"))
+        if not response.is_successful():
+            raise Exception(f"Could not read account sequence: {response.result}")
+        with self.lock:
+            self.sequence_reads += 1
+        return response.result['account_data']['Sequence']
+
+    def _reserve(self, address, last_ledger_sequence, count=1, sequence=None):
+        """The first of `count` consecutive sequences for an account, read from the ledger the first time.
+        `sequence` is the account's sequence if the caller has just read it."""
+        with self.lock:
+            account = self.accounts.get(address)
+        if account is None:
+            if sequence is None:
+                sequence = self._ledger_sequence(address)
+            with self.lock:
+                # Another thread may have read it meanwhile; the first one wins.
+                account = self.accounts.setdefault(address, SigningAccount(sequence))
+        with self.lock:
+            first = max(account.next_sequence, sequence or 0)
+            account.next_sequence = first + count
+            for s in range(first, first + count):
+                account.pending[s] = last_ledger_sequence
+            account.used = time.monotonic()
+            return first
+
+    def reserve_batch(self, address, count, last_ledger_sequence, sequence=None):
+        """Hand out `count` consecutive sequences for transactions signed outside the signer; returns the first.
+
+        `sequence` is the account's sequence if the caller has just read it
+        (the later of it and the cached one is used); otherwise the cached one
+        is, and the ledger is asked only for an account seen for the first time.
+        """
+        return self._reserve(address, last_ledger_sequence, count, sequence)
+
+    def release_batch(self, address, sequences):
+        """Give back reserved sequences whose transactions were rejected, or never sent"""
+        for sequence in sorted(sequences, reverse=True):
+            self._release(address, sequence)
+        with self.lock:
+            held = address in self.accounts and self.accounts[address].held
+        if held:
+            self.fill_gap(address)
+
+    def resync(self, address):
+        """Read an account's sequence again and continue after it and after anything still in flight"""
+        sequence = self._ledger_sequence(address)
+        with self.lock:
+            account = self.accounts.setdefault(address, SigningAccount(sequence))
+            account.pending = {s: last for s, last in account.pending.items() if s >= sequence}
+            live = [s for s, last in account.pending.items() if last > self.validated_ledger]
+            account.next_sequence = max([sequence] + [s + 1 for s in live])
+            self.resyncs += 1
+            return sequence
+
+    def _release(self, address, sequence):
+        """Give back a sequence whose transaction was rejected and so did not consume it"""
+        with self.lock:
+            account = self.accounts.get(address)
+            if account is None:
+                return
+            account.pending.pop(sequence, None)
+            if account.next_sequence == sequence + 1:
+                account.next_sequence = sequence
+
+    def autofill(self, transaction):
+        """The transaction with any missing sequence, fee and last_ledger_sequence filled from memory"""
+        fee, validated = self.network_state()
+        tx_json = transaction.to_dict()
+        tx_json.setdefault("fee", fee)
+        tx_json.setdefault("last_ledger_sequence", validated + self.ledger_offset)
+        if "sequence" not in tx_json:
+            tx_json["sequence"] = self._reserve(transaction.account, tx_json["last_ledger_sequence"])
+        return Transaction.from_dict(tx_json)
+
+    def sign(self, transaction, wallet):
+        """Autofill from memory and sign locally"""
+        signed = sign(self.autofill(transaction), wallet)
+        with self.lock:
+            self.signed += 1
+        return signed
+
+    def submit(self, transaction, wallet):
+        """Sign and submit one transaction without waiting for it; returns (signed, confirmation waiter).
+
+        Raises if the ledger rejects it outright. It is re-signed once if the
+        rejection came from a stale cache: tefPAST_SEQ for a sequence it
+        chose, tefMAX_LEDGER or telINSUF_FEE_P for a ledger index or fee.
+        """
+        address = wallet.classic_address
+        for attempt in range(2):
+            signed = self.sign(transaction, wallet)
+            waiter = self.confirmations.watch(signed.get_hash(), signed.last_ledger_sequence, address,
+                                              signed.sequence)
+            response = self.request(SubmitOnly(tx_blob=encode(signed.to_xrpl())))
+            engine_result = response.result.get('engine_result', '')
+            if engine_result == 'terPRE_SEQ' and transaction.sequence is None:
+                with self.lock:
+                    account = self.accounts[address]
+                    account.held = max(account.held or (0, 0), (signed.sequence, signed.last_ledger_sequence))
+                    account.wallet = wallet
+                self.fill_gap(address)
+            if response.is_successful() and not engine_result.startswith(REJECTED_PREFIXES) or \
+                    engine_result == 'tefALREADY':  # this very transaction is in already
+                return signed, waiter
+            self.confirmations.cancel(waiter)
+            if engine_result == 'tefPAST_SEQ':
+                self.resync(address)
+                stale = transaction.sequence is None
+            else:
+                self._release(address, signed.sequence)
+                stale = engine_result == 'tefMAX_LEDGER' and transaction.last_ledger_sequence is None or \
+                    engine_result == 'telINSUF_FEE_P' and transaction.fee is None
+                if stale:
+                    self.refresh()
+                with self.lock:
+                    held = address in self.accounts and self.accounts[address].held
+                if held:
+                    self.fill_gap(address)  # the sequence it gave back may be all a held one waits for
+            if attempt == 0 and stale:
+                continue
+            raise TransactionRejected(f"Transaction failed: {response.result}")
+
+    def fill_gap(self, address):
+        """Fill the sequences missing before an account's held transaction with no-op AccountSets"""
+        self.refresh()  # whether a missing sequence is free depends on the validated ledger
+        sequence = self.resync(address)
+        with self.lock:
+            account = self.accounts[address]
+            if account.held is None:
+                return 0
+            held, held_until = account.held
+            if sequence > held or held_until <= self.validated_ledger:
+                account.held, account.wallet = None, None  # applied, or can no longer apply
+                return 0
+            wallet = account.wallet
+            free = [s for s in range(sequence, held) if account.pending.get(s, 0) <= self.validated_ledger]
+            for s in free:
+                account.pending[s] = held_until  # so a concurrent call does not fill it too
+            self.gaps_filled += len(free)
+            fee = self.fee
+        for s in free:
+            filler = sign(AccountSet(account=address, sequence=s, fee=fee,
+                                                 last_ledger_sequence=held_until), wallet)
+            response = self.request(SubmitOnly(tx_blob=encode(filler.to_xrpl())))
+            if response.result.get('engine_result', '').startswith(REJECTED_PREFIXES):
+                with self.lock:
+                    account.pending.pop(s, None)
+        if free:
+            print(f"Filled {len(free)} missing sequence(s) of {address} before {held}")
+        return len(free)
+
+    def _housekeep(self):
+        """Fill gaps that have become free and forget accounts idle for account_ttl seconds"""
+        now = time.monotonic()
+        with self.lock:
+            held = [address for address, account in self.accounts.items() if account.held]
+            for address, account in list(self.accounts.items()):
+                live = any(last > self.validated_ledger for last in account.pending.values())
+                if not account.held and not live and now - account.used > self.account_ttl:
+                    del self.accounts[address]
+        for address in held:
+            try:
+                self.fill_gap(address)
+            except Exception as e:
+                print(f"Could not fill sequence gap of {address}: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+                self._housekeep()
+            except Exception as e:
+                print(f"Signer refresh failed: {e}")
+
+    def start(self):
+        """Start the background refresh; refresh_interval <= 0 disables it, leaving reads to max_age"""
+        if self.refresh_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="signer-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "accounts": len(self.accounts),
+                "held_accounts": sum(1 for account in self.accounts.values() if account.held),
+                "fee_drops": self.fee,
+                "validated_ledger": self.validated_ledger,
+                "signed": self.signed,
+                "sequence_reads": self.sequence_reads,
+                "refreshes": self.refreshes,
+                "resyncs": self.resyncs,
+                "gaps_filled": self.gaps_filled
+            }
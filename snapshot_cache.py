@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class SnapshotCache:
+    """LRU cache of serialized responses, each valid for one version of its key.
+
+    `build(key)` returns the response body as bytes, or None if the key does
+    not exist; `version(key)` returns the key's current version, which every
+    write to the underlying data bumps in the same transaction. An entry is
+    served while its version is still current and it is younger than `ttl`
+    (for parts of the body that change outside our writes, like a ledger
+    balance). Because the version lives in the database, a write made by any
+    process invalidates the snapshots cached by all of them.
+
+    `store`, if given, is a shared second level (e.g. a SQLite table) with
+    load(key) -> (version, etag, body, built_at) or None and
+    save(key, version, etag, body, built_at), so a rebuilt snapshot is reused
+    by other processes and survives restarts.
+    """
+
+    def __init__(self, build, version, max_entries=1000, ttl=10.0, store=None):
+        self.build = build
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (version, etag, body, built_at)
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def _fresh(self, entry, version):
+        return entry is not None and entry[0] == version and entry[3] + self.ttl > time.time()
+
+    def get(self, key):
+        """Return (body, etag) for a key, or None if it does not exist"""
+        version = self.version(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if self._fresh(entry, version):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], entry[1]
+            if entry is not None:
+                self.stale += 1
+
+        entry = self.store.load(key) if self.store is not None else None
+        if self._fresh(entry, version):
+            with self.lock:
+                self.store_hits += 1
+        else:
+            body = self.build(key)
+            if body is None:
+                with self.lock:
+                    self.misses += 1
+                    self.entries.pop(key, None)
+                return None
+            # The ETag is a hash of the body, so a rebuilt snapshot with the
+            # same content (or one from another process) keeps its ETag.
+            entry = (version, hashlib.sha1(body).hexdigest(), body, time.time())
+            if self.store is not None:
+                self.store.save(key, *entry)
+            with self.lock:
+                self.misses += 1
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry[2], entry[1]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+                "ttl_seconds": self.ttl
+            }
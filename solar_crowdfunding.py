@@ -1,88 +1,166 @@
-from flask import Flask, request, jsonify
-from xrpl.clients import JsonRpcClient
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from xrpl.wallet import Wallet
 from xrpl.models.transactions import Payment
 from xrpl.models.requests import AccountInfo
-from xrpl.transaction import autofill_and_sign, submit_and_wait
+from xrpl.ledger import get_latest_validated_ledger_sequence
 from xrpl.core.keypairs import generate_seed
+from payouts import (LEDGER_OFFSET, confirm_payments, pay_out, record_signed, settle_signed,
+                     sign_payment, submit_concurrently)
+from config import Config
+from balance_cache import BalanceCache
+from snapshot_cache import SnapshotCache
+from wallet_pool import WalletPool
+from ledger_gateway import LedgerGateway, PooledJsonRpcClient
+from ledger_pool import EndpointPool
+from metrics import FAUCET_REQUESTS, HTTP_REQUESTS, LEDGER_OPERATIONS
+from confirmations import ConfirmationService
+from dividend_scheduler import DividendScheduler
+from ledger_indexer import LedgerIndexer
+from signer import LocalSigner, TransactionRejected
+import jobs
+import tokens
+import db
+import metrics
+import money
+import production
 import uuid
 import json
 from datetime import datetime
-import sqlite3
 import os
 import requests
+import threading
 import time
 
 app = Flask(__name__)
 
 # Global client variable; will be initialized from config
 client = None
+# Async gateway for read-heavy ledger calls; created on first use
+ledger_gateway = None
+# Every ledger call is routed over Config.XRPL_ENDPOINTS; created on first use
+ledger_pool = None
+ledger_pool_lock = threading.Lock()
+
+def ensure_pool():
+    """Ensure the ledger endpoint pool is running"""
+    global ledger_pool
+    with ledger_pool_lock:
+        if ledger_pool is None:
+            ledger_pool = EndpointPool(Config.XRPL_ENDPOINTS, max_connections=Config.LEDGER_MAX_CONCURRENCY,
+                                       max_attempts=Config.LEDGER_MAX_ATTEMPTS, cooldown=Config.LEDGER_FAILOVER_COOLDOWN,
+                                       health_interval=Config.LEDGER_HEALTH_INTERVAL)
+            ledger_pool.start()
+    return ledger_pool
 
 def ensure_client():
     """Ensure XRPL client is initialized"""
     global client
     if client is None:
-        client = JsonRpcClient("https://s.altnet.rippletest.net:51234")
+        client = PooledJsonRpcClient(ensure_pool())
     return client
 
-def wait_for_wallet_funding(client, wallet_address, max_attempts=10):
-    """Wait for a wallet to be funded and return True if active"""
-    for attempt in range(max_attempts):
-        try:
-            acct_info = AccountInfo(
-                account=wallet_address,
-                ledger_index="validated"
-            )
-            response = client.request(acct_info)
-            balance = int(response.result['account_data']['Balance']) / 1000000
-            print(f"Wallet {wallet_address} active with {balance} XRP")
-            return True
-        except Exception as e:
-            print(f"Waiting for wallet funding (attempt {attempt+1}/{max_attempts})...")
-            time.sleep(2)
-    print("Wallet funding confirmation timeout.")
-    return False
+def ensure_gateway():
+    """Ensure the async ledger gateway is running"""
+    global ledger_gateway
+    if ledger_gateway is None:
+        if Config.XRPL_GATEWAY_URL.startswith(('ws://', 'wss://')):
+            ledger_gateway = LedgerGateway(Config.XRPL_GATEWAY_URL, max_concurrency=Config.LEDGER_MAX_CONCURRENCY)
+        else:
+            ledger_gateway = LedgerGateway(pool=ensure_pool(), max_concurrency=Config.LEDGER_MAX_CONCURRENCY)
+    return ledger_gateway
+
+def wait_for_wallet_funding(client, wallet_address, waiter, timeout=30):
+    """Wait for a wallet to be funded and return True if active.
+    `waiter` comes from confirmations.watch_account(), registered before funding."""
+    if waiter.wait(timeout)["status"] == 'TIMEOUT':
+        confirmations.cancel(waiter)
+    try:
+        acct_info = AccountInfo(
+            account=wallet_address,
+            ledger_index="validated"
+        )
+        response = client.request(acct_info)
+        balance = int(response.result['account_data']['Balance']) / 1000000
+        print(f"Wallet {wallet_address} active with {balance} XRP")
+        balance_cache.put(wallet_address, balance)
+        return True
+    except Exception as e:
+        print("Wallet funding confirmation timeout.")
+        return False
 
 def create_funded_wallet(max_retries=3):
     """Create and fund a new wallet using the testnet faucet with retries"""
     ensure_client()
     wallet = Wallet.create()
     print(f"Created new wallet: {wallet.classic_address}")
-    faucet_url = "https://faucet.altnet.rippletest.net/accounts"
+    faucet_url = Config.FAUCET_URL
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(faucet_url, json={"destination": wallet.classic_address}, timeout=10)
+            # Watch for the funding payment before asking for it, so it cannot be missed.
+            waiter = confirmations.watch_account(wallet.classic_address)
+            faucet_start = time.perf_counter()
+            try:
+                response = requests.post(faucet_url, json={"destination": wallet.classic_address}, timeout=10)
+            except Exception:
+                FAUCET_REQUESTS.observe(time.perf_counter() - faucet_start, 'error')
+                confirmations.cancel(waiter)
+                raise
+            FAUCET_REQUESTS.observe(time.perf_counter() - faucet_start, str(response.status_code))
             if response.status_code == 200:
-                if wait_for_wallet_funding(client, wallet.classic_address):
+                with LEDGER_OPERATIONS.time('wait_funded'):
+                    funded = wait_for_wallet_funding(client, wallet.classic_address, waiter)
+                if funded:
                     return wallet
                 else:
                     raise Exception("Wallet funding confirmation timeout")
             else:
+                confirmations.cancel(waiter)
                 print(f"Faucet call failed with status {response.status_code} on attempt {attempt+1}/{max_retries}")
         except Exception as e:
             print(f"Faucet attempt {attempt+1} failed: {e}")
         time.sleep(5)
     raise Exception("Failed to fund wallet after multiple attempts")
 
-def check_wallet_balance(wallet_address):
-    """Return the XRP balance of a wallet (in XRP)"""
+def fetch_wallet_balance(wallet_address):
+    """Read the XRP balance of a wallet (in XRP) from the validated ledger"""
+    acct_info = AccountInfo(
+        account=wallet_address,
+        ledger_index="validated"
+    )
+    response = ensure_gateway().request(acct_info)
+    return int(response.result['account_data']['Balance']) / 1000000
+
+# One background follower of the validated ledger confirms every pending
+# transaction and funding payment, instead of polling each one.
+confirmations = ConfirmationService(lambda req: ensure_gateway().request(req),
+                                    poll_interval=Config.LEDGER_POLL_INTERVAL,
+                                    on_validated=lambda index: signer.observe_ledger(index))
+
+# Transactions are autofilled from each wallet's cached sequence and the
+# cached fee and ledger index, then signed locally, rather than after three
+# ledger reads each.
+signer = LocalSigner(lambda req: ensure_gateway().request(req), confirmations,
+                     refresh_interval=Config.SIGNER_REFRESH_INTERVAL)
+
+# Balances are served from memory for BALANCE_CACHE_TTL seconds; our own
+# payments invalidate the addresses they touch.
+balance_cache = BalanceCache(fetch_wallet_balance, ttl=Config.BALANCE_CACHE_TTL)
+
+def check_wallet_balance(wallet_address, fresh=False):
+    """Return the XRP balance of a wallet (in XRP), from the cache unless fresh=True"""
     try:
-        ensure_client()
-        acct_info = AccountInfo(
-            account=wallet_address,
-            ledger_index="validated"
-        )
-        response = client.request(acct_info)
-        balance_xrp = int(response.result['account_data']['Balance']) / 1000000
-        return balance_xrp
+        return balance_cache.get(wallet_address, fresh=fresh)
     except Exception as e:
         print(f"Error checking wallet balance: {e}")
         return 0
 
+# Funded wallets are prepared in the background so requests skip the faucet.
+wallet_pool = WalletPool(create_funded_wallet, target_size=Config.WALLET_POOL_SIZE)
+
 def init_db():
     """Initialize SQLite database with required tables"""
-    conn = sqlite3.connect('solar_crowdfunding.db')
+    conn = db.get_connection()
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS projects (
@@ -91,11 +169,13 @@ def init_db():
             location TEXT,
             total_power_kw REAL,
             total_shares INTEGER,
-            share_price_xrp REAL,
+            share_price_drops INTEGER,
             wallet_address TEXT,
             wallet_seed TEXT,
             status TEXT,
-            created_at TIMESTAMP
+            created_at TIMESTAMP,
+            shares_sold INTEGER NOT NULL DEFAULT 0,
+            shares_reserved INTEGER NOT NULL DEFAULT 0
         )
     ''')
     c.execute('''
@@ -112,325 +192,1759 @@ def init_db():
         CREATE TABLE IF NOT EXISTS dividends (
             id TEXT PRIMARY KEY,
             project_name TEXT,
-            amount_xrp REAL,
+            amount_drops INTEGER,
             distribution_date TIMESTAMP,
             status TEXT,
+            lease_expires REAL,
             FOREIGN KEY (project_name) REFERENCES projects (name)
         )
     ''')
-    conn.commit()
-    conn.close()
+    # One row per (project, holder) with the holder's total shares, kept in
+    # step with shareholders by every purchase.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS positions (
+            project_name TEXT,
+            holder_wallet_address TEXT,
+            shares INTEGER NOT NULL,
+            PRIMARY KEY (project_name, holder_wallet_address),
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS dividend_payouts (
+            id INTEGER PRIMARY KEY,
+            dividend_id TEXT,
+            holder_wallet_address TEXT,
+            drops INTEGER,
+            status TEXT,
+            sequence INTEGER,
+            last_ledger_sequence INTEGER,
+            tx_blob TEXT,
+            tx_hash TEXT,
+            result TEXT,
+            ledger_index INTEGER,
+            FOREIGN KEY (dividend_id) REFERENCES dividends (id)
+        )
+    ''')
+    # Shares held for purchases whose payment has not settled yet; see the
+    # reservation functions in db.py.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id TEXT PRIMARY KEY,
+            project_name TEXT,
+            holder_wallet_address TEXT,
+            shares INTEGER NOT NULL,
+            status TEXT,
+            created_at REAL,
+            expires_at REAL,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    # One pay-out run per wallet at a time; see hold_wallet().
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS wallet_leases (
+            address TEXT PRIMARY KEY,
+            owner TEXT,
+            lease_expires REAL
+        )
+    ''')
+    migrate_to_drops(conn)
+    migrate_to_positions(conn)
+    if 'lease_expires' not in [column[1] for column in c.execute('PRAGMA table_info(dividends)')]:
+        c.execute('ALTER TABLE dividends ADD COLUMN lease_expires REAL')
+    if 'shares_reserved' not in [column[1] for column in c.execute('PRAGMA table_info(projects)')]:
+        c.execute('ALTER TABLE projects ADD COLUMN shares_reserved INTEGER NOT NULL DEFAULT 0')
+    # Indexes for per-project and per-holder lookups (added after the tables shipped)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shareholders_project ON shareholders (project_name)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shareholders_holder ON shareholders (holder_wallet_address)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_dividends_project ON dividends (project_name)')
+    # drops makes the per-dividend sums index-only; replaces (dividend_id, status).
+    c.execute('DROP INDEX IF EXISTS idx_dividend_payouts_dividend')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_dividend_payouts_status ON dividend_payouts (dividend_id, status, drops)')
+    # Per-holder analytics (/portfolio); the payouts index covers the query.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_positions_holder ON positions (holder_wallet_address)')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dividend_payouts_holder
+        ON dividend_payouts (holder_wallet_address, status, dividend_id, drops)
+    ''')
+    # Bumped by every write that changes a project's page; see db.bump_project_version.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS project_versions (
+            project_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    # Shared copies of serialized project pages (SNAPSHOT_CACHE_DISK)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS project_snapshots (
+            project_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            etag TEXT,
+            body BLOB,
+            built_at REAL
+        )
+    ''')
+    # Energy produced per project; append-only, consumed by dividend schedules
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS production_readings (
+            id INTEGER PRIMARY KEY,
+            project_name TEXT,
+            read_at REAL,
+            wh INTEGER,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS dividend_schedules (
+            project_name TEXT PRIMARY KEY,
+            tariff_drops_per_kwh INTEGER,
+            interval_seconds REAL,
+            next_run_at REAL,
+            last_reading_id INTEGER NOT NULL DEFAULT 0,
+            previous_reading_id INTEGER,
+            last_job_id TEXT,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    if 'previous_reading_id' not in [column[1] for column in c.execute('PRAGMA table_info(dividend_schedules)')]:
+        c.execute('ALTER TABLE dividend_schedules ADD COLUMN previous_reading_id INTEGER')
+    # Energy per project and hour/day/month, kept up to date by every ingest
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS production_rollups (
+            project_name TEXT,
+            resolution TEXT,
+            bucket_start INTEGER,
+            wh INTEGER NOT NULL,
+            readings INTEGER NOT NULL,
+            PRIMARY KEY (project_name, resolution, bucket_start)
+        ) WITHOUT ROWID
+    ''')
+    migrate_production_rollups(conn)
+    # Projects whose shares are issued as tokens, and the tokens owed to holders
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS project_tokens (
+            project_name TEXT PRIMARY KEY,
+            currency TEXT,
+            issuer TEXT,
+            created_at TIMESTAMP,
+            lease_expires REAL,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS token_deliveries (
+            id INTEGER PRIMARY KEY,
+            project_name TEXT,
+            holder_wallet_address TEXT,
+            shares INTEGER NOT NULL,
+            status TEXT,
+            sequence INTEGER,
+            last_ledger_sequence INTEGER,
+            tx_blob TEXT,
+            tx_hash TEXT,
+            result TEXT,
+            ledger_index INTEGER,
+            created_at TIMESTAMP,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    # Token holders read from the ledger for a dividend. Lines are written a
+    # page at a time with the marker of the next page, and dropped once the
+    # dividend's payouts are journaled.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS holder_snapshots (
+            id TEXT PRIMARY KEY,
+            project_name TEXT,
+            issuer TEXT,
+            currency TEXT,
+            ledger_index INTEGER,
+            marker TEXT,
+            status TEXT,
+            pages INTEGER NOT NULL DEFAULT 0,
+            holders INTEGER,
+            tokens INTEGER,
+            dividend_id TEXT,
+            created_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (project_name) REFERENCES projects (name)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS holder_snapshot_lines (
+            snapshot_id TEXT,
+            holder_wallet_address TEXT,
+            tokens INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, holder_wallet_address)
+        ) WITHOUT ROWID
+    ''')
+    # Project wallet history copied from the ledger by the indexer. A pass
+    # indexes next_ledger..pass_max_ledger, resuming at marker; the balance
+    # read at pass_max_ledger is served once the pass is done.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS wallet_index_cursors (
+            address TEXT PRIMARY KEY,
+            project_name TEXT,
+            next_ledger INTEGER NOT NULL DEFAULT -1,
+            pass_max_ledger INTEGER,
+            pass_balance_drops INTEGER,
+            marker TEXT,
+            balance_drops INTEGER,
+            balance_ledger INTEGER,
+            transactions INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS wallet_transactions (
+            address TEXT,
+            ledger_index INTEGER,
+            transaction_index INTEGER,
+            tx_hash TEXT,
+            transaction_type TEXT,
+            counterparty TEXT,
+            delta_drops INTEGER NOT NULL,
+            fee_drops INTEGER NOT NULL,
+            currency TEXT,
+            issuer TEXT,
+            value TEXT,
+            result TEXT,
+            close_time INTEGER,
+            PRIMARY KEY (address, ledger_index, transaction_index)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_token_deliveries_project ON token_deliveries (project_name, status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_holder_snapshots_project ON holder_snapshots (project_name, status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_production_readings_project ON production_readings (project_name, id)')
+    # A meter resending a batch must not count the same reading twice.
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_production_readings_time ON production_readings (project_name, read_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_dividend_schedules_due ON dividend_schedules (next_run_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reservations_project ON reservations (project_name, status, expires_at)')
+
+def migrate_to_drops(conn):
+    """Convert databases created with REAL XRP columns to integer drops.
+
+    SQLite cannot change a column's type in place, so each table is rebuilt
+    with the same column order (rows are read by position) and its amounts
+    rounded to the nearest drop.
+    """
+    rebuilds = (
+        ('projects', 'share_price_xrp', 'share_price_drops'),
+        ('dividends', 'amount_xrp', 'amount_drops'),
+    )
+    for table, old_column, new_column in rebuilds:
+        columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+        if old_column not in [column[1] for column in columns]:
+            continue
+        print(f"Migrating {table}.{old_column} to integer {new_column}")
+        definitions = ', '.join(
+            f"{new_column} INTEGER" if column[1] == old_column else f"{column[1]} {column[2]}"
+            for column in columns
+        )
+        selects = ', '.join(
+            f"CAST(ROUND({old_column} * {money.DROPS_PER_XRP}) AS INTEGER)" if column[1] == old_column else column[1]
+            for column in columns
+        )
+        primary_key = next(column[1] for column in columns if column[5])
+        definitions += f", PRIMARY KEY ({primary_key})"
+        for fk in conn.execute(f'PRAGMA foreign_key_list({table})').fetchall():
+            definitions += f", FOREIGN KEY ({fk[3]}) REFERENCES {fk[2]} ({fk[4]})"
+        with db.transaction('migrate_to_drops', immediate=True):
+            conn.execute(f'CREATE TABLE {table}_drops ({definitions})')
+            conn.execute(f'INSERT INTO {table}_drops SELECT {selects} FROM {table}')
+            conn.execute(f'DROP TABLE {table}')
+            conn.execute(f'ALTER TABLE {table}_drops RENAME TO {table}')
 
-# Initialize database
+def migrate_to_positions(conn):
+    """Build positions and projects.shares_sold from the purchase history of older databases"""
+    if 'shares_sold' in [column[1] for column in conn.execute('PRAGMA table_info(projects)')]:
+        return
+    print("Building positions from shareholders")
+    with db.transaction('migrate_to_positions', immediate=True):
+        conn.execute('ALTER TABLE projects ADD COLUMN shares_sold INTEGER NOT NULL DEFAULT 0')
+        conn.execute('''
+            INSERT INTO positions (project_name, holder_wallet_address, shares)
+            SELECT project_name, holder_wallet_address, SUM(shares_amount)
+            FROM shareholders GROUP BY project_name, holder_wallet_address
+        ''')
+        conn.execute('''
+            UPDATE projects SET shares_sold = COALESCE(
+                (SELECT SUM(shares) FROM positions WHERE positions.project_name = projects.name), 0)
+        ''')
+
+def migrate_production_rollups(conn):
+    """Drop duplicate readings and roll up the readings stored before rollups existed"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_production_readings_time'").fetchone():
+        return
+    with db.transaction('migrate_production_rollups', immediate=True):
+        conn.execute('''
+            DELETE FROM production_readings WHERE id NOT IN (
+                SELECT MIN(id) FROM production_readings GROUP BY project_name, read_at)
+        ''')
+        conn.execute('DELETE FROM production_rollups')
+        db.rollup_production_readings(conn, 0)
+
+# Production revenue is paid out on each project's schedule by queued jobs.
+dividend_scheduler = DividendScheduler(check_interval=Config.DIVIDEND_SCHEDULER_INTERVAL)
+
+# Project wallet balances and history are read from SQLite, kept up to date
+# from the ledger in the background.
+ledger_indexer = LedgerIndexer(lambda requests: ensure_gateway().request_many(requests),
+                               check_interval=Config.LEDGER_INDEXER_INTERVAL)
+
+# Initialize database and start the background job workers
 init_db()
+jobs.init_jobs_table()
+wallet_pool.init_table()
+jobs.start_workers()
+wallet_pool.start()
+dividend_scheduler.start()
+ledger_indexer.start()
+signer.start()
 
-@app.route("/create_project", methods=["POST"])
-def create_project():
+def run_create_project(data):
     """Create a new solar plant project and its dedicated wallet"""
-    try:
-        data = request.get_json(force=True)
-        # For testing, enforce a low share price so that faucet-funded wallets have enough funds.
-        if data.get('share_price_xrp', 0) > 1:
-            return jsonify({"error": "Share price too high for testing. Please use 1 XRP or less per share."}), 400
-        
-        project_wallet = create_funded_wallet()
-        print(f"Created project wallet: {project_wallet.classic_address}")
-        balance = check_wallet_balance(project_wallet.classic_address)
-        print(f"Project wallet balance: {balance} XRP")
-        
-        conn = sqlite3.connect('solar_crowdfunding.db')
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO projects (
-                name, description, location, total_power_kw,
-                total_shares, share_price_xrp, wallet_address,
-                wallet_seed, status, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    # For testing, enforce a low share price so that faucet-funded wallets have enough funds.
+    share_price_drops = money.xrp_to_drops(data.get('share_price_xrp', 0))
+    if share_price_drops > money.DROPS_PER_XRP:
+        return {"error": "Share price too high for testing. Please use 1 XRP or less per share."}, 400
+    
+    project_wallet = wallet_pool.acquire()
+    print(f"Created project wallet: {project_wallet.classic_address}")
+    balance = check_wallet_balance(project_wallet.classic_address)
+    print(f"Project wallet balance: {balance} XRP")
+    
+    with db.transaction('run_create_project') as conn:
+        db.insert_project(
+            conn,
             data['name'],
             data['description'],
             data['location'],
             data['total_power_kw'],
             data['total_shares'],
-            data['share_price_xrp'],
+            share_price_drops,
             project_wallet.classic_address,
             project_wallet.seed,
             'FUNDING',
             datetime.now()
-        ))
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            "name": data['name'],
-            "wallet_address": project_wallet.classic_address,
-            "share_price_xrp": data['share_price_xrp'],
-            "total_shares": data['total_shares'],
-            "wallet_balance": balance
-        }), 200
-        
-    except Exception as e:
-        print(f"Error in create_project: {e}")
-        return jsonify({"error": str(e)}), 500
+        )
+    
+    return {
+        "name": data['name'],
+        "wallet_address": project_wallet.classic_address,
+        "share_price_xrp": money.drops_to_xrp(share_price_drops),
+        "share_price_drops": share_price_drops,
+        "total_shares": data['total_shares'],
+        "wallet_balance": balance
+    }, 200
 
-@app.route("/buy_shares", methods=["POST"])
-def buy_shares():
+def run_buy_shares(data):
     """Purchase shares in a project using XRP from a newly created buyer wallet"""
+    project_name = data['name']
+    shares_amount = int(data['shares_amount'])
+    if shares_amount <= 0:
+        return {"error": "shares_amount must be a positive integer"}, 400
+    
+    project = db.get_project(project_name)
+    if not project:
+        return {"error": "Project not found"}, 404
+    
+    # Calculate total drops needed based on share price
+    total_drops = shares_amount * project[5]  # share_price_drops from db
+    total_xrp = money.drops_to_xrp(total_drops)
+    
+    # Hold the shares before paying, so concurrent buyers (in any worker
+    # process) cannot together buy more than the project has.
+    reservation_id = str(uuid.uuid4())
+    with db.transaction('run_buy_shares', immediate=True) as conn:
+        reserved = db.reserve_shares(conn, reservation_id, project_name, shares_amount, Config.RESERVATION_TTL)
+    if not reserved:
+        return {"error": "Not enough shares left"}, 409
+    
+    # The shares go back only if the payment provably did not apply. After a
+    # timeout or an unknown submit error it may still validate, so the
+    # reservation is kept and left to expire.
+    submitted = False
     try:
-        data = request.get_json(force=True)
-        project_name = data['name']
-        shares_amount = int(data['shares_amount'])
-        
-        conn = sqlite3.connect('solar_crowdfunding.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM projects WHERE name = ?', (project_name,))
-        project = c.fetchone()
-        if not project:
-            return jsonify({"error": "Project not found"}), 404
-        
-        # Calculate total XRP needed based on share price
-        share_price_xrp = project[5]  # share_price_xrp from db
-        total_xrp = shares_amount * share_price_xrp
-        
-        buyer_wallet = create_funded_wallet()
+        buyer_wallet = wallet_pool.acquire()
         print(f"Created buyer wallet: {buyer_wallet.classic_address}")
         buyer_balance = check_wallet_balance(buyer_wallet.classic_address)
-        if buyer_balance < total_xrp:
-            return jsonify({
+        if money.xrp_to_drops(buyer_balance) < total_drops:
+            with db.transaction('run_buy_shares', immediate=True) as conn:
+                db.release_reservation(conn, reservation_id)
+            return {
                 "error": f"Insufficient funds. Need {total_xrp:.2f} XRP but wallet only has {buyer_balance:.2f} XRP",
                 "buyer_address": buyer_wallet.classic_address,
                 "buyer_seed": buyer_wallet.seed
-            }), 400
+            }, 400
         
-        # Convert to drops for the actual payment
-        drops_amount = str(int(total_xrp * 1000000))  # XRP -> drops conversion
+        ensure_client()  # Make sure we have a client
+        # In a tokenized project the buyer first trusts the project's tokens.
+        # The TrustSet and the payment go out back to back, in sequence, and
+        # the payment validating means the TrustSet has been applied too.
+        token = db.get_project_token(project_name)
+        trust_waiter = None
+        if token:
+            trust_waiter = sign_and_submit(
+                tokens.trust_set(buyer_wallet.classic_address, token[2], project[4]), buyer_wallet)
         
         payment = Payment(
             account=buyer_wallet.classic_address,
             destination=project[6],  # project wallet address
-            amount=drops_amount
+            amount=str(total_drops)
         )
         
-        ensure_client()  # Make sure we have a client
-        payment_prepared = autofill_and_sign(payment, client, buyer_wallet)
-        payment_result = submit_and_wait(payment_prepared, client)
-        if payment_result.result.get('meta', {}).get('TransactionResult') != 'tesSUCCESS':
-            raise Exception(f"Transaction failed: {payment_result.result}")
+        submitted = True
+        try:
+            waiter = sign_and_submit(payment, buyer_wallet)
+        except TransactionRejected:
+            submitted = False
+            raise
+        with LEDGER_OPERATIONS.time('wait_validated'):
+            payment_result = waiter.wait(Config.CONFIRMATION_TIMEOUT)
+        if payment_result["result"] != 'tesSUCCESS':
+            confirmations.cancel(waiter)
+            if payment_result["status"] in ('FAILED', 'EXPIRED', 'DROPPED'):
+                submitted = False
+                raise Exception(f"Transaction failed: {payment_result}")
+            raise Exception(f"Payment not validated within {Config.CONFIRMATION_TIMEOUT}s; "
+                            f"reservation {reservation_id} is held until it expires")
+        trust_result = trust_waiter.wait(Config.CONFIRMATION_TIMEOUT) if trust_waiter else None
+    except Exception:
+        if not submitted:
+            with db.transaction('run_buy_shares', immediate=True) as conn:
+                db.release_reservation(conn, reservation_id)
+        raise
+    balance_cache.invalidate(buyer_wallet.classic_address, project[6])
+    
+    with db.transaction('run_buy_shares', immediate=True) as conn:
+        committed = db.commit_reservation(conn, reservation_id, buyer_wallet.classic_address)
+        if committed:
+            db.insert_shareholder(
+                conn,
+                str(uuid.uuid4()),
+                project_name,
+                buyer_wallet.classic_address,
+                shares_amount,
+                datetime.now()
+            )
+            db.add_to_position(conn, project_name, buyer_wallet.classic_address, shares_amount)
+            if token:
+                db.insert_token_delivery(conn, project_name, buyer_wallet.classic_address, shares_amount,
+                                         datetime.now())
+                delivery_job_id = jobs.enqueue('deliver_tokens', {"name": project_name})
+    if not committed:
+        # The reservation lapsed while the payment was pending and the shares
+        # were sold to someone else; the payment is recorded for a refund.
+        return {
+            "error": "Reservation expired and the shares sold out; the payment is due a refund",
+            "reservation_id": reservation_id,
+            "buyer_address": buyer_wallet.classic_address,
+            "buyer_seed": buyer_wallet.seed,
+            "drops_paid": total_drops,
+            "payment_result": payment_result["tx"]
+        }, 409
+    
+    buyer_final_balance = check_wallet_balance(buyer_wallet.classic_address)
+    project_final_balance = check_wallet_balance(project[6])
+    
+    response = {
+        "buyer_address": buyer_wallet.classic_address,
+        "buyer_seed": buyer_wallet.seed,
+        "shares_amount": shares_amount,
+        "xrp_paid": total_xrp,
+        "drops_paid": total_drops,
+        "buyer_balance": buyer_final_balance,
+        "project_balance": project_final_balance,
+        "payment_result": payment_result["tx"]
+    }
+    if token:
+        response["token"] = {
+            "currency": token[1],
+            "issuer": token[2],
+            "trust_line": trust_result["result"] or trust_result["status"],
+            "delivery_job_id": delivery_job_id
+        }
+    return response, 200
+
+@LEDGER_OPERATIONS.timed('submit')
+def sign_and_submit(tx, wallet):
+    """Sign a transaction locally and submit it without waiting for it; returns its confirmation waiter"""
+    return signer.submit(tx, wallet)[1]
+
+def run_buy_shares_batch(data):
+    """Settle many share orders at once: one reservation pass, concurrent payments, one insert.
+
+    Each order names a project ('name'), 'shares_amount' and the buyer, by
+    'buyer_seed' (a 'buyer_address' alone cannot sign), or neither to use a
+    pre-funded wallet as /buy_shares does.
+    """
+    orders = data.get('orders')
+    if not isinstance(orders, list) or not orders:
+        return {"error": "orders must be a non-empty list"}, 400
+    start = time.time()
+    
+    results = [{"index": i, "name": order.get('name'), "status": 'REJECTED'} for i, order in enumerate(orders)]
+    projects = {row[0]: row for row in db.list_project_supply({order.get('name') for order in orders})}
+    tokenized = db.list_tokenized_projects(projects)
+    wallets = {}
+    valid = []
+    for result, order in zip(results, orders):
+        project = projects.get(order.get('name'))
+        try:
+            shares_amount = int(order.get('shares_amount', 0))
+        except (TypeError, ValueError):
+            shares_amount = 0
+        if project is None:
+            result["error"] = "Project not found"
+            continue
+        if shares_amount <= 0:
+            result["error"] = "shares_amount must be a positive integer"
+            continue
+        
+        seed = order.get('buyer_seed')
+        buyer_wallet = None
+        if seed:
+            if seed not in wallets:
+                wallets[seed] = Wallet.from_seed(seed)
+            buyer_wallet = wallets[seed]
+            if order.get('buyer_address', buyer_wallet.classic_address) != buyer_wallet.classic_address:
+                result["error"] = "buyer_seed does not match buyer_address"
+                continue
+        elif order.get('buyer_address'):
+            result["error"] = "buyer_seed is required to sign for buyer_address"
+            continue
+        result["shares_amount"] = shares_amount
+        valid.append((result, buyer_wallet, project))
+    
+    # Hold every order's shares in one write transaction; orders beyond a
+    # project's supply are rejected here, in order.
+    accepted = []
+    with db.transaction('run_buy_shares_batch', immediate=True) as conn:
+        for result, buyer_wallet, project in valid:
+            result["reservation_id"] = str(uuid.uuid4())
+            if db.reserve_shares(conn, result["reservation_id"], project[0], result["shares_amount"],
+                                 Config.RESERVATION_TTL):
+                accepted.append((result, buyer_wallet, project))
+            else:
+                del result["reservation_id"]
+                result["error"] = "Not enough shares left"
+    
+    # Shares go back only for orders whose payment provably did not apply:
+    # never sent, rejected, expired or dropped. A payment that timed out, or
+    # went out before an error, may still validate, so its reservation is
+    # kept and left to expire.
+    def may_still_apply(result):
+        return "waiter" in result or result["status"] in ('SUBMITTED', 'TIMEOUT', 'CONFIRMED')
+    
+    try:
+        for i, (result, buyer_wallet, project) in enumerate(accepted):
+            if buyer_wallet is None:
+                buyer_wallet = wallet_pool.acquire()
+                result["buyer_seed"] = buyer_wallet.seed
+                accepted[i] = (result, buyer_wallet, project)
+            result.update({
+                "drops": result["shares_amount"] * project[3],
+                "buyer_address": buyer_wallet.classic_address,
+                "account": buyer_wallet.classic_address
+            })
         
-        c.execute('''
-            INSERT INTO shareholders (
-                id, project_name, holder_wallet_address,
-                shares_amount, purchase_date
-            ) VALUES (?, ?, ?, ?, ?)
-        ''', (
-            str(uuid.uuid4()),
+        # Sign locally: each buyer's sequence is read once, and a buyer's orders
+        # take consecutive sequences, reserved from the signer so that nothing
+        # it signs for the same buyer meanwhile takes them too. A buyer's first
+        # order in a tokenized project is preceded by a TrustSet for its tokens.
+        ensure_client()
+        buyers = list(dict.fromkeys(result["account"] for result, wallet, project in accepted))
+        responses = ensure_gateway().request_many(
+            AccountInfo(account=address, ledger_index="current") for address in buyers
+        )
+        sequences = {}
+        for address, response in zip(buyers, responses):
+            if not isinstance(response, Exception) and response.is_successful():
+                sequences[address] = response.result['account_data']['Sequence']
+        fee, validated = signer.network_state()
+        last_ledger_sequence = validated + LEDGER_OFFSET
+        counts = {}
+        for result, buyer_wallet, project in accepted:
+            if result["account"] in sequences:
+                counts[result["account"]] = counts.get(result["account"], 0) + 1
+        for account, project_name in {(result["account"], project[0]) for result, wallet, project in accepted
+                                      if result["account"] in sequences and project[0] in tokenized}:
+            counts[account] += 1
+        for address, count in counts.items():
+            sequences[address] = signer.reserve_batch(address, count, last_ledger_sequence, sequences[address])
+        signed = []
+        trust_lines = {}
+        for result, buyer_wallet, project in accepted:
+            if result["account"] not in sequences:
+                result["status"] = 'FAILED'
+                result["error"] = "Buyer account not found on the ledger"
+                continue
+            if project[0] in tokenized and (result["account"], project[0]) not in trust_lines:
+                trust = {"account": result["account"]}
+                record_signed(trust, tokens.sign_trust_set(buyer_wallet, project[4], project[1],
+                                                           sequences[result["account"]], fee, last_ledger_sequence))
+                sequences[result["account"]] += 1
+                trust_lines[(result["account"], project[0])] = trust
+            tx = sign_payment(buyer_wallet, project[4], result["drops"], sequences[result["account"]],
+                              fee, last_ledger_sequence)
+            sequences[result["account"]] += 1
+            record_signed(result, tx)
+            signed.append(result)
+    
+        with LEDGER_OPERATIONS.time('submit_concurrently'):
+            submit_concurrently(ensure_gateway().request_many, confirmations, signed + list(trust_lines.values()))
+        # Rejected transactions, and the ones not sent after them, did not use their sequences.
+        unused = {}
+        for outcome in signed + list(trust_lines.values()):
+            if outcome["status"] == 'FAILED':
+                unused.setdefault(outcome["account"], []).append(outcome["sequence"])
+        for address, rejected in unused.items():
+            signer.release_batch(address, rejected)
+        with LEDGER_OPERATIONS.time('wait_validated_batch'):
+            confirm_payments(confirmations, signed + list(trust_lines.values()), Config.CONFIRMATION_TIMEOUT)
+    except Exception:
+        with db.transaction('run_buy_shares_batch', immediate=True) as conn:
+            for result, buyer_wallet, project in accepted:
+                if not may_still_apply(result):
+                    db.release_reservation(conn, result["reservation_id"])
+        raise
+    
+    confirmed = []
+    with db.transaction('run_buy_shares_batch', immediate=True) as conn:
+        for result, buyer_wallet, project in accepted:
+            if result["status"] == 'TIMEOUT':
+                result["error"] = (f"Payment not validated within {Config.CONFIRMATION_TIMEOUT}s; "
+                                   f"reservation {result['reservation_id']} is held until it expires")
+                continue
+            if result["status"] != 'CONFIRMED':
+                db.release_reservation(conn, result["reservation_id"])
+                continue
+            if not db.commit_reservation(conn, result["reservation_id"], result["buyer_address"]):
+                result["status"] = 'REFUND_DUE'
+                result["error"] = "Reservation expired and the shares sold out; the payment is due a refund"
+                continue
+            db.insert_shareholder(
+                conn,
+                str(uuid.uuid4()),
+                result["name"],
+                result["buyer_address"],
+                result["shares_amount"],
+                datetime.now()
+            )
+            db.add_to_position(conn, result["name"], result["buyer_address"], result["shares_amount"])
+            if result["name"] in tokenized:
+                db.insert_token_delivery(conn, result["name"], result["buyer_address"], result["shares_amount"],
+                                         datetime.now())
+                trust = trust_lines[(result["buyer_address"], result["name"])]
+                result["trust_line"] = trust.get("result", trust.get("engine_result", trust["status"]))
+            confirmed.append(result)
+        for name in {result["name"] for result in confirmed} & tokenized:
+            jobs.enqueue('deliver_tokens', {"name": name})
+    balance_cache.invalidate(*buyers, *{project[4] for result, wallet, project in accepted})
+    
+    for result in results:
+        for key in ("account", "tx_blob", "last_ledger_sequence"):
+            result.pop(key, None)
+        if "drops" in result:
+            result["xrp_paid"] = money.drops_to_xrp(result["drops"])
+    elapsed = time.time() - start
+    return {
+        "orders": results,
+        "confirmed": len(confirmed),
+        "failed": len(results) - len(confirmed),
+        "elapsed_seconds": elapsed,
+        "orders_per_second": len(confirmed) / elapsed if elapsed else 0.0
+    }, 200
+
+def run_distribute_dividends(data):
+    """Plan a dividend distribution from the project wallet and pay it out"""
+    project_name = data['name']
+    if 'total_dividend_drops' in data:  # from the dividend scheduler
+        total_dividend_drops = int(data['total_dividend_drops'])
+    else:
+        total_dividend_drops = money.xrp_to_drops(data['total_dividend_xrp'])
+    total_dividend_xrp = money.drops_to_xrp(total_dividend_drops)
+    
+    project = db.get_project(project_name)
+    if not project:
+        return {"error": "Project not found"}, 404
+    
+    project_balance = check_wallet_balance(project[6], fresh=True)
+    if money.xrp_to_drops(project_balance) < total_dividend_drops:
+        return {
+            "error": f"Insufficient funds in project wallet. Need {total_dividend_xrp} XRP but wallet only has {project_balance} XRP"
+        }, 400
+    
+    # One payment per holder, however many purchases they made. Positions
+    # come back ordered by address, so ties in the split do not depend on
+    # purchase order. Zero-drop shares are not paid. Tokens change hands on
+    # the ledger without us, so a tokenized project's holders are read from
+    # the ledger instead.
+    snapshot = None
+    if db.get_project_token(project_name) is not None:
+        snapshot = build_holder_snapshot(project, data.get('snapshot_id'))
+        if snapshot is None:
+            return {"error": "Holder snapshot not found"}, 404
+        if snapshot[6] != 'COMPLETE':
+            return {"error": f"Holder snapshot is {snapshot[6]}"}, 409
+        positions = db.list_holder_snapshot_lines(snapshot[0])
+        weight_sum = snapshot[9]
+    else:
+        # Summed from the positions themselves: shares_sold is read in
+        # another transaction and a purchase may land in between.
+        positions = db.list_positions(project_name)
+        weight_sum = None
+    if not positions:
+        return {"error": "No shareholders found for this project"}, 400
+    
+    shares = money.allocate(total_dividend_drops, [position[1] for position in positions], weight_sum=weight_sum)
+    allocations = [(position[0], drops) for position, drops in zip(positions, shares) if drops > 0]
+    
+    # The whole plan is journaled before anything is signed, so a crash at any
+    # later point can be resumed with /resume_dividend. The scheduler picks the
+    # id, so it can tell whether a failed run journaled its dividend.
+    dividend_id = data.get('dividend_id') or str(uuid.uuid4())
+    with db.transaction('run_distribute_dividends') as conn:
+        db.insert_dividend(
+            conn,
+            dividend_id,
             project_name,
-            buyer_wallet.classic_address,
-            shares_amount,
-            datetime.now()
-        ))
-        conn.commit()
-        conn.close()
+            total_dividend_drops,
+            datetime.now(),
+            'PROCESSING'
+        )
+        db.insert_dividend_payouts(conn, dividend_id, allocations)
+        if snapshot is not None:
+            db.discard_holder_snapshot(conn, snapshot[0], 'CONSUMED', dividend_id)
+    
+    body, http_status = execute_dividend(dividend_id, project)
+    if snapshot is not None:
+        body["holder_snapshot"] = holder_snapshot_info(db.get_holder_snapshot(snapshot[0]))
+    return body, http_status
+
+def run_resume_dividend(data):
+    """Finish an interrupted or partial dividend, paying only what is still owed"""
+    dividend = db.get_dividend(data['dividend_id'])
+    if not dividend:
+        return {"error": "Dividend not found"}, 404
+    return execute_dividend(dividend[0], db.get_project(dividend[1]), force=bool(data.get('force')))
+
+# Payout statuses that are final for this run; anything else (submitted but
+# not yet validated) stays SIGNED so a resume settles it before paying again.
+SETTLED_PAYOUT_STATUSES = ('CONFIRMED', 'FAILED', 'EXPIRED', 'DROPPED')
+
+def save_payout_results(project_name, outcomes):
+    with db.transaction('save_payout_results') as conn:
+        # Confirmed payouts change the holders' portfolios and the project's yield.
+        db.bump_project_version(conn, project_name)
+        db.set_dividend_payout_results(conn, [(
+            outcome["status"] if outcome["status"] in SETTLED_PAYOUT_STATUSES else 'SIGNED',
+            outcome.get("result", outcome.get("engine_result")),
+            outcome.get("ledger_index"),
+            outcome["payout_id"]
+        ) for outcome in outcomes])
+
+def hold_wallet(address):
+    """Wait for and take a wallet's pay-out lease; returns the owner to release it with.
+
+    pay_out numbers a whole batch from one sequence read, so two batches from
+    one wallet at once (a dividend and a token delivery, or two dividends of
+    one project) would sign the same sequences.
+    """
+    owner = str(uuid.uuid4())
+    deadline = time.time() + Config.WALLET_LEASE_WAIT
+    while not db.claim_wallet(address, owner, Config.JOB_LEASE_SECONDS):
+        if time.time() > deadline:
+            raise Exception(f"Wallet {address} is still busy with another pay-out after {Config.WALLET_LEASE_WAIT:.0f}s")
+        time.sleep(Config.LEDGER_POLL_INTERVAL)
+    return owner
+
+def execute_dividend(dividend_id, project, force=False):
+    """Pay a dividend's open payouts from its journal; safe to run again after a crash.
+
+    Payouts signed by an earlier run are settled against the ledger first and
+    paid again only if they provably did not apply, so the work done is
+    proportional to what is left. force=True takes over from a run whose
+    process died without releasing its lease.
+    """
+    if not db.claim_dividend(dividend_id, Config.JOB_LEASE_SECONDS, force):
+        return {"error": "This dividend is already being paid out"}, 409
+    owner = None
+    try:
+        owner = hold_wallet(project[6])
+        project_wallet = Wallet.from_seed(project[7])
+        ensure_client()
+        rows = db.list_open_dividend_payouts(dividend_id)
         
-        buyer_final_balance = check_wallet_balance(buyer_wallet.classic_address)
-        project_final_balance = check_wallet_balance(project[6])
+        signed = [{
+            "payout_id": row[0],
+            "holder_address": row[1],
+            "drops": row[2],
+            "status": row[3],
+            "sequence": row[4],
+            "last_ledger_sequence": row[5],
+            "tx_blob": row[6],
+            "tx_hash": row[7]
+        } for row in rows if row[3] == 'SIGNED']
+        if signed:
+            print(f"Settling {len(signed)} payouts signed by an earlier run of dividend {dividend_id}")
+            with LEDGER_OPERATIONS.time('settle_signed'):
+                settle_signed(client, confirmations, project_wallet.classic_address, signed,
+                              timeout=Config.CONFIRMATION_TIMEOUT)
+            save_payout_results(project[0], signed)
+            if any(outcome["status"] != 'CONFIRMED' for outcome in signed):
+                # Sequences that never applied are free again; the cache
+                # still counts them as taken.
+                signer.resync(project_wallet.classic_address)
         
-        return jsonify({
-            "buyer_address": buyer_wallet.classic_address,
-            "buyer_seed": buyer_wallet.seed,
-            "shares_amount": shares_amount,
-            "xrp_paid": total_xrp,
-            "buyer_balance": buyer_final_balance,
-            "project_balance": project_final_balance,
-            "payment_result": payment_result.result
-        }), 200
+        unpaid = [(row[0], row[1], row[2]) for row in rows if row[3] != 'SIGNED']
+        unpaid += [(outcome["payout_id"], outcome["holder_address"], outcome["drops"])
+                   for outcome in signed if outcome["status"] in ('FAILED', 'EXPIRED', 'DROPPED')]
+        payout_ids = [payout_id for payout_id, address, drops in unpaid]
+        
+        def journal(outcomes):
+            with db.transaction('journal_payouts') as conn:
+                db.set_dividend_payouts_signed(conn, [(
+                    outcome["sequence"],
+                    outcome["last_ledger_sequence"],
+                    outcome["tx_blob"],
+                    outcome["tx_hash"],
+                    payout_ids[outcome["index"]]
+                ) for outcome in outcomes])
         
+        with LEDGER_OPERATIONS.time('pay_out'):
+            payout = pay_out(client, confirmations, project_wallet,
+                             [(address, drops) for payout_id, address, drops in unpaid],
+                             timeout=Config.CONFIRMATION_TIMEOUT, on_signed=journal, sequences=signer)
+        for outcome in payout["outcomes"]:
+            outcome["payout_id"] = payout_ids[outcome["index"]]
+        save_payout_results(project[0], payout["outcomes"])
+        balance_cache.invalidate(project[6], *(row[1] for row in rows))
+        
+        counts = db.count_dividend_payouts(dividend_id)
+        confirmed = counts.get('CONFIRMED', 0)
+        status = 'COMPLETED' if confirmed == sum(counts.values()) else 'PARTIAL'
+        with db.transaction('execute_dividend') as conn:
+            db.set_dividend_status(conn, dividend_id, status)
+            db.release_dividend(conn, dividend_id)
+            db.release_wallet(conn, project[6], owner)
+    except BaseException:
+        with db.transaction('execute_dividend') as conn:
+            db.release_dividend(conn, dividend_id)
+            db.release_wallet(conn, project[6], owner)
+        raise
+    
+    distributions = [{
+        "holder_address": outcome["holder_address"],
+        "amount_xrp": money.drops_to_xrp(outcome["drops"]),
+        "amount_drops": outcome["drops"],
+        "status": outcome["status"],
+        "tx_hash": outcome.get("tx_hash"),
+        "result": outcome.get("result", outcome.get("engine_result"))
+    } for outcome in signed + payout["outcomes"]]
+    
+    final_balance = check_wallet_balance(project[6])
+    return {
+        "dividend_id": dividend_id,
+        "status": status,
+        "distributions": distributions,
+        "confirmed": confirmed,
+        "failed": sum(counts.values()) - confirmed,
+        "settled_from_earlier_run": len(signed),
+        "paid_this_run": len(unpaid),
+        "payments_per_second": payout["payments_per_second"],
+        "project_final_balance": final_balance
+    }, 200
+
+def run_tokenize_project(data):
+    """Issue a project's shares as tokens from its wallet and owe every holder their tokens"""
+    project = db.get_project(data['name'])
+    if not project:
+        return {"error": "Project not found"}, 404
+    token = db.get_project_token(project[0])
+    queued = 0
+    if token is None:
+        # Rippling lets holders trade tokens between themselves.
+        project_wallet = Wallet.from_seed(project[7])
+        ensure_client()
+        waiter = sign_and_submit(tokens.default_ripple(project[6]), project_wallet)
+        with LEDGER_OPERATIONS.time('wait_validated'):
+            account_set_result = waiter.wait(Config.CONFIRMATION_TIMEOUT)
+        if account_set_result["result"] != 'tesSUCCESS':
+            raise Exception(f"Transaction failed: {account_set_result}")
+        with db.transaction('run_tokenize_project', immediate=True) as conn:
+            if db.insert_project_token(conn, project[0], tokens.CURRENCY, project[6], datetime.now()):
+                # Existing holders get their tokens once they open a trust line.
+                queued = db.queue_position_token_deliveries(conn, project[0], datetime.now())
+        token = db.get_project_token(project[0])
+    return {
+        "name": project[0],
+        "token_code": tokens.TOKEN_CODE,
+        "currency": token[1],
+        "issuer": token[2],
+        "awaiting_trust_lines": queued
+    }, 200
+
+def run_open_trust_lines(data):
+    """Open trust lines to a project's tokens for many holders at once, then deliver what they are owed"""
+    project = db.get_project(data['name'])
+    if not project:
+        return {"error": "Project not found"}, 404
+    token = db.get_project_token(project[0])
+    if token is None:
+        return {"error": "Project is not tokenized"}, 400
+    wallets = list({seed: Wallet.from_seed(seed) for seed in data.get('holder_seeds') or []}.values())
+    if not wallets:
+        return {"error": "holder_seeds must be a non-empty list"}, 400
+    
+    ensure_client()
+    fee, validated = signer.network_state()
+    last_ledger_sequence = validated + LEDGER_OFFSET
+    with LEDGER_OPERATIONS.time('open_trust_lines'):
+        outcomes = tokens.open_trust_lines(ensure_gateway().request_many, confirmations, wallets, token[2],
+                                           project[4], fee, last_ledger_sequence, Config.CONFIRMATION_TIMEOUT,
+                                           sequences=signer)
+    opened = [outcome["holder_address"] for outcome in outcomes if outcome["status"] == 'CONFIRMED']
+    with db.transaction('run_open_trust_lines') as conn:
+        db.retry_token_deliveries(conn, project[0], opened)
+    delivery, http_status = deliver_tokens(project)
+    return {
+        "trust_lines": [{
+            "holder_address": outcome["holder_address"],
+            "status": outcome["status"],
+            "result": outcome.get("result", outcome.get("engine_result"))
+        } for outcome in outcomes],
+        "opened": len(opened),
+        "delivery": delivery
+    }, http_status
+
+def run_deliver_tokens(data):
+    project = db.get_project(data['name'])
+    if not project:
+        return {"error": "Project not found"}, 404
+    if db.get_project_token(project[0]) is None:
+        return {"error": "Project is not tokenized"}, 400
+    return deliver_tokens(project)
+
+def token_delivery_status(outcome):
+    """Where a delivery goes after a run: done, to a holder who cannot take it yet, to retry, or to settle"""
+    if outcome["status"] == 'CONFIRMED':
+        return 'CONFIRMED'
+    if outcome["status"] == 'FAILED' and str(outcome.get("result", '')).startswith('tec'):
+        # Applied without delivering: no trust line, or one with too low a limit.
+        return 'AWAITING_TRUST_LINE'
+    if outcome["status"] in SETTLED_PAYOUT_STATUSES:
+        return 'PENDING'  # provably not applied; send again
+    return 'SIGNED'
+
+def save_token_delivery_results(outcomes):
+    with db.transaction('save_token_delivery_results') as conn:
+        db.set_token_delivery_results(conn, [(
+            token_delivery_status(outcome),
+            outcome.get("result", outcome.get("engine_result")),
+            outcome.get("ledger_index"),
+            outcome["delivery_id"]
+        ) for outcome in outcomes])
+
+def deliver_tokens(project):
+    """Send every token delivery a project owes, pipelined; safe to run again after a crash.
+
+    Like execute_dividend: deliveries signed by an earlier run are settled
+    first, and the rest are signed in one batch, journaled, streamed to the
+    ledger and confirmed together. Only one run per project holds the lease;
+    a run that finds it taken leaves its deliveries to the holder, which
+    checks for new ones before it finishes.
+    """
+    start = time.time()
+    report = {"confirmed": 0, "awaiting_trust_line": 0, "unsettled": 0, "settled_from_earlier_run": 0}
+    attempted = set()
+    project_wallet = Wallet.from_seed(project[7])
+    while True:
+        rows = [row for row in db.list_open_token_deliveries(project[0]) if row[0] not in attempted]
+        if not rows:
+            break
+        if not db.claim_token_deliveries(project[0], Config.JOB_LEASE_SECONDS):
+            report["deferred_to_running_delivery"] = len(rows)
+            break
+        owner = None
+        try:
+            owner = hold_wallet(project[6])
+            # Read again under the lease: the previous holder may have sent some.
+            rows = [row for row in db.list_open_token_deliveries(project[0]) if row[0] not in attempted]
+            attempted.update(row[0] for row in rows)
+            ensure_client()
+            signed = [{
+                "delivery_id": row[0],
+                "holder_address": row[1],
+                "drops": row[2],
+                "sequence": row[4],
+                "last_ledger_sequence": row[5],
+                "tx_blob": row[6],
+                "tx_hash": row[7]
+            } for row in rows if row[3] == 'SIGNED']
+            if signed:
+                with LEDGER_OPERATIONS.time('settle_signed'):
+                    settle_signed(client, confirmations, project[6], signed, timeout=Config.CONFIRMATION_TIMEOUT)
+                save_token_delivery_results(signed)
+                report["settled_from_earlier_run"] += len(signed)
+            
+            unsent = [(row[0], row[1], row[2]) for row in rows if row[3] == 'PENDING']
+            unsent += [(outcome["delivery_id"], outcome["holder_address"], outcome["drops"])
+                       for outcome in signed if token_delivery_status(outcome) == 'PENDING']
+            delivery_ids = [delivery_id for delivery_id, address, shares in unsent]
+            
+            def journal(outcomes):
+                with db.transaction('journal_token_deliveries') as conn:
+                    db.set_token_deliveries_signed(conn, [(
+                        outcome["sequence"],
+                        outcome["last_ledger_sequence"],
+                        outcome["tx_blob"],
+                        outcome["tx_hash"],
+                        delivery_ids[outcome["index"]]
+                    ) for outcome in outcomes])
+            
+            with LEDGER_OPERATIONS.time('pay_out'):
+                payout = pay_out(client, confirmations, project_wallet,
+                                 [(address, shares) for delivery_id, address, shares in unsent],
+                                 timeout=Config.CONFIRMATION_TIMEOUT, on_signed=journal,
+                                 signer=tokens.sign_token_payment, sequences=signer)
+            for outcome in payout["outcomes"]:
+                outcome["delivery_id"] = delivery_ids[outcome["index"]]
+            save_token_delivery_results(payout["outcomes"])
+            # Earlier-run deliveries left PENDING were sent again just above.
+            for outcome in [o for o in signed if token_delivery_status(o) != 'PENDING'] + payout["outcomes"]:
+                status = token_delivery_status(outcome)
+                if status == 'CONFIRMED':
+                    report["confirmed"] += 1
+                elif status == 'AWAITING_TRUST_LINE':
+                    report["awaiting_trust_line"] += 1
+                else:
+                    report["unsettled"] += 1
+        finally:
+            with db.transaction('deliver_tokens') as conn:
+                db.release_token_deliveries(conn, project[0])
+                db.release_wallet(conn, project[6], owner)
+    report["elapsed_seconds"] = time.time() - start
+    return report, 200
+
+def get_token_info(project_name):
+    token = db.get_project_token(project_name)
+    if token is None:
+        return None
+    deliveries = db.count_token_deliveries(project_name)
+    return {
+        "name": project_name,
+        "token_code": tokens.TOKEN_CODE,
+        "currency": token[1],
+        "issuer": token[2],
+        "created_at": token[3],
+        "deliveries": {status: {"deliveries": count, "tokens": shares}
+                       for status, (count, shares) in deliveries.items()},
+        "tokens_delivered": deliveries.get('CONFIRMED', (0, 0))[1]
+    }
+
+def build_holder_snapshot(project, snapshot_id=None):
+    """Read a tokenized project's holders from the ledger; resumes where an interrupted build stopped.
+
+    A snapshot is pinned to the validated ledger it started at, so tokens
+    moving while it is paged in are neither missed nor counted twice. Each
+    page is stored with the marker of the next one, so memory stays flat
+    however many holders there are. With no snapshot_id the project's
+    unfinished snapshot is resumed, or a new one started. Returns the
+    snapshot row, or None if snapshot_id is not one of the project's.
+    """
+    if snapshot_id:
+        snapshot = db.get_holder_snapshot(snapshot_id)
+        if snapshot is None or snapshot[1] != project[0]:
+            return None
+    else:
+        snapshot = db.get_building_holder_snapshot(project[0])
+    while snapshot is None or snapshot[6] == 'BUILDING':
+        if snapshot is None:
+            token = db.get_project_token(project[0])
+            ensure_client()
+            snapshot_id = str(uuid.uuid4())
+            with db.transaction('build_holder_snapshot') as conn:
+                db.insert_holder_snapshot(conn, snapshot_id, project[0], token[2], token[1],
+                                          get_latest_validated_ledger_sequence(client), datetime.now())
+            snapshot = db.get_holder_snapshot(snapshot_id)
+        snapshot = page_holder_snapshot(snapshot)
+    return snapshot
+
+def page_holder_snapshot(snapshot):
+    """Page a BUILDING snapshot in from its marker; None if its ledger is gone and it must start over"""
+    marker = json.loads(snapshot[5]) if snapshot[5] else None
+    while True:
+        with LEDGER_OPERATIONS.time('account_lines'):
+            page = tokens.page_account_lines(ensure_gateway().request, snapshot[2], snapshot[4], marker,
+                                             currency=snapshot[3])
+        if page is None:
+            print(f"Ledger {snapshot[4]} is no longer available, discarding holder snapshot {snapshot[0]}")
+            with db.transaction('page_holder_snapshot') as conn:
+                db.discard_holder_snapshot(conn, snapshot[0], 'FAILED')
+            return None
+        holders, marker = page
+        with db.transaction('page_holder_snapshot') as conn:
+            db.add_holder_snapshot_page(conn, snapshot[0], holders, None if marker is None else json.dumps(marker))
+            if marker is None:
+                db.complete_holder_snapshot(conn, snapshot[0], datetime.now())
+        if marker is None:
+            return db.get_holder_snapshot(snapshot[0])
+
+def holder_snapshot_info(snapshot):
+    return {
+        "snapshot_id": snapshot[0],
+        "name": snapshot[1],
+        "ledger_index": snapshot[4],
+        "status": snapshot[6],
+        "pages": snapshot[7],
+        "holders": snapshot[8],
+        "tokens": snapshot[9],
+        "dividend_id": snapshot[10],
+        "created_at": snapshot[11],
+        "completed_at": snapshot[12]
+    }
+
+def run_holder_snapshot(data):
+    """Snapshot a tokenized project's holders now, e.g. at a dividend's record date"""
+    project = db.get_project(data['name'])
+    if not project:
+        return {"error": "Project not found"}, 404
+    if db.get_project_token(project[0]) is None:
+        return {"error": "Project is not tokenized"}, 400
+    snapshot = build_holder_snapshot(project, data.get('snapshot_id'))
+    if snapshot is None:
+        return {"error": "Holder snapshot not found"}, 404
+    return holder_snapshot_info(snapshot), 200
+
+def enqueue_job(kind, data):
+    """Queue a write operation and answer immediately with its job id"""
+    job_id = jobs.enqueue(kind, data)
+    return jsonify({
+        "job_id": job_id,
+        "status": 'QUEUED',
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+jobs.register('create_project', run_create_project)
+jobs.register('buy_shares', run_buy_shares)
+jobs.register('buy_shares_batch', run_buy_shares_batch)
+jobs.register('distribute_dividends', run_distribute_dividends)
+jobs.register('resume_dividend', run_resume_dividend)
+jobs.register('tokenize_project', run_tokenize_project)
+jobs.register('open_trust_lines', run_open_trust_lines)
+jobs.register('deliver_tokens', run_deliver_tokens)
+jobs.register('holder_snapshot', run_holder_snapshot)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Record each request's latency under its route, so /project/<name> is one series"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.observe(time.perf_counter() - g.request_started, request.method, endpoint,
+                          str(response.status_code))
+    return response
+
+@app.route("/create_project", methods=["POST"])
+def create_project():
+    """Queue creation of a new solar plant project and its dedicated wallet"""
+    try:
+        data = request.get_json(force=True)
+        # For testing, enforce a low share price so that faucet-funded wallets have enough funds.
+        if money.xrp_to_drops(data.get('share_price_xrp', 0)) > money.DROPS_PER_XRP:
+            return jsonify({"error": "Share price too high for testing. Please use 1 XRP or less per share."}), 400
+        return enqueue_job('create_project', data)
+    except Exception as e:
+        print(f"Error in create_project: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/buy_shares", methods=["POST"])
+def buy_shares():
+    """Queue a share purchase for a project"""
+    try:
+        return enqueue_job('buy_shares', request.get_json(force=True))
     except Exception as e:
         print(f"Error in buy_shares: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/buy_shares/batch", methods=["POST"])
+def buy_shares_batch():
+    """Queue a batch of share purchases settled together"""
+    try:
+        return enqueue_job('buy_shares_batch', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in buy_shares_batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/distribute_dividends", methods=["POST"])
 def distribute_dividends():
-    """Distribute dividends from the project wallet to its shareholders"""
+    """Queue a dividend distribution for a project"""
+    try:
+        return enqueue_job('distribute_dividends', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in distribute_dividends: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/resume_dividend", methods=["POST"])
+def resume_dividend():
+    """Queue the resumption of an interrupted or partial dividend distribution"""
+    try:
+        return enqueue_job('resume_dividend', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in resume_dividend: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/tokenize", methods=["POST"])
+def tokenize_project():
+    """Queue the issuance of a project's shares as SUNX tokens"""
+    try:
+        return enqueue_job('tokenize_project', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in tokenize_project: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/trust_lines", methods=["POST"])
+def open_trust_lines():
+    """Queue trust lines to a project's tokens for many holders, and the delivery of their tokens"""
+    try:
+        return enqueue_job('open_trust_lines', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in open_trust_lines: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/deliver_tokens", methods=["POST"])
+def deliver_tokens_endpoint():
+    """Queue the delivery of every token a project owes its holders"""
+    try:
+        return enqueue_job('deliver_tokens', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in deliver_tokens: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/token/<project_name>", methods=["GET"])
+def get_token(project_name):
+    """A project's token and how many of its tokens have been delivered"""
+    try:
+        info = get_token_info(project_name)
+        if info is None:
+            return jsonify({"error": "Project is not tokenized"}), 404
+        return jsonify(info), 200
+    except Exception as e:
+        print(f"Error in get_token: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/holder_snapshot", methods=["POST"])
+def holder_snapshot():
+    """Queue a snapshot of a tokenized project's holders from the ledger"""
+    try:
+        return enqueue_job('holder_snapshot', request.get_json(force=True))
+    except Exception as e:
+        print(f"Error in holder_snapshot: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/holder_snapshot/<snapshot_id>", methods=["GET"])
+def get_holder_snapshot(snapshot_id):
+    try:
+        snapshot = db.get_holder_snapshot(snapshot_id)
+        if snapshot is None:
+            return jsonify({"error": "Holder snapshot not found"}), 404
+        return jsonify(holder_snapshot_info(snapshot)), 200
+    except Exception as e:
+        print(f"Error in get_holder_snapshot: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/production_readings", methods=["POST"])
+def ingest_production_readings():
+    """Store a batch of meter readings, as JSON {"readings": [...]} or CSV with a header row"""
+    try:
+        try:
+            if request.mimetype == 'text/csv':
+                rows = production.parse_csv(request.get_data(as_text=True))
+            else:
+                rows = production.parse_readings(request.get_json(force=True).get('readings') or [])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not rows:
+            return jsonify({"error": "No readings given"}), 400
+        names = {row[0] for row in rows}
+        unknown = names - {project[0] for project in db.list_project_supply(names)}
+        if unknown:
+            return jsonify({"error": "Unknown projects", "projects": sorted(unknown)}), 400
+        with db.transaction('ingest_production_readings', immediate=True) as conn:
+            inserted = db.insert_production_readings(conn, rows)
+        return jsonify({"inserted": inserted, "duplicates": len(rows) - inserted, "projects": len(names)}), 200
+    except Exception as e:
+        print(f"Error in ingest_production_readings: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/production/<name>", methods=["GET"])
+def get_production(name):
+    """Energy produced per hour, day or month between start and end (unix seconds or ISO 8601)"""
+    try:
+        resolution = request.args.get('resolution', 'day')
+        if resolution not in db.PRODUCTION_BUCKETS:
+            return jsonify({"error": f"resolution must be one of {', '.join(db.PRODUCTION_BUCKETS)}"}), 400
+        try:
+            end = production.parse_timestamp(request.args['end']) if 'end' in request.args else time.time()
+            start = production.parse_timestamp(request.args['start']) if 'start' in request.args else end - 365 * 86400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not db.get_project(name):
+            return jsonify({"error": "Project not found"}), 404
+        rows = db.get_production_series(name, resolution, start, end)
+        # Columns rather than one object per bucket: a year of hours is 8760 buckets.
+        return jsonify({
+            "name": name,
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "bucket_start": [row[0] for row in rows],
+            "kwh": [row[1] / 1000 for row in rows],
+            "readings": [row[2] for row in rows],
+            "total_kwh": sum(row[1] for row in rows) / 1000
+        }), 200
+    except Exception as e:
+        print(f"Error in get_production: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dividend_schedule", methods=["POST"])
+def set_dividend_schedule():
+    """Pay a project's production revenue as a dividend every interval_days"""
     try:
         data = request.get_json(force=True)
-        project_name = data['name']
-        total_dividend_xrp = float(data['total_dividend_xrp'])
-        
-        conn = sqlite3.connect('solar_crowdfunding.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM projects WHERE name = ?', (project_name,))
-        project = c.fetchone()
+        if not db.get_project(data.get('name')):
+            return jsonify({"error": "Project not found"}), 404
+        try:
+            tariff_drops_per_kwh = money.xrp_to_drops(data['tariff_xrp_per_kwh'])
+            interval_seconds = float(data.get('interval_days', 91)) * 86400
+            if tariff_drops_per_kwh <= 0 or interval_seconds <= 0:
+                raise ValueError("tariff_xrp_per_kwh and interval_days must be positive")
+            if 'first_run_at' in data:
+                next_run_at = production.parse_timestamp(data['first_run_at'])
+            else:
+                next_run_at = time.time() + interval_seconds
+        except (KeyError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        with db.transaction('set_dividend_schedule') as conn:
+            db.upsert_dividend_schedule(conn, data['name'], tariff_drops_per_kwh, interval_seconds, next_run_at)
+        return jsonify({
+            "name": data['name'],
+            "tariff_drops_per_kwh": tariff_drops_per_kwh,
+            "interval_seconds": interval_seconds,
+            "next_run_at": next_run_at
+        }), 200
+    except Exception as e:
+        print(f"Error in set_dividend_schedule: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dividend_schedule/run", methods=["POST"])
+def run_dividend_schedule():
+    """Queue every due scheduled dividend now instead of at the next check"""
+    try:
+        return jsonify(dividend_scheduler.run_cycle()), 200
+    except Exception as e:
+        print(f"Error in run_dividend_schedule: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/wallet_history/<project_name>", methods=["GET"])
+def get_wallet_history(project_name):
+    """A project wallet's indexed transactions, newest first; page with `before` from next_before"""
+    try:
+        project = db.get_project(project_name)
         if not project:
             return jsonify({"error": "Project not found"}), 404
-        
-        project_balance = check_wallet_balance(project[6])
-        if project_balance < total_dividend_xrp:
-            return jsonify({
-                "error": f"Insufficient funds in project wallet. Need {total_dividend_xrp} XRP but wallet only has {project_balance} XRP"
-            }), 400
-        
-        c.execute('SELECT * FROM shareholders WHERE project_name = ?', (project_name,))
-        holders = c.fetchall()
-        if not holders:
-            return jsonify({"error": "No shareholders found for this project"}), 400
-        
-        total_shares = sum(holder[3] for holder in holders)
-        dividend_id = str(uuid.uuid4())
-        c.execute('''
-            INSERT INTO dividends (
-                id, project_name, amount_xrp,
-                distribution_date, status
-            ) VALUES (?, ?, ?, ?, ?)
-        ''', (
-            dividend_id,
-            project_name,
-            total_dividend_xrp,
-            datetime.now(),
-            'PROCESSING'
-        ))
-        
-        # Recover project wallet from stored seed
-        project_wallet = Wallet.from_seed(project[7])
-        distributions = []
-        for holder in holders:
-            holder_share = (holder[3] / total_shares) * total_dividend_xrp
-            drops = str(int(holder_share * 1000000))
-            payment = Payment(
-                account=project_wallet.classic_address,
-                destination=holder[2],  # holder_wallet_address
-                amount=drops
-            )
-            # Correct parameter order: client first, then project_wallet.
-            payment_prepared = autofill_and_sign(payment, client, project_wallet)
-            result = submit_and_wait(payment_prepared, client)
-            if result.result.get('meta', {}).get('TransactionResult') != 'tesSUCCESS':
-                raise Exception(f"Dividend payment failed: {result.result}")
-            distributions.append({
-                "holder_address": holder[2],
-                "amount_xrp": holder_share,
-                "result": result.result
-            })
-        
-        c.execute('UPDATE dividends SET status = ? WHERE id = ?', ('COMPLETED', dividend_id))
-        conn.commit()
-        conn.close()
-        
-        final_balance = check_wallet_balance(project[6])
+        limit = request.args.get('limit', str(Config.PAGE_SIZE))
+        limit = int(limit) if limit.isdigit() else 0
+        if not 1 <= limit <= Config.MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {Config.MAX_PAGE_SIZE}"}), 400
+        before = None
+        if 'before' in request.args:
+            try:
+                before = tuple(int(part) for part in request.args['before'].split(':'))
+                if len(before) != 2:
+                    raise ValueError
+            except ValueError:
+                return jsonify({"error": "before must be <ledger_index>:<transaction_index>"}), 400
+        indexed = db.get_wallet_index(project[6])
+        rows = db.list_wallet_transactions(project[6], before, limit)
         return jsonify({
-            "dividend_id": dividend_id,
-            "distributions": distributions,
-            "project_final_balance": final_balance
+            "name": project_name,
+            "wallet_address": project[6],
+            "indexed_through_ledger": indexed[1] if indexed else None,
+            "balance_drops": indexed[0] if indexed else None,
+            "indexed_transactions": indexed[2] if indexed else 0,
+            "transactions": [{
+                "ledger_index": row[0],
+                "transaction_index": row[1],
+                "hash": row[2],
+                "type": row[3],
+                "counterparty": row[4],
+                "delta_drops": row[5],
+                "fee_drops": row[6],
+                "currency": row[7],
+                "issuer": row[8],
+                "value": row[9],
+                "result": row[10],
+                "close_time": row[11]
+            } for row in rows],
+            "next_before": f"{rows[-1][0]}:{rows[-1][1]}" if len(rows) == limit else None
         }), 200
-        
     except Exception as e:
-        print(f"Error in distribute_dividends: {e}")
+        print(f"Error in get_wallet_history: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/wallet_index/run", methods=["POST"])
+def run_wallet_index():
+    """Bring every project wallet's indexed history up to the validated ledger now"""
+    try:
+        return jsonify({**ledger_indexer.run_cycle(), "stats": ledger_indexer.stats()}), 200
+    except Exception as e:
+        print(f"Error in run_wallet_index: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Report the status and, once finished, the result of a queued job"""
+    try:
+        job = jobs.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        print(f"Error in get_job: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """Report hit/miss counters for the in-memory caches"""
+    return jsonify({
+        "balance_cache": balance_cache.stats(),
+        "project_snapshots": project_snapshots.stats(),
+        "project_yields": project_yields.stats(),
+        "all_project_yields": all_project_yields.stats(),
+        "portfolios": portfolios.stats(),
+        "confirmations": confirmations.stats()
+    }), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Expose latency histograms (HTTP, jobs, ledger calls, faucet, SQLite) for Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/ledger_pool", methods=["GET"])
+def ledger_pool_stats():
+    """Report each ledger endpoint's health and latency, and how often calls failed over"""
+    try:
+        return jsonify(ensure_pool().stats()), 200
+    except Exception as e:
+        print(f"Error in ledger_pool_stats: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/signer", methods=["GET"])
+def signer_stats():
+    """Report the local signer's cached accounts, fee and ledger index, and its sequence recoveries"""
+    try:
+        return jsonify(signer.stats()), 200
+    except Exception as e:
+        print(f"Error in signer_stats: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/wallet_pool", methods=["GET"])
+def wallet_pool_stats():
+    """Report the pre-funded wallet pool depth and refill latency"""
+    try:
+        return jsonify(wallet_pool.stats()), 200
+    except Exception as e:
+        print(f"Error in wallet_pool_stats: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def build_project_snapshot(project_name):
+    """Serialize a project's detail page, or return None if there is no such project"""
+    project = db.get_project(project_name)
+    if not project:
+        return None
+    
+    # Ask the ledger only for wallets the indexer has not caught up with yet.
+    indexed = db.get_wallet_index(project[6])
+    if indexed is not None and indexed[1] is not None:
+        project_balance = money.drops_to_xrp(indexed[0])
+    else:
+        project_balance = check_wallet_balance(project[6])
+    holders = db.list_shareholders(project_name)
+    dividends = db.list_dividends(project_name)
+    
+    return app.json.dumps({
+        "project": {
+            "name": project[0],
+            "description": project[1],
+            "location": project[2],
+            "total_power_kw": project[3],
+            "total_shares": project[4],
+            "share_price_xrp": money.drops_to_xrp(project[5]),
+            "share_price_drops": project[5],
+            "wallet_address": project[6],
+            "status": project[8],
+            "created_at": project[9],
+            "shares_sold": project[10],
+            "shares_reserved": project[11],
+            "current_balance_xrp": project_balance
+        },
+        "shareholders": [{
+            "holder_address": holder[2],
+            "shares_amount": holder[3],
+            "purchase_date": holder[4]
+        } for holder in holders],
+        "dividends": [{
+            "id": div[0],
+            "amount_xrp": money.drops_to_xrp(div[2]),
+            "amount_drops": div[2],
+            "distribution_date": div[3],
+            "status": div[4]
+        } for div in dividends]
+    }).encode()
+
+class ProjectSnapshotStore:
+    """SQLite-backed second level for project_snapshots, shared by all processes"""
+    
+    def load(self, project_name):
+        return db.get_project_snapshot(project_name)
+    
+    def save(self, project_name, version, etag, body, built_at):
+        db.save_project_snapshot(project_name, version, etag, body, built_at)
+
+# Serialized /project/<name> pages. Writes bump the project's version in the
+# same transaction, so a snapshot is never served after its project changed.
+project_snapshots = SnapshotCache(build_project_snapshot, db.get_project_version,
+                                  max_entries=Config.SNAPSHOT_CACHE_SIZE, ttl=Config.BALANCE_CACHE_TTL,
+                                  store=ProjectSnapshotStore() if Config.SNAPSHOT_CACHE_DISK else None)
+
+def snapshot_response(snapshot):
+    """Serve a cached (body, etag), answering 304 Not Modified when If-None-Match carries the ETag"""
+    body, etag = snapshot
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @app.route("/project/<project_name>", methods=["GET"])
 def get_project(project_name):
     """Retrieve project details including shareholders and dividend history"""
     try:
-        conn = sqlite3.connect('solar_crowdfunding.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM projects WHERE name = ?', (project_name,))
-        project = c.fetchone()
-        if not project:
+        snapshot = project_snapshots.get(project_name)
+        if snapshot is None:
             return jsonify({"error": "Project not found"}), 404
-        
-        project_balance = check_wallet_balance(project[6])
-        c.execute('SELECT * FROM shareholders WHERE project_name = ?', (project_name,))
-        holders = c.fetchall()
-        c.execute('SELECT * FROM dividends WHERE project_name = ?', (project_name,))
-        dividends = c.fetchall()
-        conn.close()
-        
-        return jsonify({
-            "project": {
-                "name": project[0],
-                "description": project[1],
-                "location": project[2],
-                "total_power_kw": project[3],
-                "total_shares": project[4],
-                "share_price_xrp": project[5],
-                "wallet_address": project[6],
-                "status": project[8],
-                "created_at": project[9],
-                "current_balance_xrp": project_balance
-            },
-            "shareholders": [{
-                "holder_address": holder[2],
-                "shares_amount": holder[3],
-                "purchase_date": holder[4]
-            } for holder in holders],
-            "dividends": [{
-                "id": div[0],
-                "amount_xrp": div[2],
-                "distribution_date": div[3],
-                "status": div[4]
-            } for div in dividends]
-        }), 200
+        return snapshot_response(snapshot)
         
     except Exception as e:
         print(f"Error in get_project: {e}")
         return jsonify({"error": str(e)}), 500
 
+def project_yield_info(row):
+    """Format a db.PROJECT_YIELDS row; yields are dividends paid over the XRP raised"""
+    (name, total_shares, shares_sold, share_price_drops, status, created_at,
+     age_days, holders, dividends, paid_drops, last_dividend_date, production_wh) = row
+    raised_drops = shares_sold * share_price_drops
+    realized_yield = paid_drops / raised_drops if raised_drops else None
+    return {
+        "name": name,
+        "status": status,
+        "created_at": created_at,
+        "age_days": age_days,
+        "total_shares": total_shares,
+        "shares_sold": shares_sold,
+        "holders": holders,
+        "raised_xrp": money.drops_to_xrp(raised_drops),
+        "raised_drops": raised_drops,
+        "dividends": dividends,
+        "last_dividend_date": last_dividend_date,
+        "dividends_paid_xrp": money.drops_to_xrp(paid_drops),
+        "dividends_paid_drops": paid_drops,
+        "dividend_per_share_drops": paid_drops / shares_sold if shares_sold else None,
+        "realized_yield": realized_yield,
+        # Not annualized over less than a day, where it would be meaningless.
+        "annualized_yield": realized_yield * 365.25 / age_days
+        if realized_yield is not None and age_days and age_days >= 1 else None,
+        "production_kwh": production_wh / 1000
+    }
+
+def build_project_yield(project_name):
+    row = db.get_project_yield(project_name)
+    return app.json.dumps(project_yield_info(row)).encode() if row else None
+
+def build_project_yields(key):
+    return app.json.dumps({"projects": [project_yield_info(row) for row in db.list_project_yields()]}).encode()
+
+def build_portfolio(holder_address):
+    """Serialize a holder's positions, cost and dividends across projects, or None if they hold nothing"""
+    rows = db.get_holder_portfolio(holder_address)
+    if not rows:
+        return None
+    projects = []
+    for name, shares, total_shares, share_price_drops, status, received_drops, payments in rows:
+        invested_drops = shares * share_price_drops
+        projects.append({
+            "name": name,
+            "status": status,
+            "shares": shares,
+            "ownership": shares / total_shares if total_shares else None,
+            "invested_xrp": money.drops_to_xrp(invested_drops),
+            "invested_drops": invested_drops,
+            "dividends_received_xrp": money.drops_to_xrp(received_drops),
+            "dividends_received_drops": received_drops,
+            "dividend_payments": payments,
+            "roi": received_drops / invested_drops if invested_drops else None
+        })
+    invested_drops = sum(project["invested_drops"] for project in projects)
+    received_drops = sum(project["dividends_received_drops"] for project in projects)
+    return app.json.dumps({
+        "holder_address": holder_address,
+        "projects": projects,
+        "invested_xrp": money.drops_to_xrp(invested_drops),
+        "invested_drops": invested_drops,
+        "dividends_received_xrp": money.drops_to_xrp(received_drops),
+        "dividends_received_drops": received_drops,
+        "roi": received_drops / invested_drops if invested_drops else None
+    }).encode()
+
+# Analytics responses, cached until a write bumps a version they depend on.
+# The TTL only bounds how stale age-based figures (annualized yield) get.
+project_yields = SnapshotCache(build_project_yield, db.get_project_version,
+                               max_entries=Config.SNAPSHOT_CACHE_SIZE, ttl=Config.ANALYTICS_CACHE_TTL)
+all_project_yields = SnapshotCache(build_project_yields, lambda key: db.get_projects_version(),
+                                   max_entries=1, ttl=Config.ANALYTICS_CACHE_TTL)
+portfolios = SnapshotCache(build_portfolio, db.get_holder_version,
+                           max_entries=Config.ANALYTICS_CACHE_SIZE, ttl=Config.ANALYTICS_CACHE_TTL)
+
+@app.route("/yield/<project_name>", methods=["GET"])
+def get_project_yield(project_name):
+    """Dividends paid, XRP raised and realized yield of one project"""
+    try:
+        snapshot = project_yields.get(project_name)
+        if snapshot is None:
+            return jsonify({"error": "Project not found"}), 404
+        return snapshot_response(snapshot)
+    except Exception as e:
+        print(f"Error in get_project_yield: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/yield", methods=["GET"])
+def get_project_yields():
+    """Yield of every project, in one response"""
+    try:
+        return snapshot_response(all_project_yields.get('all'))
+    except Exception as e:
+        print(f"Error in get_project_yields: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/portfolio/<holder_address>", methods=["GET"])
+def get_portfolio(holder_address):
+    """A holder's shares, cost, dividends received and ROI in every project"""
+    try:
+        snapshot = portfolios.get(holder_address)
+        if snapshot is None:
+            return jsonify({"error": "No shares found for this holder"}), 404
+        return snapshot_response(snapshot)
+    except Exception as e:
+        print(f"Error in get_portfolio: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def build_project_infos(project_rows, holder_rows, dividend_rows):
+    """Group shareholder and dividend rows under their projects in one pass each"""
+    shareholders = {}
+    for holder in holder_rows:
+        shareholders.setdefault(holder[1], []).append({
+            "holder_address": holder[2],
+            "shares_amount": holder[3],
+            "purchase_date": holder[4]
+        })
+    dividends = {}
+    for div in dividend_rows:
+        dividends.setdefault(div[1], []).append({
+            "id": div[0],
+            "amount_xrp": money.drops_to_xrp(div[2]),
+            "amount_drops": div[2],
+            "distribution_date": div[3],
+            "status": div[4]
+        })
+    
+    return [{
+        "name": row[0],
+        "description": row[1],
+        "location": row[2],
+        "total_power_kw": row[3],
+        "total_shares": row[4],
+        "share_price_xrp": money.drops_to_xrp(row[5]),
+        "share_price_drops": row[5],
+        "wallet_address": row[6],
+        "status": row[8],
+        "created_at": row[9],
+        "shares_sold": row[10],
+        "shares_reserved": row[11],
+        "shareholders": shareholders.get(row[0], []),
+        "dividends": dividends.get(row[0], [])
+    } for row in project_rows]
+
+def load_project_page(after, limit):
+    """Load up to `limit` projects named after `after`, with their children, in three queries"""
+    rows = db.list_projects_page(after, limit)
+    if not rows:
+        return []
+    first, last = rows[0][0], rows[-1][0]
+    return build_project_infos(
+        rows,
+        db.list_shareholders_between(first, last),
+        db.list_dividends_between(first, last)
+    )
+
+def stream_projects(after, chunk_size):
+    """Yield projects as NDJSON lines, holding at most one chunk in memory"""
+    while True:
+        projects = load_project_page(after, chunk_size)
+        for project in projects:
+            yield json.dumps(project, default=str) + "\n"
+        if len(projects) < chunk_size:
+            return
+        after = projects[-1]["name"]
+
 @app.route("/get_all_project_info", methods=["GET"])
 def get_all_project_info():
     """
     Retrieve all information about projects, shareholders, and dividends from the database.
-    Returns a dictionary with all the information.
+    Without parameters, returns every project in one response. With `after` and/or
+    `limit`, returns one page ordered by name plus the `next_after` cursor. With
+    `format=ndjson`, streams one project per line.
     """
     try:
-        conn = sqlite3.connect('solar_crowdfunding.db')
-        c = conn.cursor()
+        after = request.args.get('after', '')
+        limit = request.args.get('limit')
+        if limit is not None:
+            limit = int(limit) if limit.isdigit() else 0
+            if not 1 <= limit <= Config.MAX_PAGE_SIZE:
+                return jsonify({"error": f"limit must be between 1 and {Config.MAX_PAGE_SIZE}"}), 400
         
-        # Get all projects
-        c.execute('''
-            SELECT * FROM projects
-        ''')
-        projects = []
-        for row in c.fetchall():
-            project = {
-                "name": row[0],
-                "description": row[1],
-                "location": row[2],
-                "total_power_kw": row[3],
-                "total_shares": row[4],
-                "share_price_xrp": row[5],
-                "wallet_address": row[6],
-                "status": row[8],
-                "created_at": row[9]
-            }
-            
-            # Get shareholders for this project
-            c.execute('SELECT * FROM shareholders WHERE project_name = ?', (row[0],))
-            shareholders = [{
-                "holder_address": holder[2],
-                "shares_amount": holder[3],
-                "purchase_date": holder[4]
-            } for holder in c.fetchall()]
-            project["shareholders"] = shareholders
-            
-            # Get dividends for this project
-            c.execute('SELECT * FROM dividends WHERE project_name = ?', (row[0],))
-            dividends = [{
-                "id": div[0],
-                "amount_xrp": div[2],
-                "distribution_date": div[3],
-                "status": div[4]
-            } for div in c.fetchall()]
-            project["dividends"] = dividends
-            
-            projects.append(project)
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(stream_projects(after, limit or Config.PAGE_SIZE)),
+                mimetype='application/x-ndjson'
+            )
+        
+        if 'after' not in request.args and limit is None:
+            projects = build_project_infos(
+                db.list_projects(),
+                db.list_all_shareholders(),
+                db.list_all_dividends()
+            )
+            return jsonify({"projects": projects}), 200
         
-        conn.close()
-        return jsonify({"projects": projects}), 200
+        limit = limit or Config.PAGE_SIZE
+        projects = load_project_page(after, limit)
+        next_after = projects[-1]["name"] if len(projects) == limit else None
+        return jsonify({"projects": projects, "next_after": next_after}), 200
         
     except Exception as e:
         print(f"Error in get_all_project_info: {e}")
-        if 'conn' in locals():
-            conn.close()
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration when first imported: point it at a scratch
+# database and keep its background threads off, as benchmarks.py does.
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(prefix="solar-tests-"), "tests.db")
+for name in ('JOB_WORKERS', 'WALLET_POOL_SIZE', 'DIVIDEND_SCHEDULER_INTERVAL', 'LEDGER_INDEXER_INTERVAL',
+             'SIGNER_REFRESH_INTERVAL'):
+    os.environ[name] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    """The Flask app over empty tables"""
+    import solar_crowdfunding
+    from clear_tables import clear_tables
+    clear_tables()
+    return solar_crowdfunding.app
+
+
+@pytest.fixture(scope='session')
+def ledger():
+    """A fake ledger the app talks to, shared by the whole session.
+
+    The app caches the validated ledger index it has seen, so every test
+    runs against the same ledger rather than one that starts over.
+    """
+    import fake_ledger
+    import solar_crowdfunding
+    from xrpl.clients import JsonRpcClient
+    from ledger_gateway import LedgerGateway
+    ledger, server = fake_ledger.serve(close_interval=0.05)
+    url = fake_ledger.server_url(server)
+    solar_crowdfunding.client = JsonRpcClient(url)
+    solar_crowdfunding.ledger_gateway = LedgerGateway(url)
+    solar_crowdfunding.confirmations.poll_interval = 0.01
+    yield ledger
+    solar_crowdfunding.ledger_gateway.close()
+    server.shutdown()
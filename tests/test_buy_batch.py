@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+from xrpl.wallet import Wallet
+
+
+@pytest.fixture
+def project(app, ledger):
+    """A project selling 100 shares at 1 XRP"""
+    import db
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, 100 * 1000000)
+    with db.transaction() as conn:
+        db.insert_project(conn, "batch", "Synthetic project", "Nowhere", 100.0, 100, 1000000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+    return db
+
+
+def funded(ledger, xrp=1000):
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, xrp * 1000000)
+    return wallet
+
+
+def supply(db):
+    return db.query_one("SELECT shares_sold, shares_reserved FROM projects WHERE name = 'batch'")
+
+
+def test_each_buyer_pays_from_one_sequence_chain(project, ledger):
+    import solar_crowdfunding
+    buyers = [funded(ledger), funded(ledger)]
+    ledger.close_ledger()
+    first = {wallet.classic_address: ledger.accounts[wallet.classic_address]["Sequence"] for wallet in buyers}
+    orders = [{"name": "batch", "shares_amount": 2, "buyer_seed": wallet.seed} for _ in range(3) for wallet in buyers]
+
+    body, status = solar_crowdfunding.run_buy_shares_batch({"orders": orders})
+    assert status == 200 and body["confirmed"] == 6
+    for wallet in buyers:
+        address = wallet.classic_address
+        assert sorted(o["sequence"] for o in body["orders"] if o["buyer_address"] == address) == [
+            first[address] + i for i in range(3)]
+        assert ledger.accounts[address]["Sequence"] == first[address] + 3
+    assert supply(project) == (12, 0)
+
+
+def test_failed_orders_give_their_shares_back(project, ledger):
+    import solar_crowdfunding
+    buyer = funded(ledger)
+    ledger.close_ledger()
+    orders = [{"name": "batch", "shares_amount": 5, "buyer_seed": buyer.seed},
+              {"name": "batch", "shares_amount": 7, "buyer_seed": Wallet.create().seed},
+              {"name": "batch", "shares_amount": 200, "buyer_seed": buyer.seed}]
+
+    body, status = solar_crowdfunding.run_buy_shares_batch({"orders": orders})
+    assert [o["status"] for o in body["orders"]] == ['CONFIRMED', 'FAILED', 'REJECTED']
+    assert supply(project) == (5, 0)
+    assert project.query_one("SELECT COUNT(*) FROM reservations WHERE status = 'HELD'")[0] == 0
+
+
+class StubConfirmations:
+    def __init__(self):
+        self.cancelled = []
+
+    def watch(self, tx_hash, last_ledger_sequence, account, sequence):
+        return tx_hash
+
+    def cancel(self, waiter):
+        self.cancelled.append(waiter)
+
+
+class Response:
+    def __init__(self, engine_result):
+        self.result = {"engine_result": engine_result}
+
+    def is_successful(self):
+        return True
+
+
+def test_a_rejected_payment_stops_the_rest_of_its_chain():
+    from payouts import submit_concurrently
+    outcomes = [{"account": account, "sequence": sequence, "tx_hash": f"{account}{sequence}",
+                 "tx_blob": f"{account}{sequence}", "last_ledger_sequence": 2000}
+                for account in ("rA", "rB") for sequence in (1, 2, 3)]
+    sent = []
+
+    def request_many(requests):
+        sent.extend(request.tx_blob for request in requests)
+        return [Response('tefPAST_SEQ' if request.tx_blob == "rA2" else 'tesSUCCESS') for request in requests]
+
+    confirmations = StubConfirmations()
+    submit_concurrently(request_many, confirmations, outcomes)
+    assert sent == ["rA1", "rB1", "rA2", "rB2", "rB3"]
+    assert [o["status"] for o in outcomes] == ['SUBMITTED', 'FAILED', 'FAILED'] + ['SUBMITTED'] * 3
+    assert outcomes[2]["engine_result"].startswith('not sent')
+    assert confirmations.cancelled == ["rA2"]
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from xrpl.models.requests import Ledger
+from xrpl.models.response import Response, ResponseStatus
+
+from confirmations import ConfirmationService
+
+
+class StubLedger:
+    """Validated ledgers of expanded transactions; answers only Ledger requests"""
+
+    def __init__(self, validated=100):
+        self.validated = validated
+        self.ledgers = {}
+        self.scans = 0
+        self.lock = threading.Lock()
+
+    def close(self, *transactions):
+        with self.lock:
+            self.ledgers[self.validated + 1] = list(transactions)
+            self.validated += 1
+
+    def request(self, req):
+        assert isinstance(req, Ledger), f"unexpected {type(req).__name__} request"
+        with self.lock:
+            if req.ledger_index == "validated":
+                return Response(status=ResponseStatus.SUCCESS, result={"ledger_index": self.validated})
+            self.scans += 1
+            transactions = self.ledgers.get(req.ledger_index, [])
+        return Response(status=ResponseStatus.SUCCESS, result={"ledger": {"transactions": transactions}})
+
+
+def tx(hash, account, sequence, result='tesSUCCESS'):
+    return {"hash": hash, "Account": account, "Sequence": sequence, "TransactionType": 'AccountSet',
+            "metaData": {"TransactionResult": result}}
+
+
+def test_many_accounts_cost_one_request_per_ledger():
+    ledger = StubLedger()
+    service = ConfirmationService(ledger.request, poll_interval=0.01)
+    waiters = [service.watch(f"H{i}", 110, f"rBuyer{i}", 1) for i in range(200)]
+    ledger.close(*[tx(f"H{i}", f"rBuyer{i}", 1) for i in range(100)])
+    ledger.close(*[tx(f"H{i}", f"rBuyer{i}", 1) for i in range(100, 200)])
+    assert all(waiter.wait(5)["status"] == 'CONFIRMED' for waiter in waiters)
+    assert ledger.scans == 2
+
+
+def test_nothing_is_scanned_until_a_ledger_closes():
+    ledger = StubLedger()
+    service = ConfirmationService(ledger.request, poll_interval=0.01)
+    waiter = service.watch("H1", 110, "rBuyer", 1)
+    time.sleep(0.1)
+    assert ledger.scans == 0 and not waiter.done()
+    ledger.close()
+    assert service.wait_scanned(101, 5) and ledger.scans == 1
+    service.cancel(waiter)
+
+
+def test_passed_over_and_expired_transactions_resolve_from_the_scanned_ledgers():
+    ledger = StubLedger()
+    service = ConfirmationService(ledger.request, poll_interval=0.01)
+    dropped = service.watch("OURS", 110, "rBuyer", 5)
+    expired = service.watch("LOST", 102, "rOther", 9)
+    ledger.close(tx("THEIRS", "rBuyer", 5))  # the same sequence, signed elsewhere
+    assert dropped.wait(5)["status"] == 'DROPPED'
+    assert not expired.done()
+    ledger.close()
+    assert expired.wait(5)["status"] == 'EXPIRED'
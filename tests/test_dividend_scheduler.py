@@ -0,0 +1,72 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+DAY = 86400
+
+
+@pytest.fixture
+def scheduled(app):
+    """A project with one holder, paid 1 drop per kWh every day from now"""
+    import db
+    import solar_crowdfunding
+    with db.transaction(immediate=True) as conn:
+        db.insert_project(conn, "sunny", "Synthetic project", "Nowhere", 100.0, 1000, 50000,
+                          "rProject", "sSeed", 'FUNDING', datetime.now())
+        db.add_to_position(conn, "sunny", "rHolder", 10)
+        db.upsert_dividend_schedule(conn, "sunny", 1, DAY, time.time())
+    return db, solar_crowdfunding.dividend_scheduler
+
+
+def read(db, first_hour, kwh):
+    with db.transaction(immediate=True) as conn:
+        db.insert_production_readings(conn, [("sunny", 1000.0 + 3600 * (first_hour + i), value * 1000)
+                                             for i, value in enumerate(kwh)])
+
+
+def finish(db, job_id, status):
+    with db.transaction() as conn:
+        conn.execute('UPDATE jobs SET status = ? WHERE id = ?', (status, job_id))
+
+
+def test_a_run_waits_for_the_previous_one(scheduled):
+    db, scheduler = scheduled
+    read(db, 0, [5, 7])
+    now = time.time()
+    [run] = scheduler.run_cycle(now)["enqueued"]
+    assert run["total_dividend_drops"] == 12
+    read(db, 2, [3])
+    assert not scheduler.run_cycle(now + DAY)["enqueued"]  # the first run is still queued
+    finish(db, run["job_id"], 'COMPLETED')
+    [run] = scheduler.run_cycle(now + DAY)["enqueued"]
+    assert run["total_dividend_drops"] == 3
+
+
+def test_a_run_that_failed_before_journaling_is_paid_again(scheduled):
+    db, scheduler = scheduled
+    read(db, 0, [5, 7])
+    now = time.time()
+    [run] = scheduler.run_cycle(now)["enqueued"]
+    finish(db, run["job_id"], 'FAILED')
+    read(db, 2, [3])
+    cycle = scheduler.run_cycle(now + 60)  # due again at once, with the readings since
+    assert cycle["reopened"] == 1
+    assert [run["total_dividend_drops"] for run in cycle["enqueued"]] == [15]
+
+
+def test_a_run_that_journaled_its_dividend_is_not_paid_again(scheduled):
+    db, scheduler = scheduled
+    read(db, 0, [5, 7])
+    now = time.time()
+    [run] = scheduler.run_cycle(now)["enqueued"]
+    payload = json.loads(db.query_one('SELECT payload FROM jobs WHERE id = ?', (run["job_id"],))[0])
+    with db.transaction() as conn:
+        db.insert_dividend(conn, payload["dividend_id"], "sunny", 12, datetime.now(), 'PARTIAL')
+    finish(db, run["job_id"], 'FAILED')
+    cycle = scheduler.run_cycle(now + 60)
+    assert cycle["reopened"] == 0 and not cycle["enqueued"]
+    read(db, 2, [3])
+    [run] = scheduler.run_cycle(now + DAY)["enqueued"]
+    assert run["total_dividend_drops"] == 3
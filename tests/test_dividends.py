@@ -0,0 +1,28 @@
+import os
+import uuid
+from datetime import datetime
+
+from xrpl.core.addresscodec import encode_classic_address
+from xrpl.wallet import Wallet
+
+
+def test_a_dividend_is_split_over_the_positions_it_pays(app, ledger):
+    import db
+    import solar_crowdfunding
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, 100 * 1000000)
+    holders = {encode_classic_address(os.urandom(20)): shares for shares in (10, 20, 30)}
+    with db.transaction() as conn:
+        db.insert_project(conn, "split", "Synthetic project", "Nowhere", 100.0, 1000, 50000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+        for address, shares in holders.items():
+            db.insert_shareholder(conn, str(uuid.uuid4()), "split", address, shares, datetime.now())
+            db.add_to_position(conn, "split", address, shares)
+        # A purchase committed after the positions were read.
+        conn.execute("UPDATE projects SET shares_sold = shares_sold + 40 WHERE name = 'split'")
+    ledger.close_ledger()
+
+    body, status = solar_crowdfunding.run_distribute_dividends({"name": "split", "total_dividend_xrp": 6})
+    assert status == 200 and body["status"] == 'COMPLETED'
+    assert {address: ledger.accounts[address]["Balance"] for address in holders} == {
+        address: shares * 100000 for address, shares in holders.items()}
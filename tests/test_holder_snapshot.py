@@ -0,0 +1,90 @@
+import os
+from datetime import datetime
+
+import pytest
+from xrpl.core.addresscodec import encode_classic_address
+from xrpl.wallet import Wallet
+
+HOLDERS = 450  # two pages of account_lines
+
+
+class Crash(BaseException):
+    pass
+
+
+@pytest.fixture
+def project(app, ledger):
+    """A tokenized project whose holders hold 1..HOLDERS tokens"""
+    import db
+    import tokens
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, 100 * 1000000)
+    holders = {encode_classic_address(os.urandom(20)): n for n in range(1, HOLDERS + 1)}
+    for address, held in holders.items():
+        ledger.set_line(address, wallet.classic_address, tokens.CURRENCY, held, 1000000)
+    with db.transaction() as conn:
+        db.insert_project(conn, "snapshot", "Synthetic project", "Nowhere", 100.0, 1000000, 50000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+        db.insert_project_token(conn, "snapshot", tokens.CURRENCY, wallet.classic_address, datetime.now())
+    ledger.close_ledger()
+    return db.get_project("snapshot"), holders
+
+
+def crash_after_first_page(monkeypatch, project):
+    """Start a snapshot that stops after storing its first page; return its id"""
+    import db
+    import solar_crowdfunding
+    import tokens
+    page_account_lines = tokens.page_account_lines
+    pages = [0]
+
+    def crashing_page(*args, **kwargs):
+        if pages[0] == 1:
+            raise Crash()
+        pages[0] += 1
+        return page_account_lines(*args, **kwargs)
+
+    monkeypatch.setattr(tokens, 'page_account_lines', crashing_page)
+    with pytest.raises(Crash):
+        solar_crowdfunding.build_holder_snapshot(project)
+    monkeypatch.setattr(tokens, 'page_account_lines', page_account_lines)
+    snapshot = db.get_building_holder_snapshot("snapshot")
+    assert snapshot[7] == 1
+    return snapshot[0]
+
+
+def test_a_snapshot_resumes_at_its_own_ledger(project, ledger, monkeypatch):
+    import db
+    import solar_crowdfunding
+    import tokens
+    project, holders = project
+    snapshot_id = crash_after_first_page(monkeypatch, project)
+    # Tokens move in a later ledger; the snapshot must not see it.
+    ledger.close_ledger()
+    for address in holders:
+        ledger.set_line(address, project[6], tokens.CURRENCY, 1, 1000000)
+
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    assert snapshot[0] == snapshot_id and snapshot[6] == 'COMPLETE' and snapshot[7] == 2
+    lines = dict(db.list_holder_snapshot_lines(snapshot_id))
+    assert lines == holders
+    assert (snapshot[8], snapshot[9]) == (len(lines), sum(lines.values()))
+
+
+def test_a_snapshot_whose_ledger_is_gone_fails_and_starts_over(project, ledger, monkeypatch):
+    import db
+    import fake_ledger
+    import solar_crowdfunding
+    project, holders = project
+    snapshot_id = crash_after_first_page(monkeypatch, project)
+    for _ in range(fake_ledger.HISTORY_LEDGERS + 1):
+        ledger.close_ledger()
+    # Nothing was watching those ledgers go by; later tests sign against them.
+    solar_crowdfunding.signer.refresh()
+
+    snapshot = solar_crowdfunding.build_holder_snapshot(project)
+    assert db.get_holder_snapshot(snapshot_id)[6] == 'FAILED'
+    assert db.list_holder_snapshot_lines(snapshot_id) == []
+    assert snapshot[0] != snapshot_id and snapshot[6] == 'COMPLETE'
+    assert dict(db.list_holder_snapshot_lines(snapshot[0])) == holders
+    assert snapshot[9] == sum(holders.values())
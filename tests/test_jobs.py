@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+
+def test_a_long_job_keeps_its_lease(app, monkeypatch):
+    import db
+    import jobs
+    from config import Config
+    with db.transaction() as conn:
+        conn.execute('DELETE FROM jobs')  # left queued by other tests
+    monkeypatch.setattr(Config, 'JOB_LEASE_SECONDS', 0.3)
+    release = threading.Event()
+
+    def long_run(payload):
+        release.wait(5)
+        return {"ok": True}, 200
+
+    jobs.register('long_run', long_run)
+    job_id = jobs.enqueue('long_run', {})
+    row = jobs.claim_next()
+    worker = threading.Thread(target=jobs.run_job, args=(row,))
+    worker.start()
+    for _ in range(5):  # well past the first lease: another worker's claim would fail a dead job here
+        time.sleep(0.2)
+        assert jobs.claim_next() is None
+        assert jobs.get_job(job_id)["status"] == 'RUNNING'
+    release.set()
+    worker.join(5)
+    assert jobs.get_job(job_id)["status"] == 'COMPLETED'
+
+
+def test_a_pay_out_gives_up_on_a_wallet_that_stays_busy(app, monkeypatch):
+    import db
+    import solar_crowdfunding
+    monkeypatch.setattr(solar_crowdfunding.Config, 'LEDGER_POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(solar_crowdfunding.Config, 'WALLET_LEASE_WAIT', 0.1)
+    assert db.claim_wallet("rProject", "stuck", 60)
+    with pytest.raises(Exception, match="still busy"):
+        solar_crowdfunding.hold_wallet("rProject")
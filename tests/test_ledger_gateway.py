@@ -0,0 +1,32 @@
+import pytest
+from xrpl.models.requests import ServerInfo
+
+
+@pytest.fixture
+def slow_node(ledger):
+    """Another node of the session's ledger that takes 0.1s to answer"""
+    import fake_ledger
+    ledger, server = fake_ledger.serve(latency=0.1, ledger=ledger)
+    yield fake_ledger.server_url(server)
+    server.shutdown()
+
+
+def test_a_batch_longer_than_the_timeout_is_waited_for(slow_node):
+    from ledger_gateway import LedgerGateway
+    gateway = LedgerGateway(slow_node, max_concurrency=2, timeout=0.5)
+    try:
+        # Twelve calls two at a time take about 0.6s, each well under 0.5s.
+        responses = gateway.request_many(ServerInfo() for _ in range(12))
+        assert all(not isinstance(response, Exception) and response.is_successful() for response in responses)
+    finally:
+        gateway.close()
+
+
+def test_each_request_is_timed_out_on_its_own(slow_node):
+    from ledger_gateway import LedgerGateway
+    gateway = LedgerGateway(slow_node, max_concurrency=4, timeout=0.05)
+    try:
+        responses = gateway.request_many(ServerInfo() for _ in range(4))
+        assert all(isinstance(response, Exception) for response in responses)
+    finally:
+        gateway.close()
@@ -0,0 +1,98 @@
+import json
+from datetime import datetime
+
+import pytest
+from xrpl.models.requests import AccountTx
+from xrpl.wallet import Wallet
+
+PAYMENTS = 35
+
+
+class Crash(BaseException):
+    pass
+
+
+@pytest.fixture
+def project(app, ledger):
+    """A project wallet with a history several account_tx pages long"""
+    import db
+    wallet, payer = Wallet.create(), Wallet.create()
+    ledger.fund(wallet.classic_address, 100 * 1000000)
+    ledger.fund(payer.classic_address, 1000 * 1000000)
+    for i in range(PAYMENTS):
+        ledger.pay(payer.classic_address, wallet.classic_address, 1000000 + i)
+        if i % 10 == 0:
+            ledger.close_ledger()
+    ledger.close_ledger()
+    with db.transaction() as conn:
+        db.insert_project(conn, "indexed", "Synthetic project", "Nowhere", 100.0, 100, 50000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+    return wallet
+
+
+def indexer(request_many=None):
+    import solar_crowdfunding
+    from ledger_indexer import LedgerIndexer
+    return LedgerIndexer(request_many or solar_crowdfunding.ensure_gateway().request_many, check_interval=0,
+                         page_size=10)
+
+
+def indexed_history(address):
+    import db
+    return db.list_wallet_transactions(address, limit=1000)
+
+
+def test_a_wallet_is_indexed_page_by_page(project, ledger):
+    import db
+    address = project.classic_address
+    report = indexer().run_cycle()
+    rows = indexed_history(address)
+    assert len(rows) == len(ledger.account_txs[address]) >= PAYMENTS
+    assert report["pages"] == -(-len(rows) // 10) and not report["errors"]
+    assert len({row[2] for row in rows}) == len(rows)
+    assert sum(row[5] for row in rows) == ledger.accounts[address]["Balance"] - 100 * 1000000  # less funding
+    assert db.get_wallet_index(address)[:2] == (ledger.accounts[address]["Balance"], report["validated_ledger"])
+
+
+def test_a_pass_restarts_from_its_stored_marker(project, ledger):
+    import db
+    import solar_crowdfunding
+    address = project.classic_address
+    request_many = solar_crowdfunding.ensure_gateway().request_many
+    markers = []
+
+    def crash_after_two_pages(requests):
+        if isinstance(requests[0], AccountTx):
+            markers.append(requests[0].marker)
+            if len(markers) == 3:
+                raise Crash()
+        return request_many(requests)
+
+    with pytest.raises(Crash):
+        indexer(crash_after_two_pages).run_cycle()
+    assert db.get_wallet_index(address)[1] is None  # no balance served from an unfinished pass
+    stored = db.list_wallet_index_cursors()[0][3]
+    assert json.loads(stored) == markers[2]
+
+    markers.clear()
+    indexer(crash_after_two_pages).run_cycle()
+    assert markers[0] == json.loads(stored)
+    rows = indexed_history(address)
+    assert len(rows) == len(ledger.account_txs[address])
+    assert len({row[2] for row in rows}) == len(rows)
+
+
+def test_a_project_page_shows_the_indexed_balance(project, ledger, monkeypatch):
+    import solar_crowdfunding
+    address = project.classic_address
+    indexer().run_cycle()
+    indexed = ledger.accounts[address]["Balance"]
+    ledger.pay(address, Wallet.create().classic_address, 20 * 1000000)
+    ledger.close_ledger()
+
+    def no_ledger(address, fresh=False):
+        raise AssertionError("the indexed balance should be used")
+
+    monkeypatch.setattr(solar_crowdfunding, 'check_wallet_balance', no_ledger)
+    snapshot = json.loads(solar_crowdfunding.build_project_snapshot("indexed"))
+    assert snapshot["project"]["current_balance_xrp"] == indexed / 1000000
@@ -0,0 +1,61 @@
+import httpx
+import pytest
+from xrpl.models.requests import ServerInfo, SubmitOnly
+
+from ledger_pool import EndpointPool, RetryBudget
+
+NODES = ["http://node-a/", "http://node-b/", "http://node-c/"]
+
+
+def pool_over(handler, **kwargs):
+    """An EndpointPool over NODES whose HTTP calls go to `handler` instead of the network"""
+    pool = EndpointPool(NODES, **kwargs)
+    pool.http = httpx.Client(transport=httpx.MockTransport(handler))
+    return pool
+
+
+def first_node_times_out(calls, error):
+    def handler(request):
+        calls.append(str(request.url))
+        if str(request.url) == NODES[0]:
+            raise error("timed out", request=request)
+        return httpx.Response(200, json={"result": {"status": "success", "engine_result": "tesSUCCESS"}})
+    return handler
+
+
+def test_a_submit_is_not_resent_after_an_ambiguous_failure():
+    calls = []
+    pool = pool_over(first_node_times_out(calls, httpx.ReadTimeout))
+    with pytest.raises(httpx.ReadTimeout):
+        pool.request(SubmitOnly(tx_blob="00"))
+    assert calls == NODES[:1]
+
+
+def test_a_submit_that_never_connected_fails_over():
+    calls = []
+    pool = pool_over(first_node_times_out(calls, httpx.ConnectError))
+    assert pool.request(SubmitOnly(tx_blob="00")).is_successful()
+    assert calls == NODES[:2]
+
+
+def test_a_read_fails_over_after_a_timeout():
+    calls = []
+    pool = pool_over(first_node_times_out(calls, httpx.ReadTimeout))
+    assert pool.request(ServerInfo()).is_successful()
+    assert calls == NODES[:2]
+
+
+def test_the_retry_budget_stops_a_retry_storm():
+    calls = []
+
+    def overloaded(request):
+        calls.append(str(request.url))
+        return httpx.Response(503, text="Service Unavailable")
+
+    pool = pool_over(overloaded)
+    pool.budget = RetryBudget(ratio=0.2, min_per_second=0.0, capacity=5.0)
+    for _ in range(100):
+        assert not pool.request(ServerInfo()).is_successful()
+    # Without the budget every request would try all three nodes.
+    assert len(calls) <= 100 + 5 + 0.2 * 100
+    assert pool.budget.exhausted > 0
@@ -0,0 +1,65 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+import money
+
+
+def random_cases(count, seed=7):
+    rng = random.Random(seed)
+    for _ in range(count):
+        weights = [rng.choice((0, 1, rng.randint(1, 10 ** rng.randint(1, 9)))) for _ in range(rng.randint(1, 50))]
+        if not any(weights):
+            weights[0] = 1
+        yield rng, rng.randint(0, 10 ** rng.randint(0, 17)), weights
+
+
+def test_allocate_loses_no_drop_and_stays_within_one_of_the_exact_share():
+    for rng, total, weights in random_cases(2000):
+        shares = money.allocate(total, weights)
+        assert sum(shares) == total, (total, weights)
+        for share, weight in zip(shares, weights):
+            assert abs(share - Fraction(total * weight, sum(weights))) < 1, (total, weights)
+
+
+def test_allocate_does_not_depend_on_holder_order():
+    for rng, total, weights in random_cases(500, seed=11):
+        shares = money.allocate(total, weights)
+        order = sorted(range(len(weights)), key=lambda i: rng.random())
+        permuted = [weights[i] for i in order]
+        assert sorted(zip(permuted, money.allocate(total, permuted))) == sorted(zip(weights, shares))
+
+
+@pytest.mark.parametrize("total, weights, shares", [
+    (7, [3, 5], [3, 4]),  # remainders 5/8 and 3/8: the leftover drop goes to the first
+    (2, [1, 3], [0, 2]),  # equal remainders: the larger weight wins
+    (2, [1, 1, 2], [1, 0, 1]),  # equal remainders and weights: the earlier entry wins
+    (10, [1, 1, 1], [4, 3, 3]),
+    (0, [5, 0, 2], [0, 0, 0]),
+])
+def test_allocate_gives_leftover_drops_to_the_largest_remainders(total, weights, shares):
+    assert money.allocate(total, weights) == shares
+
+
+def test_allocate_with_a_known_weight_sum():
+    assert money.allocate(100, [1, 3], weight_sum=4) == [25, 75]
+    with pytest.raises(ValueError):
+        money.allocate(100, [1, 3], weight_sum=2)
+
+
+@pytest.mark.parametrize("total, weights", [(1, [0, 0]), (-1, [1]), (1, [1, -1]), (1, [])])
+def test_allocate_rejects_invalid_input(total, weights):
+    with pytest.raises(ValueError):
+        money.allocate(total, weights)
+
+
+@pytest.mark.parametrize("xrp", ["0.05", 0.05, 1, "99999999999.999999", 0.000001])
+def test_xrp_round_trips_through_drops(xrp):
+    assert money.drops_to_xrp(money.xrp_to_drops(xrp)) == float(xrp)
+
+
+@pytest.mark.parametrize("xrp", ["0.0000001", "abc", "inf"])
+def test_xrp_finer_than_a_drop_or_not_a_number_is_rejected(xrp):
+    with pytest.raises(ValueError):
+        money.xrp_to_drops(xrp)
@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+SUPPLY = 300
+TTL = 0.05
+
+
+def buyer_process(database, threads, orders, seed):
+    """Buyers racing for the scarce project: reserve, 'pay', then commit, release or walk away"""
+    os.environ['DATABASE'] = database
+    import db
+
+    def buyer(t):
+        rng = random.Random(seed * 1000 + t)
+        for _ in range(orders):
+            shares = rng.randint(1, 5)
+            reservation_id = str(uuid.uuid4())
+            with db.transaction(immediate=True) as conn:
+                if not db.reserve_shares(conn, reservation_id, "scarce", shares, TTL):
+                    continue
+            time.sleep(rng.uniform(0, 0.01))
+            outcome = rng.random()
+            if outcome < 0.8:
+                holder = f"rBuyer{seed}-{t}"
+                with db.transaction(immediate=True) as conn:
+                    if db.commit_reservation(conn, reservation_id, holder):
+                        db.insert_shareholder(conn, str(uuid.uuid4()), "scarce", holder, shares, datetime.now())
+                        db.add_to_position(conn, "scarce", holder, shares)
+            elif outcome < 0.9:
+                with db.transaction(immediate=True) as conn:
+                    db.release_reservation(conn, reservation_id)
+            # else: never paid, left to expire
+        db.close_connection()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(buyer, range(threads)))
+
+
+@pytest.fixture
+def scarce(app):
+    import db
+    with db.transaction(immediate=True) as conn:
+        db.insert_project(conn, "scarce", "Synthetic project", "Nowhere", 100.0, SUPPLY, 50000,
+                          "rProject", "sSeed", 'FUNDING', datetime.now())
+    return db
+
+
+def test_reservations_are_all_or_nothing(scarce):
+    db = scarce
+    with db.transaction(immediate=True) as conn:
+        assert db.reserve_shares(conn, "a", "scarce", SUPPLY - 1, 60)
+        assert not db.reserve_shares(conn, "b", "scarce", 2, 60)
+        assert db.reserve_shares(conn, "c", "scarce", 1, 60)
+        db.release_reservation(conn, "a")
+        db.release_reservation(conn, "a")  # releasing twice gives the shares back once
+    project = db.get_project("scarce")
+    assert (project[10], project[11]) == (0, 1)
+
+
+def test_expired_reservation_is_refunded_once_its_shares_are_sold(scarce):
+    db = scarce
+    with db.transaction(immediate=True) as conn:
+        assert db.reserve_shares(conn, "late", "scarce", SUPPLY, 0)
+    time.sleep(0.01)
+    with db.transaction(immediate=True) as conn:
+        assert db.reserve_shares(conn, "early", "scarce", SUPPLY, 60)  # expires "late"
+        assert db.commit_reservation(conn, "early", "rEarly")
+        db.add_to_position(conn, "scarce", "rEarly", SUPPLY)
+        assert not db.commit_reservation(conn, "late", "rLate")
+    status = db.query_one("SELECT status FROM reservations WHERE id = 'late'")[0]
+    assert status == 'REFUND_DUE'
+    assert db.get_project("scarce")[10] == SUPPLY
+
+
+def test_buyer_processes_racing_never_oversell(scarce):
+    db = scarce
+    database = os.environ['DATABASE']
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(3) as pool:
+        pool.starmap(buyer_process, [(database, 4, 30, seed) for seed in range(3)])
+
+    project = db.get_project("scarce")
+    positions = db.query_one('SELECT COALESCE(SUM(shares), 0) FROM positions')[0]
+    purchases = db.query_one('SELECT COALESCE(SUM(shares_amount), 0) FROM shareholders')[0]
+    committed = db.query_one("SELECT COALESCE(SUM(shares), 0) FROM reservations WHERE status = 'COMMITTED'")[0]
+    assert project[10] == positions == purchases == committed
+    assert project[10] + project[11] <= SUPPLY, project
+    assert project[10] > SUPPLY // 2, "the race should have sold most of the supply"
+
+    time.sleep(TTL)
+    with db.transaction(immediate=True) as conn:
+        db.expire_reservations(conn, "scarce", time.time())
+    held = db.query_one("SELECT COUNT(*) FROM reservations WHERE status = 'HELD'")[0]
+    assert db.get_project("scarce")[11] == 0 and held == 0
+
+
+class StubWaiter:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def wait(self, timeout=None):
+        return self.outcome
+
+
+@pytest.mark.parametrize("submit, held", [
+    (StubWaiter({"status": 'TIMEOUT', "result": None}), 1),  # may still validate
+    (RuntimeError("connection reset"), 1),  # may have reached the ledger
+    (StubWaiter({"status": 'FAILED', "result": 'tecUNFUNDED_PAYMENT'}), 0),
+    (StubWaiter({"status": 'EXPIRED', "result": None}), 0),
+    ("rejected", 0),
+])
+def test_failed_purchase_releases_its_reservation_only_if_the_payment_did_not_apply(scarce, monkeypatch, submit,
+                                                                                     held):
+    import solar_crowdfunding
+    from signer import TransactionRejected
+    from xrpl.wallet import Wallet
+
+    def sign_and_submit(tx, wallet):
+        if submit == "rejected":
+            raise TransactionRejected("Transaction failed: tefPAST_SEQ")
+        if isinstance(submit, Exception):
+            raise submit
+        return submit
+
+    monkeypatch.setattr(solar_crowdfunding.wallet_pool, 'acquire', Wallet.create)
+    monkeypatch.setattr(solar_crowdfunding, 'check_wallet_balance', lambda address: 1000.0)
+    monkeypatch.setattr(solar_crowdfunding, 'ensure_client', lambda: None)
+    monkeypatch.setattr(solar_crowdfunding, 'sign_and_submit', sign_and_submit)
+    monkeypatch.setattr(solar_crowdfunding.confirmations, 'cancel', lambda waiter: None)
+    with pytest.raises(Exception):
+        solar_crowdfunding.run_buy_shares({"name": "scarce", "shares_amount": 1})
+    status = scarce.query_one("SELECT status FROM reservations")[0]
+    assert status == ('HELD' if held else 'RELEASED')
+    assert scarce.get_project("scarce")[11] == held
+
+
+def time_out(confirmations, outcomes, timeout=None):
+    for outcome in outcomes:
+        confirmations.cancel(outcome.pop("waiter", None))
+        outcome["status"] = 'TIMEOUT'
+
+
+def crash(*args, **kwargs):
+    raise RuntimeError("connection reset")
+
+
+@pytest.mark.parametrize("stage, replacement, held", [
+    ('confirm_payments', time_out, 1),  # may still validate
+    ('confirm_payments', crash, 1),  # went out before the error
+    ('submit_concurrently', crash, 0),  # never sent
+])
+def test_failed_batch_releases_its_reservations_only_if_the_payments_did_not_apply(app, ledger, monkeypatch,
+                                                                                   stage, replacement, held):
+    import db
+    import solar_crowdfunding
+    from xrpl.wallet import Wallet
+    project_wallet, buyer = Wallet.create(), Wallet.create()
+    ledger.fund(project_wallet.classic_address, 100 * 1000000)
+    ledger.fund(buyer.classic_address, 100 * 1000000)
+    with db.transaction(immediate=True) as conn:
+        db.insert_project(conn, "scarce", "Synthetic project", "Nowhere", 100.0, SUPPLY, 50000,
+                          project_wallet.classic_address, project_wallet.seed, 'FUNDING', datetime.now())
+    ledger.close_ledger()
+
+    monkeypatch.setattr(solar_crowdfunding, stage, replacement)
+    orders = [{"name": "scarce", "shares_amount": 1, "buyer_seed": buyer.seed} for _ in range(2)]
+    if replacement is crash:
+        with pytest.raises(RuntimeError):
+            solar_crowdfunding.run_buy_shares_batch({"orders": orders})
+    else:
+        body, status = solar_crowdfunding.run_buy_shares_batch({"orders": orders})
+        assert [o["status"] for o in body["orders"]] == ['TIMEOUT'] * 2
+    assert db.query_all("SELECT status FROM reservations") == [('HELD' if held else 'RELEASED',)] * 2
+    assert db.get_project("scarce")[11] == held * 2
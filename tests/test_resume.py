@@ -0,0 +1,84 @@
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from xrpl.core.addresscodec import encode_classic_address
+from xrpl.wallet import Wallet
+
+HOLDERS = 20
+
+
+class Crash(BaseException):
+    pass
+
+
+@pytest.fixture
+def project(app, ledger):
+    """A project whose wallet can pay HOLDERS holders 1 XRP each"""
+    import db
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, (HOLDERS * 2 + 100) * 1000000)
+    holders = [encode_classic_address(os.urandom(20)) for _ in range(HOLDERS)]
+    with db.transaction() as conn:
+        db.insert_project(conn, "resume", "Synthetic project", "Nowhere", 100.0, HOLDERS * 10, 50000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+        for address in holders:
+            db.insert_shareholder(conn, str(uuid.uuid4()), "resume", address, 10, datetime.now())
+            db.add_to_position(conn, "resume", address, 10)
+    ledger.close_ledger()
+    return wallet, holders
+
+
+def crash_run(monkeypatch, submits):
+    """Start the dividend and kill it after `submits` payments went out; return its id"""
+    import db
+    import payouts
+    import solar_crowdfunding
+    submit_blob = payouts.submit_blob
+    submitted = [0]
+
+    def crashing_submit(client, tx_blob):
+        if submitted[0] == submits:
+            raise Crash()
+        submitted[0] += 1
+        return submit_blob(client, tx_blob)
+
+    monkeypatch.setattr(payouts, 'submit_blob', crashing_submit)
+    with pytest.raises(Crash):
+        solar_crowdfunding.run_distribute_dividends({"name": "resume", "total_dividend_xrp": HOLDERS})
+    monkeypatch.setattr(payouts, 'submit_blob', submit_blob)
+    return db.list_unfinished_dividends()[0][0]
+
+
+def test_resume_settles_what_was_signed_instead_of_paying_again(project, ledger, monkeypatch):
+    import db
+    import solar_crowdfunding
+    wallet, holders = project
+    dividend_id = crash_run(monkeypatch, HOLDERS // 2)
+    assert db.count_dividend_payouts(dividend_id) == {'SIGNED': HOLDERS}
+
+    body, status = solar_crowdfunding.run_resume_dividend({"dividend_id": dividend_id})
+    assert status == 200 and body["status"] == 'COMPLETED'
+    assert body["settled_from_earlier_run"] == HOLDERS
+    assert body["paid_this_run"] == 0
+    assert all(ledger.accounts[address]["Balance"] == 1000000 for address in holders)
+
+
+def test_resume_pays_again_only_what_can_no_longer_apply(project, ledger, monkeypatch):
+    import db
+    import solar_crowdfunding
+    wallet, holders = project
+    dividend_id = crash_run(monkeypatch, HOLDERS // 2)
+    last_ledger = db.query_one("SELECT MAX(last_ledger_sequence) FROM dividend_payouts WHERE dividend_id = ?",
+                               (dividend_id,))[0]
+    # Let every blob the crashed run signed expire: the half it never
+    # submitted can no longer apply, the half it did is already validated.
+    while ledger.validated_index <= last_ledger:
+        ledger.close_ledger()
+
+    body, status = solar_crowdfunding.run_resume_dividend({"dividend_id": dividend_id})
+    assert status == 200 and body["status"] == 'COMPLETED'
+    assert body["settled_from_earlier_run"] == HOLDERS
+    assert body["paid_this_run"] == HOLDERS - HOLDERS // 2
+    assert all(ledger.accounts[address]["Balance"] == 1000000 for address in holders)
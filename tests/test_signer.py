@@ -0,0 +1,50 @@
+from xrpl.models.requests import AccountInfo, Fee, Ledger
+from xrpl.models.response import Response, ResponseStatus
+from xrpl.models.transactions import AccountSet
+from xrpl.wallet import Wallet
+
+from signer import LocalSigner
+
+
+def ledger(sequences):
+    """A request function answering like a node whose accounts are at `sequences`"""
+    reads = []
+
+    def request(req):
+        if isinstance(req, AccountInfo):
+            reads.append(req.account)
+            result = {"account_data": {"Sequence": sequences[req.account]}}
+        elif isinstance(req, Fee):
+            result = {"drops": {"open_ledger_fee": "12"}}
+        elif isinstance(req, Ledger):
+            result = {"ledger_index": 1000}
+        return Response(status=ResponseStatus.SUCCESS, result=result)
+    return request, reads
+
+
+def test_batches_and_single_transactions_never_share_a_sequence():
+    wallet = Wallet.create()
+    request, reads = ledger({wallet.classic_address: 10})
+    signer = LocalSigner(request, None)
+    assert signer.reserve_batch(wallet.classic_address, 5, 1200) == 10
+    assert signer.autofill(AccountSet(account=wallet.classic_address)).sequence == 15
+    assert signer.reserve_batch(wallet.classic_address, 2, 1200) == 16
+    assert reads == [wallet.classic_address]  # read once, then handed out from the cache
+
+
+def test_a_batch_gives_back_what_it_did_not_use():
+    wallet = Wallet.create()
+    request, reads = ledger({wallet.classic_address: 10})
+    signer = LocalSigner(request, None)
+    first = signer.reserve_batch(wallet.classic_address, 5, 1200)
+    signer.release_batch(wallet.classic_address, range(first + 3, first + 5))  # the last two were rejected
+    assert signer.autofill(AccountSet(account=wallet.classic_address)).sequence == 13
+
+
+def test_a_sequence_read_by_the_caller_moves_the_cache_forward():
+    wallet = Wallet.create()
+    request, reads = ledger({wallet.classic_address: 10})
+    signer = LocalSigner(request, None)
+    assert signer.reserve_batch(wallet.classic_address, 1, 1200) == 10
+    assert signer.reserve_batch(wallet.classic_address, 2, 1200, sequence=30) == 30  # used elsewhere meanwhile
+    assert signer.reserve_batch(wallet.classic_address, 1, 1200, sequence=20) == 32  # our own are in flight
@@ -0,0 +1,47 @@
+import json
+import tracemalloc
+from datetime import datetime
+
+import db
+
+
+def seed_projects(start, stop, holders=10):
+    with db.transaction() as conn:
+        for p in range(start, stop):
+            name = f"project-{p:06d}"
+            db.insert_project(conn, name, "Synthetic project", "Nowhere", 100.0, 30000, 50000,
+                              f"rProject{p}", "sSeed", 'FUNDING', datetime.now())
+            for h in range(holders):
+                db.insert_shareholder(conn, f"{name}-{h}", name, f"rHolder{h}", 10, datetime.now())
+                db.add_to_position(conn, name, f"rHolder{h}", 10)
+
+
+def read_ndjson(client):
+    """Peak heap while streaming every project, and the projects read"""
+    projects = []
+    tracemalloc.start()
+    response = client.get("/get_all_project_info?format=ndjson", buffered=False)
+    for chunk in response.iter_encoded():
+        projects.extend(json.loads(line)["name"] for line in chunk.decode().splitlines() if line)
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, projects
+
+
+def test_ndjson_streams_every_project_in_order(app):
+    seed_projects(0, 250)
+    client = app.test_client()
+    names = [p["name"] for p in client.get("/get_all_project_info").json["projects"]]
+    assert read_ndjson(client)[1] == sorted(names)
+    assert len(names) == 250
+
+
+def test_ndjson_peak_memory_does_not_grow_with_the_database(app):
+    client = app.test_client()
+    seed_projects(0, 300)
+    small = read_ndjson(client)[0]
+    seed_projects(300, 1200)
+    large, projects = read_ndjson(client)
+    assert len(projects) == 1200
+    assert large < small * 1.5, (small, large)
@@ -0,0 +1,98 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from xrpl.wallet import Wallet
+
+
+class Crash(BaseException):
+    pass
+
+
+def funded(ledger, xrp=100):
+    wallet = Wallet.create()
+    ledger.fund(wallet.classic_address, xrp * 1000000)
+    return wallet
+
+
+@pytest.fixture
+def project(app, ledger):
+    """A tokenized project with one holder who bought 10 shares before it was tokenized"""
+    import db
+    import solar_crowdfunding
+    wallet, holder = funded(ledger), funded(ledger)
+    with db.transaction() as conn:
+        db.insert_project(conn, "tokens", "Synthetic project", "Nowhere", 100.0, 100, 1000000,
+                          wallet.classic_address, wallet.seed, 'FUNDING', datetime.now())
+        db.insert_shareholder(conn, str(uuid.uuid4()), "tokens", holder.classic_address, 10, datetime.now())
+        db.add_to_position(conn, "tokens", holder.classic_address, 10)
+    ledger.close_ledger()
+    body, status = solar_crowdfunding.run_tokenize_project({"name": "tokens"})
+    assert body["awaiting_trust_lines"] == 1
+    return wallet, holder
+
+
+def tokens_held(ledger, wallet, project_wallet):
+    import tokens
+    return ledger.line_balance(wallet.classic_address, project_wallet.classic_address, tokens.CURRENCY)
+
+
+def test_a_buyer_trusts_the_tokens_and_receives_them(project, ledger):
+    import solar_crowdfunding
+    project_wallet, holder = project
+    buyer = funded(ledger)
+    ledger.close_ledger()
+
+    body, status = solar_crowdfunding.run_buy_shares_batch(
+        {"orders": [{"name": "tokens", "shares_amount": 4, "buyer_seed": buyer.seed}]})
+    assert body["orders"][0]["status"] == 'CONFIRMED'
+    assert body["orders"][0]["trust_line"] == 'tesSUCCESS'
+
+    report, status = solar_crowdfunding.run_deliver_tokens({"name": "tokens"})
+    assert tokens_held(ledger, buyer, project_wallet) == 4
+    # The earlier holder has no trust line yet and is left waiting for one.
+    assert report["confirmed"] == 1
+    assert tokens_held(ledger, holder, project_wallet) == 0
+
+
+def test_a_delivery_waits_for_its_trust_line_and_is_sent_once(project, ledger):
+    import solar_crowdfunding
+    project_wallet, holder = project
+    solar_crowdfunding.run_deliver_tokens({"name": "tokens"})
+    assert solar_crowdfunding.get_token_info("tokens")["deliveries"]['AWAITING_TRUST_LINE']["deliveries"] == 1
+
+    body, status = solar_crowdfunding.run_open_trust_lines({"name": "tokens", "holder_seeds": [holder.seed]})
+    assert body["opened"] == 1 and body["delivery"]["confirmed"] == 1
+    report, status = solar_crowdfunding.run_deliver_tokens({"name": "tokens"})
+    assert report["confirmed"] == 0
+    assert tokens_held(ledger, holder, project_wallet) == 10
+    assert solar_crowdfunding.get_token_info("tokens")["tokens_delivered"] == 10
+
+
+def test_an_interrupted_delivery_is_settled_rather_than_sent_again(project, ledger, monkeypatch):
+    import payouts
+    import solar_crowdfunding
+    project_wallet, holder = project
+    buyers = [funded(ledger) for _ in range(4)]
+    ledger.close_ledger()
+    solar_crowdfunding.run_buy_shares_batch(
+        {"orders": [{"name": "tokens", "shares_amount": 2, "buyer_seed": buyer.seed} for buyer in buyers]})
+
+    submit_blob = payouts.submit_blob
+    submitted = [0]
+
+    def crashing_submit(client, tx_blob):
+        if submitted[0] == 2:
+            raise Crash()
+        submitted[0] += 1
+        return submit_blob(client, tx_blob)
+
+    monkeypatch.setattr(payouts, 'submit_blob', crashing_submit)
+    with pytest.raises(Crash):
+        solar_crowdfunding.run_deliver_tokens({"name": "tokens"})
+    monkeypatch.setattr(payouts, 'submit_blob', submit_blob)
+
+    report, status = solar_crowdfunding.run_deliver_tokens({"name": "tokens"})
+    assert report["settled_from_earlier_run"] == 4
+    assert [tokens_held(ledger, buyer, project_wallet) for buyer in buyers] == [2] * 4
+    assert tokens_held(ledger, holder, project_wallet) == 0
@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+def test_one_owner_holds_a_wallet_at_a_time(app):
+    import db
+    assert db.claim_wallet("rProject", "a", 60)
+    assert not db.claim_wallet("rProject", "b", 60)
+    assert db.claim_wallet("rOther", "b", 60)
+    with db.transaction() as conn:
+        db.release_wallet(conn, "rProject", "b")  # not b's to release
+    assert not db.claim_wallet("rProject", "b", 60)
+    with db.transaction() as conn:
+        db.release_wallet(conn, "rProject", "a")
+    assert db.claim_wallet("rProject", "b", 60)
+
+
+def test_an_expired_lease_is_taken_over(app):
+    import db
+    assert db.claim_wallet("rProject", "dead", 0.01)
+    time.sleep(0.02)
+    assert db.claim_wallet("rProject", "b", 60)
+
+
+def test_pay_out_runs_wait_for_the_wallet(app, monkeypatch):
+    import db
+    import solar_crowdfunding
+    monkeypatch.setattr(solar_crowdfunding.Config, 'LEDGER_POLL_INTERVAL', 0.01)
+    first = solar_crowdfunding.hold_wallet("rProject")
+    taken = []
+    waiter = threading.Thread(target=lambda: taken.append(solar_crowdfunding.hold_wallet("rProject")))
+    waiter.start()
+    time.sleep(0.1)
+    assert not taken
+    with db.transaction() as conn:
+        db.release_wallet(conn, "rProject", first)
+    waiter.join(5)
+    assert taken and taken[0] != first
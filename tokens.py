@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from xrpl.models.amounts import IssuedCurrencyAmount
+from xrpl.models.requests import AccountInfo, AccountLines
+from xrpl.models.transactions import AccountSet, AccountSetAsfFlag, Payment, TrustSet, TrustSetFlag
+from xrpl.transaction import sign
+
+from payouts import confirm_payments, record_signed, submit_concurrently
+
+# Project shares as an XRPL issued currency. Every project wallet issues its
+# own SUNX: the currency code is the same, the issuer tells projects apart, and
+# one token is one share. A holder needs a trust line to the project wallet
+# before it can receive the project's tokens.
+
+TOKEN_CODE = 'SUNX'
+
+# Trust lines per account_lines call; rippled serves at most 400.
+ACCOUNT_LINES_PAGE = 400
+
+
+def currency_code(code=TOKEN_CODE):
+    """The XRPL currency field for a code: itself if 3 characters, else 40 hex digits"""
+    if len(code) == 3:
+        return code
+    return code.encode('ascii').hex().upper().ljust(40, '0')
+
+
+CURRENCY = currency_code()
+
+
+def token_amount(issuer, shares):
+    return IssuedCurrencyAmount(currency=CURRENCY, issuer=issuer, value=str(shares))
+
+
+def default_ripple(issuer, **fields):
+    """AccountSet letting the issuer's tokens move between holders"""
+    return AccountSet(account=issuer, set_flag=AccountSetAsfFlag.ASF_DEFAULT_RIPPLE, **fields)
+
+
+def trust_set(holder, issuer, limit, **fields):
+    """TrustSet from a holder to a project wallet for up to `limit` tokens"""
+    return TrustSet(account=holder, limit_amount=token_amount(issuer, limit),
+                    flags=TrustSetFlag.TF_SET_NO_RIPPLE, **fields)
+
+
+def sign_trust_set(wallet, issuer, limit, sequence, fee, last_ledger_sequence):
+    return sign(trust_set(wallet.classic_address, issuer, limit, sequence=sequence, fee=fee,
+                          last_ledger_sequence=last_ledger_sequence), wallet)
+
+
+def sign_token_payment(wallet, destination, shares, sequence, fee, last_ledger_sequence):
+    """Sign a payment of `shares` tokens issued by the wallet itself; a payouts.pay_out signer"""
+    payment = Payment(
+        account=wallet.classic_address,
+        destination=destination,
+        amount=token_amount(wallet.classic_address, shares),
+        sequence=sequence,
+        fee=fee,
+        last_ledger_sequence=last_ledger_sequence
+    )
+    return sign(payment, wallet)
+
+
+def open_trust_lines(request_many, confirmations, wallets, issuer, limit, fee, last_ledger_sequence,
+                     timeout=None, sequences=None):
+    """Set up trust lines from many holder wallets to one issuer, pipelined.
+
+    Every holder's sequence is read in one concurrent round through
+    `request_many` (e.g. the ledger gateway's), all TrustSets are signed
+    locally, submitted together and confirmed together. Returns one outcome
+    per wallet, in order, with "status" CONFIRMED when the line exists.
+    `sequences`, a LocalSigner, if given, hands out the sequences; see
+    payouts.pay_out().
+    """
+    outcomes = [{"index": i, "holder_address": wallet.classic_address, "account": wallet.classic_address,
+                 "status": 'PENDING'} for i, wallet in enumerate(wallets)]
+    responses = request_many([AccountInfo(account=o["account"], ledger_index="current") for o in outcomes])
+    signed = []
+    for outcome, wallet, response in zip(outcomes, wallets, responses):
+        if isinstance(response, Exception) or not response.is_successful():
+            outcome["status"] = 'FAILED'
+            outcome["engine_result"] = "Holder account not found on the ledger"
+            continue
+        sequence = response.result['account_data']['Sequence']
+        if sequences is not None:
+            sequence = sequences.reserve_batch(outcome["account"], 1, last_ledger_sequence, sequence)
+        record_signed(outcome, sign_trust_set(wallet, issuer, limit, sequence, fee, last_ledger_sequence))
+        signed.append(outcome)
+    submit_concurrently(request_many, confirmations, signed)
+    if sequences is not None:
+        for outcome in signed:
+            if outcome["status"] == 'FAILED':  # rejected, so its sequence was not used
+                sequences.release_batch(outcome["account"], [outcome["sequence"]])
+    confirm_payments(confirmations, signed, timeout)
+    return outcomes
+
+
+def token_holders(lines, currency=None):
+    """(holder, tokens) for every line in an issuer's account_lines page that holds whole tokens"""
+    currency = currency or CURRENCY
+    for line in lines:
+        if line["currency"] != currency:
+            continue
+        # The issuer sees the tokens it has issued as a negative balance.
+        held = -Decimal(line["balance"])
+        if held >= 1:
+            yield line["account"], int(held)
+
+
+def page_account_lines(request, issuer, ledger_index, marker=None, limit=ACCOUNT_LINES_PAGE, currency=None):
+    """One page of an issuer's token holders in a validated ledger.
+
+    Returns ([(holder, tokens)], next marker), the marker being None after
+    the last page, or None if the node no longer has that ledger. A marker
+    is only valid with the ledger_index it came from.
+    """
+    response = request(AccountLines(account=issuer, ledger_index=ledger_index, limit=limit, marker=marker))
+    if response.result.get('error') == 'lgrNotFound':
+        return None
+    if not response.is_successful():
+        raise Exception(f"Could not read trust lines: {response.result}")
+    return list(token_holders(response.result['lines'], currency)), response.result.get('marker')
@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime
+
+from xrpl.wallet import Wallet
+
+import db
+
+
+class WalletPool:
+    """Keeps funded wallets ready in the wallet_pool table.
+
+    `create_wallet` is any callable that returns a funded Wallet (the testnet
+    faucet in production, a local stand-in in benchmarks). Background threads
+    keep the pool at `target_size`, backing off exponentially while the faucet
+    fails; acquire() hands out a stored wallet without touching the network.
+    """
+
+    def __init__(self, create_wallet, target_size=5, refill_workers=2,
+                 check_interval=5.0, max_backoff=60.0):
+        self.create_wallet = create_wallet
+        self.target_size = target_size
+        self.refill_workers = refill_workers
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self.handed_out = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.refill_seconds_total = 0.0
+        self.last_refill_seconds = None
+
+    def init_table(self):
+        db.get_connection().execute('''
+            CREATE TABLE IF NOT EXISTS wallet_pool (
+                address TEXT PRIMARY KEY,
+                seed TEXT,
+                public_key TEXT,
+                private_key TEXT,
+                funded_at TIMESTAMP
+            )
+        ''')
+
+    def depth(self):
+        return db.query_one('SELECT COUNT(*) FROM wallet_pool')[0]
+
+    def acquire(self):
+        """Take a funded wallet from the pool, funding one inline only if the pool is empty"""
+        with db.transaction('acquire_wallet', immediate=True) as conn:
+            row = conn.execute('''
+                SELECT rowid, seed, public_key, private_key FROM wallet_pool ORDER BY rowid LIMIT 1
+            ''').fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM wallet_pool WHERE rowid = ?', (row[0],))
+        self._wake.set()
+        with self.lock:
+            if row is not None:
+                self.handed_out += 1
+            else:
+                self.misses += 1
+        if row is None:
+            print("Wallet pool empty, funding a wallet inline")
+            return self.create_wallet()
+        # Keys are stored alongside the seed so handing out a wallet skips key
+        # derivation, which costs ~20 ms per wallet.
+        return Wallet(row[2], row[3], seed=row[1])
+
+    def add(self, wallet):
+        """Put a funded wallet into the pool"""
+        with db.transaction('add_wallet') as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO wallet_pool (address, seed, public_key, private_key, funded_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (wallet.classic_address, wallet.seed, wallet.public_key, wallet.private_key, datetime.now()))
+
+    def _refill_loop(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            if self.depth() >= self.target_size:
+                self._wake.wait(self.check_interval)
+                self._wake.clear()
+                continue
+            start = time.monotonic()
+            try:
+                wallet = self.create_wallet()
+            except Exception as e:
+                with self.lock:
+                    self.refill_failures += 1
+                print(f"Wallet pool refill failed, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = 1.0
+            self.add(wallet)
+            elapsed = time.monotonic() - start
+            with self.lock:
+                self.refills += 1
+                self.refill_seconds_total += elapsed
+                self.last_refill_seconds = elapsed
+
+    def start(self):
+        """Start the background refill threads"""
+        if self.target_size <= 0:
+            return
+        self._stop.clear()
+        for i in range(self.refill_workers):
+            thread = threading.Thread(target=self._refill_loop, name=f"wallet-pool-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def stats(self):
+        depth = self.depth()
+        with self.lock:
+            return {
+                "depth": depth,
+                "target_size": self.target_size,
+                "handed_out": self.handed_out,
+                "misses": self.misses,
+                "refills": self.refills,
+                "refill_failures": self.refill_failures,
+                "last_refill_seconds": self.last_refill_seconds,
+                "avg_refill_seconds": self.refill_seconds_total / self.refills if self.refills else None
+            }